@@ -1,4 +1,18 @@
-from ege_shpargalka.app import main
+import multiprocessing
+import sys
 
 if __name__ == "__main__":
+    # Собранное приложение запускает процесс-работник импорта самим собой
+    multiprocessing.freeze_support()
+    if getattr(sys, "frozen", False):
+        from multiprocessing import spawn
+        # freeze_support выше срабатывает только в Windows
+        spawn.freeze_support()
+
+    if len(sys.argv) > 1:
+        # Команды работают без графического интерфейса
+        from ege_shpargalka.cli import main
+        sys.exit(main())
+
+    from ege_shpargalka.app import main
     main().main_loop()
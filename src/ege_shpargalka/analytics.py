@@ -0,0 +1,348 @@
+"""Слабые темы по истории попыток.
+
+История попыток держится в памяти столбцами NumPy: код пары (предмет,
+тема), время и результат. Пересчет сводки — один векторный проход:
+np.bincount по кодам дает число попыток и верных ответов по темам, а с
+весами 2^(-возраст / HALF_LIFE_DAYS) — их же с учетом давности.
+
+Точность по теме сглаживается байесовски: к ответам добавляется
+PRIOR_STRENGTH «воображаемых» попыток с точностью по всему предмету.
+Поэтому тема с одной ошибкой не оказывается слабейшей, а у темы с
+сотнями попыток оценка почти совпадает с фактической.
+
+NumPy импортируется при первом обращении и на запуск не влияет. Если
+его нет, available() возвращает False, а приложение работает без
+подсказок по темам.
+"""
+import hashlib
+import io
+import json
+import os
+import time
+from itertools import islice
+
+from ege_shpargalka.core import SUBJECT_NAMES
+
+# Вес априорной точности предмета в попытках
+PRIOR_STRENGTH = 5.0
+
+# За сколько дней вес попытки в «текущей» точности уменьшается вдвое
+HALF_LIFE_DAYS = 14.0
+
+# Сколько слабых тем показывать и сколько учитывать при выборе заданий
+WEAK_TOPICS_SHOWN = 5
+WEAK_TOPICS_PRACTICE = 3
+
+# Доля новых заданий в тренировке, которые берутся из слабых тем
+PRACTICE_SHARE = 0.5
+
+DAY = 24 * 60 * 60
+
+# Начальный размер столбцов; при заполнении они растут вдвое
+INITIAL_CAPACITY = 1024
+
+# Сколько строк истории разбирается за один вызов json.loads
+LOAD_BATCH = 10000
+
+# Снимок столбцов рядом с файлом истории; обновляется, когда после него
+# дописано больше SNAPSHOT_EVERY байт
+SNAPSHOT_SUFFIX = ".npz"
+SNAPSHOT_EVERY = 1024 * 1024
+
+_numpy = None
+
+
+def numpy():
+    """Модуль numpy или None, если он не установлен."""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy as np
+        except ImportError:
+            _numpy = False
+        else:
+            _numpy = np
+    return _numpy or None
+
+
+def available():
+    return numpy() is not None
+
+
+class AttemptHistory:
+    """История попыток в столбцах NumPy с дозаписью по одной попытке."""
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        np = numpy()
+        # Коды пар (предмет, тема) и обратная таблица
+        self.codes = {}
+        self.keys = []
+        self.size = 0
+        self.key_codes = np.empty(capacity, dtype=np.int32)
+        self.times = np.empty(capacity, dtype=np.float64)
+        self.correct = np.empty(capacity, dtype=np.bool_)
+        # Меняется при каждой записи: по нему кэшируется сводка
+        self.version = 0
+        # Какая часть файла истории прочитана и сколько байт в ней после снимка
+        self.offset = 0
+        self.snapshot_offset = 0
+        self.tail = 0
+        self.checksum = ""
+        # Сколько попыток и тем прочитано из файла (а не добавлено событиями)
+        self.loaded_size = 0
+        self.loaded_keys = 0
+
+    @classmethod
+    def load(cls, path, limit=None):
+        """История из файла попыток; limit — сколько байт файла читать.
+
+        Если есть снимок столбцов (см. save_snapshot), разбираются только
+        строки, дописанные после него. Файл читается построчно с конца
+        снимка, целиком в память он не попадает.
+        """
+        np = numpy()
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            f = io.BytesIO()
+        with f:
+            size = f.seek(0, os.SEEK_END)
+            if limit is not None:
+                size = min(size, limit)
+
+            history = cls.load_snapshot(path + SNAPSHOT_SUFFIX, f, size)
+            if history is None:
+                history = cls()
+            codes = history.codes
+            key_codes = []
+            times = []
+            correct = []
+            f.seek(history.offset)
+            for records in read_records(read_lines(f, size - history.offset)):
+                key_codes.extend([
+                    codes.setdefault((record.get("subject"), record.get("topic") or 'Общая тема'), len(codes))
+                    for record in records
+                ])
+                times.extend([record.get("time", 0.0) for record in records])
+                correct.extend([bool(record.get("correct")) for record in records])
+            history.checksum = tail_checksum(f, size)
+
+        history.keys = list(codes)
+        history.extend(np.array(key_codes, dtype=np.int32), np.array(times, dtype=np.float64),
+                       np.array(correct, dtype=np.bool_))
+        history.offset = size
+        history.tail = history.offset - history.snapshot_offset
+        return history
+
+    @classmethod
+    def load_snapshot(cls, path, f, size):
+        """История из снимка, если он описывает начало файла f размером size, иначе None."""
+        np = numpy()
+        try:
+            with np.load(path) as snapshot:
+                offset = int(snapshot["offset"])
+                # После сброса статистики файл истории пишется заново
+                if offset > size or str(snapshot["checksum"]) != tail_checksum(f, offset):
+                    return None
+                keys = json.loads(str(snapshot["keys"]))
+                columns = snapshot["key_codes"], snapshot["times"], snapshot["correct"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+        history = cls(max(INITIAL_CAPACITY, len(columns[0])))
+        history.codes = {tuple(key): code for code, key in enumerate(keys)}
+        history.extend(*columns)
+        history.offset = history.snapshot_offset = offset
+        return history
+
+    def save_snapshot(self, path):
+        """Сохраняет столбцы, прочитанные из файла, чтобы не разбирать их заново."""
+        np = numpy()
+        tmp_path = path + ".tmp.npz"
+        size = self.loaded_size
+        np.savez(
+            tmp_path,
+            offset=self.offset,
+            checksum=self.checksum,
+            keys=json.dumps(self.keys[:self.loaded_keys], ensure_ascii=False),
+            key_codes=self.key_codes[:size],
+            times=self.times[:size],
+            correct=self.correct[:size]
+        )
+        os.replace(tmp_path, path)
+        self.snapshot_offset = self.offset
+        self.tail = 0
+
+    def extend(self, key_codes, times, correct):
+        """Дописывает столбцы попыток, прочитанных из файла или снимка."""
+        while self.size + len(key_codes) > len(self.key_codes):
+            self.grow()
+        end = self.size + len(key_codes)
+        self.key_codes[self.size:end] = key_codes
+        self.times[self.size:end] = times
+        self.correct[self.size:end] = correct
+        self.size = end
+        self.loaded_size = end
+        self.loaded_keys = len(self.codes)
+        self.version += 1
+
+    def __len__(self):
+        return self.size
+
+    def add(self, event):
+        """Дописывает попытку (событие журнала или запись истории)."""
+        key = (event.get("subject"), event.get("topic") or 'Общая тема')
+        code = self.codes.get(key)
+        if code is None:
+            code = self.codes[key] = len(self.keys)
+            self.keys.append(key)
+        if self.size == len(self.key_codes):
+            self.grow()
+        self.key_codes[self.size] = code
+        self.times[self.size] = event.get("time", time.time())
+        self.correct[self.size] = bool(event.get("correct"))
+        self.size += 1
+        self.version += 1
+
+    def grow(self):
+        np = numpy()
+        capacity = 2 * len(self.key_codes)
+        for name in ("key_codes", "times", "correct"):
+            column = getattr(self, name)
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
+
+    def clear(self):
+        """Очищает историю после сброса статистики."""
+        version = self.version
+        self.__init__()
+        # Версия растет дальше: сводка, посчитанная до сброса, не подойдет
+        self.version = version + 1
+
+    def topic_stats(self, now=None, half_life_days=HALF_LIFE_DAYS, prior_strength=PRIOR_STRENGTH):
+        """Сводка по темам, слабейшие первыми.
+
+        Список словарей: subject, topic, attempts, correct, accuracy
+        (сглаженная по всей истории), recent (сглаженная с учетом
+        давности), trend (recent − accuracy: больше нуля — тема
+        подтягивается).
+        """
+        np = numpy()
+        if self.size == 0:
+            return []
+        now = time.time() if now is None else now
+        count = len(self.keys)
+        codes = self.key_codes[:self.size]
+        correct = self.correct[:self.size]
+
+        attempts = np.bincount(codes, minlength=count).astype(np.float64)
+        right = np.bincount(codes, weights=correct, minlength=count)
+        ages = np.maximum(now - self.times[:self.size], 0.0)
+        weights = np.exp2(-ages / (half_life_days * DAY))
+        recent_attempts = np.bincount(codes, weights=weights, minlength=count)
+        recent_right = np.bincount(codes, weights=weights * correct, minlength=count)
+
+        # Априорная точность — точность по предмету темы
+        subjects = {}
+        subject_codes = np.array([subjects.setdefault(subject, len(subjects))
+                                  for subject, _ in self.keys], dtype=np.int32)
+        subject_attempts = np.bincount(subject_codes, weights=attempts, minlength=len(subjects))
+        subject_right = np.bincount(subject_codes, weights=right, minlength=len(subjects))
+        prior = (subject_right / np.maximum(subject_attempts, 1.0))[subject_codes]
+
+        accuracy = (right + prior_strength * prior) / (attempts + prior_strength)
+        recent = (recent_right + prior_strength * prior) / (recent_attempts + prior_strength)
+        order = np.lexsort((accuracy, recent))
+
+        result = []
+        for code in order.tolist():
+            if attempts[code] == 0:
+                continue
+            subject, topic = self.keys[code]
+            result.append({
+                "subject": subject,
+                "topic": topic,
+                "attempts": int(attempts[code]),
+                "correct": int(right[code]),
+                "accuracy": float(accuracy[code]),
+                "recent": float(recent[code]),
+                "trend": float(recent[code] - accuracy[code])
+            })
+        return result
+
+
+def load_history(path, limit=None):
+    """Читает историю и обновляет снимок, если после него дописано много."""
+    history = AttemptHistory.load(path, limit)
+    if history.tail >= SNAPSHOT_EVERY:
+        history.save_snapshot(path + SNAPSHOT_SUFFIX)
+    return history
+
+
+def tail_checksum(f, size):
+    """Хеш последних байт первых size байт файла: по нему снимок узнает свой файл."""
+    start = max(0, size - 256)
+    f.seek(start)
+    return hashlib.blake2b(f.read(size - start), digest_size=8).hexdigest()
+
+
+def read_lines(f, length):
+    """Строки следующих length байт файла без перевода строки."""
+    for line in f:
+        if length <= 0:
+            return
+        if len(line) > length:
+            line = line[:length]
+        length -= len(line)
+        yield line.rstrip(b"\r\n")
+
+
+def read_records(lines, batch=LOAD_BATCH):
+    """Записи истории пачками; пачка разбирается одним вызовом json.loads.
+
+    Разбор по строке в несколько раз медленнее. До испорченной строки
+    (недописанной после сбоя) записи пачки разбираются по одной.
+    """
+    lines = iter(lines)
+    while True:
+        chunk = list(islice(lines, batch))
+        if not chunk:
+            return
+        try:
+            yield json.loads(b"[" + b",".join(chunk) + b"]")
+        except ValueError:
+            records = []
+            for line in chunk:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+            yield records
+            return
+
+
+def weak_topics(ranked, subject, limit=WEAK_TOPICS_PRACTICE):
+    """Слабейшие темы предмета из сводки topic_stats."""
+    topics = [item["topic"] for item in ranked if item["subject"] == subject]
+    return topics[:limit]
+
+
+def weak_topics_report(ranked, limit=WEAK_TOPICS_SHOWN):
+    """Текст для вкладки статистики."""
+    if not ranked:
+        return ""
+    lines = ["Слабые темы (что повторить):"]
+    for item in ranked[:limit]:
+        subject = SUBJECT_NAMES.get(item["subject"], item["subject"])
+        if item["trend"] > 0.02:
+            trend = "↑"
+        elif item["trend"] < -0.02:
+            trend = "↓"
+        else:
+            trend = "→"
+        lines.append(
+            f"{subject}, {item['topic']}: {item['recent'] * 100:.0f}% {trend} "
+            f"({item['correct']}/{item['attempts']})"
+        )
+    return "\n".join(lines)
@@ -1,22 +1,110 @@
+import time
+IMPORT_STARTED = time.perf_counter()
+
 import toga
 from toga.style import Pack
 from toga.style.pack import COLUMN, ROW, CENTER
-import requests
 import json
 import os
 import asyncio
-import csv
-import io
+import bisect
+import functools
+import heapq
+import random
+
+from ege_shpargalka.analytics import (
+    PRACTICE_SHARE, available as analytics_available, load_history, weak_topics, weak_topics_report
+)
+from ege_shpargalka.cache import conditional_headers, load_cache, save_cache, validators_from_headers
+from ege_shpargalka.core import add_batch, ingest_source, is_url, stats_report
+from ege_shpargalka.delta import DeltaError, fetch_manifest, update_tasks
+from ege_shpargalka.download import format_speed
+from ege_shpargalka.grading import grade_variant, variant_event
+from ege_shpargalka.history import attempt_event
+from ege_shpargalka.ingest import AUTO_DELIMITER
+from ege_shpargalka.journal import StatsJournal
+from ege_shpargalka.matching import compile_answer
+from ege_shpargalka.merge import MERGED_SOURCE, MergedBank
+from ege_shpargalka.metrics import ERROR, INFO, WARNING, log, metrics, task_memory, timed
+from ege_shpargalka.pacing import IDLE_LIMIT, SolveTimes
+from ege_shpargalka.scheduler import Scheduler
+from ege_shpargalka.search import SearchIndex
+from ege_shpargalka.sync import BASE_URL, sync_banks
+from ege_shpargalka.timer import ExamTimer, format_remaining
+from ege_shpargalka.variants import VariantIndex
+
+# requests и sqlite3 импортируются при первой загрузке заданий
+IMPORT_TIME = time.perf_counter() - IMPORT_STARTED
+
+# Бюджет времени до показа окна (секунды)
+STARTUP_BUDGET = 1.0
+
+# Варианты разделителя CSV в настройках
+DELIMITER_NAMES = {
+    AUTO_DELIMITER: "Определять автоматически",
+    ",": "Запятая (,)",
+    ";": "Точка с запятой (;)",
+    "\t": "Табуляция (\\t)"
+}
 
 class EGEShpargalka(toga.App):
     def startup(self):
+        startup_started = time.perf_counter()
+        
         # Настройки
         self.settings_file = "ege_settings.json"
-        self.tasks_file = "tasks_cache.json"
+        self.tasks_file = "tasks_cache.bin"
+        self.variant_state_file = "variant_state.json"
+        # Недокачанные банки: загрузка продолжается с места обрыва
+        self.downloads_dir = "downloads"
         
         # Загрузка сохраненных данных
         self.settings = self.load_settings()
+        self.stats_journal = StatsJournal("stats.json", "stats_journal.jsonl", "attempts.jsonl")
         self.stats = self.load_stats()
+        self.scheduler = Scheduler(self.stats)
+        
+        # Время решения: кольца по темам и перцентили по ним
+        self.solve_times = SolveTimes.from_stats(self.stats['solve_times'])
+        self.task_shown_at = None
+        
+        # История попыток для поиска слабых тем; читается в фоне после запуска
+        self.attempt_history = None
+        self.pending_attempts = None
+        self.topic_ranking_cache = (None, [])
+        # Сводка слабых тем на вкладке статистики устарела: пересчитается при открытии
+        self.weak_topics_stale = True
+        # Последний решенный номер задания из слабой темы по (предмет, тема):
+        # выбор продолжается с него, а не просматривает тему сначала
+        self.topic_cursors = {}
+        # ((предмет, тема), номер) последнего задания, выданного из слабой темы
+        self.weak_pick = None
+        
+        # Хранилище заданий: файловый кэш или база SQLite для больших банков
+        self.task_store = None
+        if self.settings.get("task_store") == "sqlite":
+            from ege_shpargalka.store import TaskStore
+            self.task_store = TaskStore("tasks.db")
+        
+        # Задания и индексы по ним
+        self.current_subject = None
+        self.current_task_index = 0
+        self.tasks_data = {}
+        # Откуда загружен текущий банк и объединенный банк из нескольких источников
+        self.tasks_source = None
+        self.bank = None
+        # Идущий импорт банка в процессе-работнике
+        self.bank_import = None
+        self.current_task = None
+        self.search_index = SearchIndex()
+        self.variant_index = VariantIndex(complete=True)
+        # Устанавливается, когда индексы текущего банка заполнены целиком
+        self.indexes_ready = asyncio.Event()
+        self.indexes_ready.set()
+        
+        # Собранный вариант и его таймер
+        self.variant = None
+        self.variant_timer = None
         
         # Основное окно
         self.main_window = toga.MainWindow(
@@ -27,34 +115,49 @@ class EGEShpargalka(toga.App):
         # Создаем основные вкладки
         self.create_main_interface()
         
-        # Асинхронная загрузка заданий
+        # Продолжаем вариант, прерванный закрытием приложения
+        self.restore_variant()
+        
+        now = time.perf_counter()
+        self.startup_times = {
+            "import": IMPORT_TIME,
+            "startup": now - startup_started,
+            "first_window": now - IMPORT_STARTED
+        }
+        for name, seconds in self.startup_times.items():
+            metrics.gauge(f"startup.{name}_ms", round(seconds * 1000, 1))
+        log(INFO, (
+            f"Запуск: импорт {IMPORT_TIME * 1000:.0f} мс, "
+            f"до показа окна {self.startup_times['first_window'] * 1000:.0f} мс"
+        ))
+        if self.startup_times["first_window"] > STARTUP_BUDGET:
+            log(WARNING, f"Запуск дольше бюджета {STARTUP_BUDGET * 1000:.0f} мс")
+        
+        # Асинхронная загрузка заданий и истории попыток
         asyncio.create_task(self.load_tasks_async())
+        asyncio.create_task(self.load_attempt_history())
         
     def create_main_interface(self):
         """Создает основной интерфейс с вкладками."""
         
-        # Вкладка с предметами
+        # Вкладка с предметами видна сразу, остальные строятся при первом открытии
         subjects_tab = self.create_subjects_tab()
-        
-        # Вкладка с вариантами
-        variants_tab = self.create_variants_tab()
-        
-        # Вкладка со статистикой
-        stats_tab = self.create_stats_tab()
-        
-        # Вкладка с настройками
-        settings_tab = self.create_settings_tab()
+        self.tab_builders = {
+            "Варианты": self.create_variants_tab,
+            "Статистика": self.create_stats_tab,
+            "Настройки": self.create_settings_tab
+        }
+        self.tab_boxes = {
+            title: toga.Box(style=Pack(direction=COLUMN, flex=1)) for title in self.tab_builders
+        }
+        self.built_tabs = set()
         
         # Контейнер вкладок
         self.option_container = toga.OptionContainer(
             id="main_tabs",
             style=Pack(flex=1),
-            content=[
-                ("Предметы", subjects_tab),
-                ("Варианты", variants_tab),
-                ("Статистика", stats_tab),
-                ("Настройки", settings_tab)
-            ]
+            content=[("Предметы", subjects_tab)] + list(self.tab_boxes.items()),
+            on_select=self.on_tab_select
         )
         
         # Кнопка закрытия в нижней панели
@@ -112,6 +215,20 @@ class EGEShpargalka(toga.App):
             )
             subject_buttons_box.add(btn)
         
+        # Поиск по тексту заданий
+        self.search_input = toga.TextInput(
+            placeholder="Поиск по заданиям...",
+            on_change=self.search_tasks,
+            style=Pack(padding=10, margin=(0, 20))
+        )
+        
+        self.search_results = toga.Table(
+            headings=["Предмет", "Задание"],
+            accessors=["subject_name", "question"],
+            on_select=self.open_search_result,
+            style=Pack(height=150, margin=(0, 20))
+        )
+        
         # Область отображения заданий
         self.task_label = toga.Label(
             "Выберите предмет для начала подготовки",
@@ -174,6 +291,8 @@ class EGEShpargalka(toga.App):
                     )
                 ),
                 subject_buttons_box,
+                self.search_input,
+                self.search_results,
                 toga.Box(
                     children=[self.task_label],
                     style=Pack(padding=20, background_color="#f8f9fa")
@@ -186,12 +305,6 @@ class EGEShpargalka(toga.App):
             style=Pack(direction=COLUMN, padding=10)
         )
         
-        # Инициализируем переменные для заданий
-        self.current_subject = None
-        self.current_task_index = 0
-        self.tasks_data = {}
-        self.current_task = None
-        
         return tab_content
     
     def create_variants_tab(self):
@@ -205,19 +318,27 @@ class EGEShpargalka(toga.App):
         # Информация
         info = toga.Label(
             "Выберите вариант для тренировки:\n\n"
-            "• Вариант включает задания из всех предметов\n"
+            "• Вариант собирается из банка: по одному заданию на каждый номер ЕГЭ\n"
+            "• Вариант с тем же номером одинаков у всех учеников\n"
             "• На выполнение дается 3 часа 55 минут\n"
             "• Результаты сохраняются в статистике",
             style=Pack(padding=20, font_size=14, text_align=CENTER)
         )
         
+        # Предмет варианта
+        self.variant_subject_selection = toga.Selection(
+            items=["Математика", "Физика", "Информатика", "Русский язык"],
+            value="Математика",
+            style=Pack(padding=10, margin=(0, 20))
+        )
+        
         # Кнопки вариантов
         variants_box = toga.Box(style=Pack(direction=ROW, padding=20, alignment=CENTER))
         
         for i in range(1, 6):
             btn = toga.Button(
                 f"Вариант #{i}",
-                on_press=lambda widget, variant=i: self.start_variant(variant),
+                on_press=functools.partial(self.choose_variant, variant_number=i),
                 style=Pack(
                     padding=15,
                     margin=(0, 10),
@@ -231,7 +352,7 @@ class EGEShpargalka(toga.App):
         
         # Таймер и состояние
         self.timer_label = toga.Label(
-            "Время: 03:55:00",
+            f"Время: {format_remaining(self.settings.get('variant_time', 235) * 60)}",
             style=Pack(padding=10, font_size=16, font_weight="bold", color="#dc3545")
         )
         
@@ -265,18 +386,62 @@ class EGEShpargalka(toga.App):
         control_box.add(pause_button)
         control_box.add(finish_button)
         
+        # Текущее задание варианта
+        self.variant_task_label = toga.Label(
+            "",
+            style=Pack(padding=20, font_size=16)
+        )
+        
+        self.variant_answer_input = toga.TextInput(
+            placeholder="Ответ на задание...",
+            style=Pack(padding=10, margin=(0, 20))
+        )
+        
+        navigation_box = toga.Box(style=Pack(direction=ROW, padding=10, alignment=CENTER))
+        navigation_box.add(toga.Button(
+            "← Назад",
+            on_press=lambda widget: self.show_variant_task(-1),
+            style=Pack(padding=10, margin=(0, 5))
+        ))
+        navigation_box.add(toga.Button(
+            "Далее →",
+            on_press=lambda widget: self.show_variant_task(1),
+            style=Pack(padding=10, margin=(0, 5))
+        ))
+        
         return toga.Box(
             children=[
                 header,
                 info,
+                self.variant_subject_selection,
                 variants_box,
                 self.timer_label,
                 self.variant_status_label,
-                control_box
+                control_box,
+                self.variant_task_label,
+                self.variant_answer_input,
+                navigation_box
             ],
             style=Pack(direction=COLUMN, padding=10)
         )
     
+    def ensure_tab(self, title):
+        """Строит содержимое вкладки, если оно еще не построено."""
+        if title not in self.tab_builders or title in self.built_tabs:
+            return
+        self.built_tabs.add(title)
+        self.tab_boxes[title].add(self.tab_builders[title]())
+        if title == "Статистика":
+            self.refresh_stats_display()
+    
+    def on_tab_select(self, widget, **kwargs):
+        """Строит вкладку при первом открытии."""
+        tab = widget.current_tab
+        if tab is not None:
+            self.ensure_tab(tab.text)
+            if tab.text == "Статистика" and self.weak_topics_stale:
+                self.refresh_weak_topics()
+    
     def create_stats_tab(self):
         """Создает вкладку со статистикой."""
         # Заголовок
@@ -297,6 +462,18 @@ class EGEShpargalka(toga.App):
             style=Pack(padding=20, font_size=14)
         )
         
+        # Слабые темы по истории попыток
+        self.weak_topics_label = toga.Label(
+            "",
+            style=Pack(padding=20, font_size=14)
+        )
+        
+        # Время решения по предметам, сложности и темам
+        self.pacing_label = toga.Label(
+            "",
+            style=Pack(padding=20, font_size=14)
+        )
+        
         # Кнопки управления статистикой
         buttons_box = toga.Box(style=Pack(direction=ROW, padding=10, alignment=CENTER))
         
@@ -320,6 +497,8 @@ class EGEShpargalka(toga.App):
                 header,
                 self.total_stats_label,
                 self.subjects_stats_label,
+                self.weak_topics_label,
+                self.pacing_label,
                 buttons_box
             ],
             style=Pack(direction=COLUMN, padding=10)
@@ -334,7 +513,7 @@ class EGEShpargalka(toga.App):
         )
         
         # URL вашего репозитория GitHub
-        base_url = "https://raw.githubusercontent.com/Durashca/egeHelpDB/main/"
+        base_url = BASE_URL
         
         # Создаем выбор файлов из репозитория
         file_label = toga.Label(
@@ -356,7 +535,7 @@ class EGEShpargalka(toga.App):
         
         # URL для загрузки
         self.csv_url_input = toga.TextInput(
-            value=base_url + "mathematic.csv",
+            value=self.settings.get("csv_url", base_url + "mathematic.csv"),
             placeholder="URL CSV файла",
             style=Pack(padding=10, margin=(0, 20))
         )
@@ -368,14 +547,46 @@ class EGEShpargalka(toga.App):
         )
         
         self.delimiter_selection = toga.Selection(
-            items=["Запятая (,)", "Точка с запятой (;)", "Табуляция (\\t)"],
-            value="Запятая (,)",
+            items=list(DELIMITER_NAMES.values()),
+            value=DELIMITER_NAMES.get(
+                self.settings.get("delimiter", AUTO_DELIMITER), DELIMITER_NAMES[AUTO_DELIMITER]
+            ),
             style=Pack(padding=10, margin=(0, 20))
         )
         
         # Обработчик изменения выбора файла
         self.file_selection.on_change = self.update_csv_url
         
+        # Режим объединения: новый источник добавляется к банку, а не заменяет его
+        self.merge_switch = toga.Switch(
+            "Добавлять задания к банку (объединять источники, можно указать путь к файлу)",
+            value=self.settings.get("merge_sources", False)
+        )
+        
+        # Источники объединенного банка
+        self.sources_selection = toga.Selection(
+            items=[],
+            style=Pack(padding=10, margin=(0, 20))
+        )
+        sources_buttons = toga.Box(style=Pack(direction=ROW, padding=(0, 20)))
+        sources_buttons.add(toga.Button(
+            "Обновить источник",
+            on_press=self.refresh_selected_source,
+            style=Pack(padding=5, margin=(0, 5))
+        ))
+        sources_buttons.add(toga.Button(
+            "Удалить источник",
+            on_press=self.remove_selected_source,
+            style=Pack(padding=5, margin=(0, 5))
+        ))
+        self.update_sources_selection()
+        
+        # Переключатель хранилища заданий
+        self.sqlite_switch = toga.Switch(
+            "Хранить задания в базе SQLite (для больших банков)",
+            value=self.settings.get("task_store") == "sqlite"
+        )
+        
         # Переключатель авто-проверки
         self.auto_check_switch = toga.Switch(
             "Автоматическая проверка ответов",
@@ -409,8 +620,23 @@ class EGEShpargalka(toga.App):
             style=Pack(padding=10, margin=(0, 5), background_color="#17a2b8", color="white")
         )
         
+        sync_button = toga.Button(
+            "Синхронизировать все предметы",
+            on_press=self.sync_all_subjects,
+            style=Pack(padding=10, margin=(0, 5), background_color="#6f42c1", color="white")
+        )
+        
+        self.cancel_import_button = toga.Button(
+            "Отменить загрузку",
+            on_press=self.cancel_import,
+            enabled=self.bank_import is not None,
+            style=Pack(padding=10, margin=(0, 5))
+        )
+        
         buttons_box.add(save_button)
         buttons_box.add(load_button)
+        buttons_box.add(sync_button)
+        buttons_box.add(self.cancel_import_button)
         
         # Статус загрузки
         self.settings_status_label = toga.Label(
@@ -418,6 +644,39 @@ class EGEShpargalka(toga.App):
             style=Pack(padding=10, font_size=12)
         )
         
+        # Скрытый раздел диагностики: метрики производительности
+        debug_toggle = toga.Button(
+            "Диагностика",
+            on_press=self.toggle_debug_section,
+            style=Pack(padding=5, margin=(10, 20), font_size=10, color="#6c757d")
+        )
+        
+        self.debug_output = toga.MultilineTextInput(
+            readonly=True,
+            style=Pack(height=300, margin=(0, 20), font_family="monospace", font_size=10)
+        )
+        
+        debug_buttons = toga.Box(style=Pack(direction=ROW, padding=10))
+        debug_buttons.add(toga.Button(
+            "Обновить метрики",
+            on_press=self.refresh_debug_section,
+            style=Pack(padding=5, margin=(0, 5))
+        ))
+        debug_buttons.add(toga.Button(
+            "Сохранить в metrics.json",
+            on_press=self.dump_metrics,
+            style=Pack(padding=5, margin=(0, 5))
+        ))
+        
+        self.debug_section = toga.Box(
+            children=[self.debug_output, debug_buttons],
+            style=Pack(direction=COLUMN)
+        )
+        self.debug_visible = False
+        
+        # Раздел диагностики добавляется в этот контейнер по кнопке
+        self.debug_container = toga.Box(style=Pack(direction=COLUMN))
+        
         return toga.Box(
             children=[
                 header,
@@ -426,18 +685,56 @@ class EGEShpargalka(toga.App):
                 self.csv_url_input,
                 delimiter_label,
                 self.delimiter_selection,
+                self.merge_switch,
+                self.sources_selection,
+                sources_buttons,
                 self.auto_check_switch,
+                self.sqlite_switch,
                 time_label,
                 self.variant_time_input,
                 buttons_box,
-                self.settings_status_label
+                self.settings_status_label,
+                debug_toggle,
+                self.debug_container
             ],
             style=Pack(direction=COLUMN)
         )
     
+    def toggle_debug_section(self, widget):
+        """Показывает или скрывает раздел диагностики."""
+        self.debug_visible = not self.debug_visible
+        if self.debug_visible:
+            self.debug_container.add(self.debug_section)
+            self.refresh_debug_section(widget)
+        else:
+            self.debug_container.remove(self.debug_section)
+    
+    def refresh_debug_section(self, widget):
+        """Выводит текущий снимок метрик."""
+        self.update_memory_metrics()
+        self.debug_output.value = json.dumps(metrics.snapshot(), indent=2, ensure_ascii=False)
+    
+    def dump_metrics(self, widget):
+        """Сохраняет метрики в JSON для отправки разработчикам."""
+        self.update_memory_metrics()
+        try:
+            metrics.dump("metrics.json")
+            self.settings_status_label.text = f"Метрики сохранены: {os.path.abspath('metrics.json')}"
+            self.settings_status_label.style.color = "#28a745"
+        except Exception as e:
+            self.settings_status_label.text = f"Ошибка сохранения метрик: {e}"
+            self.settings_status_label.style.color = "#dc3545"
+    
+    def selected_delimiter(self):
+        """Разделитель, выбранный в настройках, или AUTO_DELIMITER."""
+        for delimiter, name in DELIMITER_NAMES.items():
+            if name == self.delimiter_selection.value:
+                return delimiter
+        return AUTO_DELIMITER
+    
     def update_csv_url(self, widget):
         """Обновляет URL при выборе файла."""
-        base_url = "https://raw.githubusercontent.com/Durashca/egeHelpDB/main/"
+        base_url = BASE_URL
         
         selected = widget.value
         if selected:
@@ -448,22 +745,307 @@ class EGEShpargalka(toga.App):
     async def load_tasks_async(self):
         """Асинхронная загрузка заданий."""
         try:
-            # Пробуем загрузить из кэша
-            if os.path.exists(self.tasks_file):
-                with open(self.tasks_file, 'r', encoding='utf-8') as f:
-                    self.tasks_data = json.load(f)
-                print(f"Загружено {len(self.tasks_data)} предметов из кэша")
+            url = self.settings.get("csv_url", "")
+            delimiter = self.settings.get("delimiter", AUTO_DELIMITER)
+            
+            # Объединенный банк хранится в кэше под отдельным ключом
+            if self.settings.get("merge_sources"):
+                entry = self.load_cached_tasks(MERGED_SOURCE, AUTO_DELIMITER)
+                if entry is not None:
+                    self.bank = MergedBank.from_entry(entry)
+                    self.tasks_data = self.bank.tasks_data
+                    self.rebuild_task_indexes()
+                    log(INFO, f"Загружен объединенный банк: {len(self.bank.sources)} источников")
+                    return
+            
+            # Пробуем загрузить из кэша для текущего источника
+            entry = self.load_cached_tasks(url, delimiter)
+            if entry is not None:
+                self.tasks_data = entry["tasks"]
+                self.tasks_source = url
+                self.rebuild_task_indexes()
+                log(INFO, f"Загружено {len(self.tasks_data)} предметов из кэша")
+                
+                # Проверяем актуальность кэша в фоне, не задерживая запуск
+                if url.startswith("http"):
+                    asyncio.create_task(self.revalidate_tasks(url, delimiter, entry))
+                return
+            
+            # Кэш мог быть собран синхронизацией всех предметов
+            entry = self.load_cached_tasks(BASE_URL, delimiter)
+            if entry is not None:
+                self.tasks_data = entry["tasks"]
+                self.tasks_source = BASE_URL
+                self.rebuild_task_indexes()
+                log(INFO, f"Загружено {len(self.tasks_data)} предметов из кэша")
+                asyncio.create_task(self.sync_all_subjects(None, show_message=False))
                 return
             
             # Загружаем с GitHub если есть URL
-            url = self.settings.get("csv_url", "")
             if url and url.startswith("http"):
                 await self.load_tasks_from_url(None, show_message=False)
             
         except Exception as e:
-            print(f"Ошибка при загрузке заданий: {e}")
+            log(ERROR, f"Ошибка при загрузке заданий: {e}")
             # Создаем тестовые данные
             self.tasks_data = self.create_sample_tasks()
+            self.rebuild_task_indexes()
+        finally:
+            # Восстановленный вариант можно показать, когда задания загружены
+            if self.variant:
+                self.render_variant_task()
+    
+    @timed("cache.load")
+    def load_cached_tasks(self, url, delimiter):
+        """Возвращает сохраненные задания источника из выбранного хранилища."""
+        if self.task_store:
+            return self.task_store.load(url, delimiter)
+        return load_cache(self.tasks_file, url, delimiter)
+    
+    @timed("cache.save")
+    def save_cached_tasks(self, url, delimiter, tasks_data, headers=None, files=None, sync=None, hashes=None):
+        """Сохраняет задания в выбранное хранилище.
+        
+        Возвращает сохраненную запись; в базе SQLite ее задания читаются
+        по индексу, поэтому загруженные списки можно освободить.
+        """
+        if self.task_store:
+            return self.task_store.save(url, delimiter, tasks_data, headers, files, sync, hashes)
+        return save_cache(self.tasks_file, url, delimiter, tasks_data, headers, files, sync,
+                          versioned=True, hashes=hashes)
+    
+    async def revalidate_tasks(self, url, delimiter, entry):
+        """Проверяет актуальность кэша условным запросом и обновляет задания."""
+        try:
+            delta = await self.fetch_delta(url, delimiter, entry)
+            if delta is not None:
+                await self.apply_delta(url, delimiter, entry, delta)
+                return
+            
+            # Банк из кэша уже показан: заменяем его только готовым
+            kind, payload = await self.import_tasks(
+                url, delimiter, conditional_headers(entry), live=False, show_message=False
+            )
+            if kind == "not_modified":
+                log(INFO, "Кэш заданий актуален")
+                return
+            if kind != "done":
+                raise RuntimeError(payload or kind)
+            
+            log(INFO, f"Кэш заданий обновлен: {payload['count']} заданий")
+            self.refresh_stats_display()
+        except Exception as e:
+            log(WARNING, f"Не удалось проверить актуальность кэша: {e}")
+    
+    async def fetch_delta(self, url, delimiter, entry):
+        """Обновляет банк по манифесту, скачивая только изменившиеся куски.
+        
+        Возвращает результат update_tasks или None, если манифеста нет
+        или файл не совпал с ним — тогда файл загружается целиком.
+        """
+        import requests
+        
+        try:
+            manifest = await asyncio.to_thread(fetch_manifest, requests, url)
+            if manifest is None:
+                return None
+            return await asyncio.to_thread(
+                update_tasks, requests, url, delimiter, manifest,
+                entry["tasks"] if entry else None, entry.get("sync") if entry else None
+            )
+        except (DeltaError, requests.exceptions.RequestException) as e:
+            # Сбой сервера или сети при дельте не мешает загрузить файл целиком
+            log(WARNING, f"Дельта-обновление не удалось, загружаем файл целиком: {e}")
+            return None
+    
+    async def apply_delta(self, url, delimiter, entry, delta):
+        """Подставляет задания, собранные по манифесту. Возвращает текст для статуса."""
+        self.tasks_source = url
+        if delta["changed"]:
+            saved = await asyncio.to_thread(
+                self.save_cached_tasks, url, delimiter, delta["tasks"], sync=delta["sync"]
+            )
+            self.tasks_data = saved["tasks"]
+            total = delta["fetched_chunks"] + delta["reused_chunks"]
+            message = (
+                f"Обновлено {delta['count']} заданий: загружено {delta['fetched_chunks']} "
+                f"из {total} частей файла ({delta['fetched_bytes'] // 1024} КБ)"
+            )
+        else:
+            self.tasks_data = entry["tasks"]
+            self.tasks_source = url
+            message = "Задания не изменились, используется кэш"
+        self.rebuild_task_indexes()
+        log(INFO, message)
+        self.refresh_stats_display()
+        return message
+    
+    async def import_tasks(self, url, delimiter, request_headers=None, live=True, show_message=True):
+        """Импортирует банк в процессе-работнике.
+        
+        Разбор и запись кэша идут вне цикла событий. При live=True задания
+        доступны в self.tasks_data по мере разбора: каждая пачка дописывается
+        в банк и в индексы, а когда кэш записан, банк переходит на файл
+        работника с теми же номерами заданий без повторного построения
+        индексов. Иначе банк заменяется целиком после записи кэша.
+        Возвращает завершающее сообщение работника (вид, данные); при
+        отмене и ошибке прежний банк восстанавливается.
+        """
+        from ege_shpargalka.worker import BankImport
+        
+        cache = ("sqlite", self.task_store.path) if self.task_store else ("file", self.tasks_file)
+        previous = (self.tasks_data, self.tasks_source, self.search_index, self.variant_index,
+                    self.indexes_ready, self.topic_cursors)
+        job = self.bank_import = BankImport(
+            url, delimiter, cache, url, request_headers, self.downloads_dir, send_batches=live
+        )
+        job.start()
+        self.update_import_controls()
+        
+        tasks_data = None
+        indexed = 0
+        total = None
+        speed = ""
+        task_count = 0
+        final = None
+        try:
+            async for kind, payload in job.events():
+                if kind == "start":
+                    total = payload
+                elif kind == "progress":
+                    received, total, bytes_per_second = payload
+                    speed = f", {format_speed(bytes_per_second)}"
+                    if show_message:
+                        done = f", {received * 100 // total}%" if total else ""
+                        self.settings_status_label.text = f"Загрузка заданий... ({task_count}{done}{speed})"
+                elif kind == "batch":
+                    batch, task_count, bytes_read = payload
+                    if job.cancel_event.is_set():
+                        continue
+                    if show_message:
+                        done = f", {bytes_read * 100 // total}%" if total else ""
+                        self.settings_status_label.text = f"Загрузка заданий... ({task_count}{done}{speed})"
+                    if batch is None:
+                        continue
+                    if tasks_data is None:
+                        tasks_data = self.tasks_data = {}
+                        self.tasks_source = url
+                        self.replace_task_indexes()
+                    # В индексы попадают только задания этой пачки
+                    for subject, position, task in add_batch(tasks_data, batch):
+                        self.search_index.add(subject, position, task)
+                        self.variant_index.add(subject, position, task)
+                        compile_answer(str(task['answer']).strip())
+                    indexed += len(batch)
+                    # Отдаем управление циклу событий после каждой пачки
+                    await asyncio.sleep(0)
+                else:
+                    final = (kind, payload)
+        finally:
+            self.bank_import = None
+            self.update_import_controls()
+        
+        kind, payload = final
+        if kind == "done":
+            # Кэш записан работником: задания читаются из его файла
+            if self.task_store:
+                entry = self.task_store.load(url, delimiter)
+            else:
+                entry = load_cache(payload["cache"], url, delimiter)
+            if entry is None:
+                final = ("error", "кэш, записанный работником, не читается")
+            else:
+                self.tasks_data = entry["tasks"]
+                self.tasks_source = url
+                if tasks_data is not None and indexed == payload["count"]:
+                    # Номера заданий в файле те же, что в пачках: индексы уже готовы
+                    self.variant_index.complete = True
+                    self.indexes_ready.set()
+                    self.update_memory_metrics()
+                    if self.variant:
+                        self.resume_variant_timer()
+                else:
+                    self.rebuild_task_indexes()
+                return final
+        if tasks_data is not None:
+            # Задания, показанные во время импорта, убираем
+            self.indexes_ready.set()
+            (self.tasks_data, self.tasks_source, self.search_index, self.variant_index,
+             self.indexes_ready, self.topic_cursors) = previous
+        return final
+    
+    def update_import_controls(self):
+        """Кнопка отмены доступна, пока идет импорт."""
+        if "Настройки" in self.built_tabs:
+            self.cancel_import_button.enabled = self.bank_import is not None
+    
+    def cancel_import(self, widget):
+        """Останавливает импорт банка; прежний банк остается."""
+        if self.bank_import is not None:
+            self.bank_import.cancel()
+            self.settings_status_label.text = "Отмена загрузки..."
+            self.settings_status_label.style.color = "#17a2b8"
+    
+    async def sync_all_subjects(self, widget, show_message=True):
+        """Одновременно загружает банки заданий по всем предметам."""
+        self.ensure_tab("Настройки")
+        urls = [BASE_URL + item.value.split(" (")[0] for item in self.file_selection.items]
+        delimiter = self.settings.get("delimiter", AUTO_DELIMITER)
+        
+        # Валидаторы файлов из прошлой синхронизации: неизмененные не скачиваем
+        entry = self.load_cached_tasks(BASE_URL, delimiter)
+        old_files = entry["files"] if entry else {}
+        files = {}
+        errors = []
+        
+        if show_message:
+            self.settings_status_label.text = f"Синхронизация: 0 из {len(urls)} файлов..."
+            self.settings_status_label.style.color = "#17a2b8"
+        
+        def on_bank(url, result):
+            """Добавляет задания файла сразу после его загрузки."""
+            if isinstance(result, Exception):
+                errors.append(f"{url.split('/')[-1]}: {result}")
+                log(ERROR, f"Ошибка синхронизации {url}: {result}", key="sync")
+                return
+            
+            if result is None:
+                # 304: берем задания этого файла из кэша
+                files[url] = old_files[url]
+                tasks_data = {s: entry["tasks"].get(s, []) for s in old_files[url]["subjects"]}
+            else:
+                tasks_data, headers, sync = result
+                files[url] = {**validators_from_headers(headers), "subjects": list(tasks_data), "sync": sync}
+            
+            self.tasks_data.update(tasks_data)
+            self.tasks_source = BASE_URL
+            if show_message:
+                self.settings_status_label.text = f"Синхронизация: {len(files)} из {len(urls)} файлов..."
+        
+        await sync_banks(
+            urls, delimiter, validators=old_files, on_bank=on_bank,
+            cached=entry["tasks"] if entry else None
+        )
+        
+        if files:
+            subjects = {s for info in files.values() for s in info["subjects"]}
+            entry = self.save_cached_tasks(
+                BASE_URL, delimiter, {s: self.tasks_data[s] for s in subjects}, files=files
+            )
+            self.tasks_data.update(entry["tasks"])
+        self.rebuild_task_indexes()
+        
+        task_count = sum(len(tasks) for tasks in self.tasks_data.values())
+        log(INFO, f"Синхронизировано {len(files)} файлов, заданий: {task_count}")
+        if show_message:
+            if errors:
+                self.settings_status_label.text = "Синхронизация с ошибками:\n" + "\n".join(errors)
+                self.settings_status_label.style.color = "#dc3545"
+            else:
+                self.settings_status_label.text = f"Синхронизировано {len(files)} файлов, всего {task_count} заданий"
+                self.settings_status_label.style.color = "#28a745"
+        
+        self.refresh_stats_display()
     
     def create_sample_tasks(self):
         """Создает тестовые задания для всех предметов."""
@@ -512,8 +1094,10 @@ class EGEShpargalka(toga.App):
         """Загружает настройки из файла."""
         default_settings = {
             "csv_url": "https://raw.githubusercontent.com/Durashca/egeHelpDB/main/mathematic.csv",
-            "delimiter": ",",
+            "delimiter": AUTO_DELIMITER,
             "auto_check": True,
+            "task_store": "file",
+            "merge_sources": False,
             "variant_time": 235
         }
         
@@ -525,51 +1109,146 @@ class EGEShpargalka(toga.App):
                     default_settings.update(loaded)
                     return default_settings
         except Exception as e:
-            print(f"Ошибка загрузки настроек: {e}")
+            log(ERROR, f"Ошибка загрузки настроек: {e}")
         
         return default_settings
     
     def load_stats(self):
-        """Загружает статистику из файла."""
-        default_stats = {
-            "total_attempts": 0,
-            "correct_answers": 0,
-            "subjects": {
-                "math": {"attempts": 0, "correct": 0},
-                "physics": {"attempts": 0, "correct": 0},
-                "informatics": {"attempts": 0, "correct": 0},
-                "russian": {"attempts": 0, "correct": 0}
-            },
-            "variants_completed": 0,
-            "best_score": 0
-        }
+        """Загружает статистику из снимка и журнала попыток."""
+        return self.stats_journal.load()
+    
+    def record_stats_event(self, event):
+        """Учитывает событие в статистике и ставит его в журнал.
+        
+        self.stats — та же статистика, что у журнала: событие к ней
+        применяет journal.append. Запись на диск выполняет фоновый поток
+        журнала.
+        """
+        self.stats_journal.append(event)
+        
+        # Новый срок повторения задания
+        attempts = [event] if event["type"] == "attempt" else event.get("attempts", [])
+        for attempt in attempts:
+            if "position" in attempt:
+                self.scheduler.push(attempt["subject"], attempt["position"])
+        
+        # Время решения
+        if event["type"] == "reset":
+            self.solve_times = SolveTimes()
+        for attempt in attempts:
+            if "seconds" in attempt:
+                self.solve_times.add(attempt["subject"], attempt.get("topic"),
+                                     attempt.get("difficulty"), attempt["seconds"])
+        
+        # История для слабых тем; пока она читается с диска, попытки ждут
+        if event["type"] == "reset":
+            if self.attempt_history is not None:
+                self.attempt_history.clear()
+            if self.pending_attempts is not None:
+                self.pending_attempts.clear()
+        elif self.attempt_history is not None:
+            for attempt in attempts:
+                self.attempt_history.add(attempt)
+        elif self.pending_attempts is not None:
+            self.pending_attempts.extend(attempts)
+    
+    async def load_attempt_history(self):
+        """Читает историю попыток в столбцы NumPy, не блокируя интерфейс."""
+        if not await asyncio.to_thread(analytics_available):
+            log(INFO, "NumPy не установлен: слабые темы не считаются")
+            return
         
+        # Читаем файл до текущего конца; более новые попытки придут событиями
+        self.pending_attempts = []
+        await asyncio.to_thread(self.stats_journal.flush)
+        path = self.stats_journal.history_path
+        size = os.path.getsize(path) if os.path.exists(path) else 0
         try:
-            if os.path.exists("stats.json"):
-                with open("stats.json", 'r', encoding='utf-8') as f:
-                    loaded = json.load(f)
-                    # Объединяем с дефолтными на случай отсутствия ключей
-                    for key in default_stats:
-                        if key in loaded:
-                            if isinstance(default_stats[key], dict) and isinstance(loaded[key], dict):
-                                default_stats[key].update(loaded[key])
-                            else:
-                                default_stats[key] = loaded[key]
+            history = await asyncio.to_thread(load_history, path, size)
         except Exception as e:
-            print(f"Ошибка загрузки статистики: {e}")
+            log(ERROR, f"Ошибка загрузки истории попыток: {e}")
+            self.pending_attempts = None
+            return
         
-        return default_stats
+        for attempt in self.pending_attempts:
+            history.add(attempt)
+        self.pending_attempts = None
+        self.attempt_history = history
+        log(INFO, f"История попыток: {len(history)} записей")
+        self.refresh_stats_display()
     
+    @timed("analytics.topic_stats")
+    def topic_ranking(self):
+        """Темы от слабейшей к сильнейшей; пересчитывается после новых попыток."""
+        if self.attempt_history is None:
+            return []
+        version, ranked = self.topic_ranking_cache
+        if version != self.attempt_history.version:
+            ranked = self.attempt_history.topic_stats()
+            self.topic_ranking_cache = (self.attempt_history.version, ranked)
+        return ranked
+    
+    def topic_buckets(self, subject, topic):
+        """Корзины вариантов с заданиями темы: массивы номеров по возрастанию."""
+        for buckets in self.variant_index.buckets.get(subject, {}).values():
+            for (bucket_topic, _), positions in buckets.items():
+                if bucket_topic == topic:
+                    yield positions
+    
+    def topic_positions(self, subject, topic, after=-1):
+        """Номера заданий темы по возрастанию, начиная после after."""
+        tasks = self.tasks_data.get(subject)
+        # Задания из базы SQLite выбираются запросом по индексу темы
+        if hasattr(tasks, "positions_where"):
+            return tasks.positions_where(topic=topic, after=after)
+        return heapq.merge(*(
+            (positions[i] for i in range(bisect.bisect_right(positions, after), len(positions)))
+            for positions in self.topic_buckets(subject, topic)
+        ))
+    
+    def topic_task_count(self, subject, topic):
+        """Число заданий темы в банке предмета."""
+        tasks = self.tasks_data.get(subject)
+        if hasattr(tasks, "count_where"):
+            return tasks.count_where(topic=topic)
+        return sum(len(positions) for positions in self.topic_buckets(subject, topic))
+    
+    def weak_topic_positions(self, subject):
+        """Номера заданий из слабейших тем предмета, начиная с самой слабой.
+        
+        Каждая тема просматривается с последнего решенного задания из нее:
+        задания до него уже решены, поэтому выбор в среднем не зависит от
+        размера темы. Курсор сдвигает ответ (check_answer), а не показ:
+        пропущенное задание будет выдано снова.
+        """
+        for topic in weak_topics(self.topic_ranking(), subject):
+            key = (subject, topic)
+            for position in self.topic_positions(subject, topic, self.topic_cursors.get(key, -1)):
+                self.weak_pick = (key, position)
+                yield position
+    
+    def practice_task(self, subject, tasks):
+        """Следующее задание; часть новых заданий берется из слабых тем."""
+        self.weak_pick = None
+        preferred = None
+        if self.attempt_history is not None and random.random() < PRACTICE_SHARE:
+            preferred = self.weak_topic_positions(subject)
+        return self.scheduler.next_task(subject, tasks, preferred=preferred)
+    
+    @timed("save_stats")
     def save_stats(self):
-        """Сохраняет статистику в файл."""
+        """Дожидается записи всех событий статистики на диск."""
         try:
-            with open("stats.json", 'w', encoding='utf-8') as f:
-                json.dump(self.stats, f, indent=2, ensure_ascii=False)
+            self.stats_journal.flush()
         except Exception as e:
-            print(f"Ошибка сохранения статистики: {e}")
+            log(ERROR, f"Ошибка сохранения статистики: {e}")
     
     async def load_tasks_from_url(self, widget, show_message=True):
         """Загружает задания с указанного URL."""
+        import requests
+        
+        # Адрес и разделитель берутся из полей вкладки настроек
+        self.ensure_tab("Настройки")
         if show_message:
             self.settings_status_label.text = "Загрузка заданий..."
             self.settings_status_label.style.color = "#17a2b8"
@@ -582,6 +1261,10 @@ class EGEShpargalka(toga.App):
                     self.settings_status_label.style.color = "#dc3545"
                 return
             
+            if self.merge_switch.value:
+                await self.merge_source(url, self.selected_delimiter(), show_message)
+                return
+            
             # Проверяем URL
             if not url.startswith("http"):
                 if show_message:
@@ -589,105 +1272,54 @@ class EGEShpargalka(toga.App):
                     self.settings_status_label.style.color = "#dc3545"
                 return
             
-            # Получаем выбранный разделитель
-            delimiter_text = self.delimiter_selection.value
-            if delimiter_text == "Запятая (,)":
-                delimiter = ","
-            elif delimiter_text == "Точка с запятой (;)":
-                delimiter = ";"
-            elif delimiter_text == "Табуляция (\\t)":
-                delimiter = "\t"
-            else:
-                delimiter = ","
-            
-            response = await asyncio.to_thread(requests.get, url, timeout=10)
-            response.raise_for_status()
-            
-            # Пробуем разные кодировки
-            content = None
-            used_encoding = "utf-8"
-            
-            # Сначала пробуем utf-8
-            try:
-                content = response.content.decode('utf-8')
-                used_encoding = "utf-8"
-            except UnicodeDecodeError:
-                # Пробуем windows-1251
-                try:
-                    content = response.content.decode('windows-1251')
-                    used_encoding = "windows-1251"
-                except UnicodeDecodeError:
-                    # Пробуем cp1251
-                    try:
-                        content = response.content.decode('cp1251')
-                        used_encoding = "cp1251"
-                    except UnicodeDecodeError:
-                        # Пробуем utf-8-sig
-                        try:
-                            content = response.content.decode('utf-8-sig')
-                            used_encoding = "utf-8-sig"
-                        except UnicodeDecodeError:
-                            # Последняя попытка с игнорированием ошибок
-                            content = response.content.decode('utf-8', errors='ignore')
-                            used_encoding = "utf-8 (ignore errors)"
+            # Получаем выбранный разделитель: вручную или автоопределение
+            delimiter = self.selected_delimiter()
             
-            # Парсим CSV
-            csv_reader = csv.DictReader(io.StringIO(content), delimiter=delimiter)
+            # Если кэш для этого источника есть, спрашиваем сервер об изменениях
+            entry = self.load_cached_tasks(url, delimiter)
             
-            # Группируем по предметам
-            self.tasks_data = {}
-            task_count = 0
-            
-            for row in csv_reader:
-                # Определяем предмет
-                subject = row.get('subject', '').lower().strip()
-                if not subject:
-                    # Если subject нет в данных, определяем по имени файла
-                    filename = url.split("/")[-1].lower()
-                    if "mathematic" in filename or "math" in filename:
-                        subject = "math"
-                    elif "physics" in filename:
-                        subject = "physics"
-                    elif "informatic" in filename:
-                        subject = "informatics"
-                    elif "russian" in filename:
-                        subject = "russian"
-                    else:
-                        subject = "math"  # По умолчанию математика
-                
-                if subject not in self.tasks_data:
-                    self.tasks_data[subject] = []
-                
-                # Извлекаем данные из строки
-                question = row.get('question_text', row.get('Вопрос', ''))
-                answer = row.get('correct_answer', row.get('Ответ', ''))
-                topic = row.get('topic', row.get('Тема', 'Общая тема'))
-                difficulty = row.get('difficulty', row.get('Сложность', 'medium'))
-                explanation = row.get('explanation', row.get('Объяснение', ''))
-                
-                task = {
-                    'question': question,
-                    'answer': answer,
-                    'topic': topic,
-                    'difficulty': difficulty,
-                    'explanation': explanation
-                }
-                
-                # Проверяем, что есть хотя бы вопрос и ответ
-                if task['question'] and task['answer']:
-                    self.tasks_data[subject].append(task)
-                    task_count += 1
-                    print(f"Загружено задание по {subject}: {task['question'][:50]}...")
+            # Если опубликован манифест, скачиваем только изменившиеся куски
+            delta = await self.fetch_delta(url, delimiter, entry)
+            if delta is not None:
+                message = await self.apply_delta(url, delimiter, entry, delta)
+                if show_message:
+                    self.settings_status_label.text = message
+                    self.settings_status_label.style.color = "#28a745"
+                return
             
-            # Сохраняем в кэш
-            with open(self.tasks_file, 'w', encoding='utf-8') as f:
-                json.dump(self.tasks_data, f, indent=2, ensure_ascii=False)
+            kind, payload = await self.import_tasks(
+                url, delimiter, conditional_headers(entry), show_message=show_message
+            )
+            if kind == "cancelled":
+                if show_message:
+                    self.settings_status_label.text = (
+                        "Загрузка отменена, задания не изменились. "
+                        "Следующая загрузка продолжится с места остановки"
+                    )
+                    self.settings_status_label.style.color = "#6c757d"
+                return
+            if kind == "error":
+                raise RuntimeError(payload)
+            if kind == "not_modified":
+                # 304: файл не изменился, разбирать его заново не нужно
+                self.tasks_data = entry["tasks"]
+                self.tasks_source = url
+                self.rebuild_task_indexes()
+                if show_message:
+                    self.settings_status_label.text = "Задания не изменились, используется кэш"
+                    self.settings_status_label.style.color = "#28a745"
+                self.refresh_stats_display()
+                return
             
             if show_message:
-                self.settings_status_label.text = f"Успешно загружено {task_count} заданий (кодировка: {used_encoding}, разделитель: {delimiter})"
+                skipped = f", пропущено строк: {payload['skipped']}" if payload["skipped"] else ""
+                self.settings_status_label.text = (
+                    f"Успешно загружено {payload['count']} заданий "
+                    f"(кодировка: {payload['encoding']}, разделитель: {payload['delimiter']!r}{skipped})"
+                )
                 self.settings_status_label.style.color = "#28a745"
             
-            print(f"Загружено {task_count} заданий по предметам: {list(self.tasks_data.keys())}")
+            log(INFO, f"Загружено {payload['count']} заданий по предметам: {list(self.tasks_data.keys())}")
             
             # Обновляем статистику
             self.refresh_stats_display()
@@ -704,10 +1336,189 @@ class EGEShpargalka(toga.App):
             if show_message:
                 self.settings_status_label.text = f"Ошибка загрузки: {str(e)}"
                 self.settings_status_label.style.color = "#dc3545"
-            print(f"Ошибка загрузки CSV: {e}")
+            log(ERROR, f"Ошибка загрузки CSV: {e}")
             import traceback
             traceback.print_exc()
     
+    def merged_bank(self):
+        """Объединенный банк; при первом включении в него входит текущий банк."""
+        if self.bank is None:
+            entry = self.load_cached_tasks(MERGED_SOURCE, AUTO_DELIMITER)
+            if entry is not None:
+                self.bank = MergedBank.from_entry(entry)
+            elif self.tasks_source:
+                self.bank = MergedBank.from_entry({"url": self.tasks_source, "tasks": self.tasks_data})
+            else:
+                # Примеры заданий не относятся ни к одному источнику
+                self.bank = MergedBank()
+        return self.bank
+    
+    async def merge_source(self, source, delimiter, show_message=True):
+        """Добавляет задания источника (URL или файл) к банку без повторов."""
+        if not is_url(source) and not os.path.exists(source):
+            if show_message:
+                self.settings_status_label.text = f"Источник не найден: {source}"
+                self.settings_status_label.style.color = "#dc3545"
+            return
+        
+        if show_message:
+            self.settings_status_label.text = f"Добавление источника {source}..."
+            self.settings_status_label.style.color = "#17a2b8"
+        
+        bank = self.merged_bank()
+        replaced = source in bank.sources
+        result = await asyncio.to_thread(ingest_source, source, delimiter)
+        pairs = ((subject, task) for subject, tasks in result["tasks"].items() for task in tasks)
+        added = await asyncio.to_thread(bank.add_source, source, pairs)
+        await self.save_merged_bank()
+        if replaced:
+            # Номера заданий после обновленного источника сдвинулись
+            self.rebuild_task_indexes()
+        else:
+            # Новые задания дописаны в конец: достаточно добавить их в индексы
+            for subject, position, task in added:
+                self.search_index.add(subject, position, task)
+                self.variant_index.add(subject, position, task)
+            self.update_memory_metrics()
+        self.update_sources_selection()
+        
+        duplicates = bank.sources[source]["duplicates"]
+        message = f"Добавлено {len(added)} заданий из {source}, повторов пропущено: {duplicates}"
+        log(INFO, message)
+        if show_message:
+            self.settings_status_label.text = message
+            self.settings_status_label.style.color = "#28a745"
+        self.refresh_stats_display()
+    
+    def update_sources_selection(self):
+        """Показывает источники объединенного банка с числом заданий."""
+        counts = self.bank.source_counts() if self.bank else {}
+        self.sources_selection.items = [f"{source} ({count})" for source, count in counts.items()]
+    
+    def selected_source(self):
+        value = self.sources_selection.value
+        return value.rsplit(" (", 1)[0] if value else None
+    
+    async def refresh_selected_source(self, widget):
+        """Загружает выбранный источник заново, заменяя его задания."""
+        source = self.selected_source()
+        if not source:
+            return
+        try:
+            await self.merge_source(source, self.selected_delimiter())
+        except Exception as e:
+            self.settings_status_label.text = f"Ошибка обновления источника: {e}"
+            self.settings_status_label.style.color = "#dc3545"
+            log(ERROR, f"Ошибка обновления источника {source}: {e}")
+    
+    async def save_merged_bank(self):
+        """Сохраняет объединенный банк в потоке, не останавливая интерфейс.
+        
+        В файл кэша дописываются только новые задания; после сохранения
+        банк читает задания из записанного файла или базы.
+        """
+        bank = self.bank
+        saved = await asyncio.to_thread(
+            self.save_cached_tasks, MERGED_SOURCE, AUTO_DELIMITER, bank.tasks_data,
+            files=bank.sources, hashes=bank.hashes
+        )
+        bank.saved(saved)
+        self.tasks_data = bank.tasks_data
+    
+    async def remove_selected_source(self, widget):
+        """Убирает из банка задания выбранного источника."""
+        source = self.selected_source()
+        if not source or not self.bank:
+            return
+        info = self.bank.remove_source(source)
+        await self.save_merged_bank()
+        self.rebuild_task_indexes()
+        self.update_sources_selection()
+        
+        removed = sum(count for _, count in info["subjects"].values())
+        self.settings_status_label.text = f"Источник {source} удален: {removed} заданий"
+        self.settings_status_label.style.color = "#28a745"
+        self.refresh_stats_display()
+    
+    def replace_task_indexes(self):
+        """Ставит пустые индексы для нового банка; заполняет их вызывающий."""
+        self.search_index = SearchIndex()
+        self.variant_index = VariantIndex()
+        # Тот, кто ждал прежние индексы, проверит готовность новых
+        previous, self.indexes_ready = self.indexes_ready, asyncio.Event()
+        previous.set()
+        # Номера заданий в новом банке другие
+        self.topic_cursors = {}
+        self.weak_pick = None
+    
+    def rebuild_task_indexes(self):
+        """Перестраивает поисковый индекс и корзины вариантов после замены банка."""
+        self.replace_task_indexes()
+        self.update_memory_metrics()
+        asyncio.create_task(self.fill_task_indexes(self.search_index, self.variant_index))
+        
+        # Восстановленный вариант ждал загрузки заданий
+        if self.variant:
+            self.resume_variant_timer()
+    
+    async def fill_task_indexes(self, index, variant_index):
+        """Заполняет индексы по частям, не блокируя интерфейс.
+        
+        Заодно компилирует правильные ответы: банк, разобранный в
+        процессе-работнике, приходит без них, а проверка ответа потом —
+        только поиск в готовом наборе ключей.
+        """
+        for subject, tasks in list(self.tasks_data.items()):
+            for position, task in enumerate(tasks):
+                # Банк заменили, пока индекс строился
+                if self.search_index is not index:
+                    return
+                index.add(subject, position, task)
+                variant_index.add(subject, position, task)
+                compile_answer(str(task['answer']).strip())
+                if position % 500 == 499:
+                    await asyncio.sleep(0)
+        if self.search_index is index:
+            variant_index.complete = True
+            self.indexes_ready.set()
+    
+    def update_memory_metrics(self):
+        """Оценивает память, занятую заданиями каждого предмета."""
+        for subject, tasks in self.tasks_data.items():
+            metrics.gauge(f"memory.{subject}_bytes", task_memory(tasks))
+            metrics.gauge(f"tasks.{subject}", len(tasks))
+    
+    def search_tasks(self, widget):
+        """Ищет задания по мере ввода текста."""
+        subject_names = {
+            "math": "Математика",
+            "physics": "Физика",
+            "informatics": "Информатика",
+            "russian": "Русский язык"
+        }
+        
+        results = self.search_index.search(widget.value) if widget.value else []
+        rows = []
+        for subject, position in results:
+            question = self.tasks_data[subject][position]['question']
+            rows.append({
+                "subject_name": subject_names.get(subject, subject),
+                "question": question[:80],
+                "subject": subject,
+                "position": position
+            })
+        self.search_results.data = rows
+    
+    def open_search_result(self, widget):
+        """Открывает задание, выбранное в результатах поиска."""
+        row = widget.selection
+        if row is None:
+            return
+        
+        self.current_subject = row.subject
+        self.current_task_index = row.position
+        self.show_next_task()
+    
     def show_subject_tasks(self, subject_id):
         """Показывает задания по выбранному предмету."""
         self.current_subject = subject_id
@@ -725,6 +1536,7 @@ class EGEShpargalka(toga.App):
         self.option_container.current_tab = "Предметы"
         
         if subject_id in self.tasks_data and self.tasks_data[subject_id]:
+            self.current_task_index = self.practice_task(subject_id, self.tasks_data[subject_id])
             self.show_next_task()
             self.task_info_label.text = f"Предмет: {subject_name} | Заданий: {len(self.tasks_data[subject_id])}"
         else:
@@ -746,6 +1558,8 @@ class EGEShpargalka(toga.App):
             self.current_task_index = 0
         
         self.current_task = tasks[self.current_task_index]
+        # Отсюда отсчитывается время решения
+        self.task_shown_at = time.perf_counter()
         
         # Обновляем интерфейс
         difficulty_symbols = {
@@ -764,10 +1578,11 @@ class EGEShpargalka(toga.App):
         # Обновляем информацию о задании
         topic = self.current_task.get('topic', 'Общая тема')
         self.task_info_label.text = (
-            f"Тема: {topic} | Сложность: {difficulty} | "
-            f"Задание {self.current_task_index + 1} из {len(tasks)}"
+            f"Тема: {topic} ({self.topic_task_count(self.current_subject, topic)} заданий) | "
+            f"Сложность: {difficulty} | Задание {self.current_task_index + 1} из {len(tasks)}"
         )
     
+    @timed("check_answer")
     def check_answer(self, widget):
         """Проверяет ответ пользователя."""
         if not self.current_task:
@@ -783,24 +1598,33 @@ class EGEShpargalka(toga.App):
             self.result_label.style.color = "#ffc107"
             return
         
-        # Обновляем статистику
-        if self.current_subject:
-            self.stats['total_attempts'] += 1
-            if self.current_subject in self.stats['subjects']:
-                self.stats['subjects'][self.current_subject]['attempts'] += 1
+        # Сравниваем ответы по заранее скомпилированному правильному ответу
+        is_correct = compile_answer(correct_answer).check(user_answer)
         
-        # Сравниваем ответы (нестрого)
-        user_normalized = user_answer.lower().replace(',', '.').replace(' ', '').replace(';', ',')
-        correct_normalized = correct_answer.lower().replace(',', '.').replace(' ', '').replace(';', ',')
+        # Время с показа задания (или с прошлой проверки); простой не учитывается
+        now = time.perf_counter()
+        seconds = None
+        if self.task_shown_at is not None and now - self.task_shown_at <= IDLE_LIMIT:
+            seconds = now - self.task_shown_at
+        self.task_shown_at = now
         
-        if user_normalized == correct_normalized:
+        # Обновляем статистику
+        if self.current_subject:
+            self.record_stats_event(attempt_event(
+                self.current_subject, self.current_task, is_correct,
+                position=self.current_task_index, seconds=seconds
+            ))
+        
+        # Задание из слабой темы решено: следующий выбор из нее начнется после него
+        if self.weak_pick is not None and self.weak_pick[1] == self.current_task_index:
+            key, position = self.weak_pick
+            if key[0] == self.current_subject:
+                self.topic_cursors[key] = position
+            self.weak_pick = None
+        
+        if is_correct:
             self.result_label.text = "✅ Правильно! Отличная работа!"
             self.result_label.style.color = "#28a745"
-            
-            # Обновляем статистику
-            self.stats['correct_answers'] += 1
-            if self.current_subject in self.stats['subjects']:
-                self.stats['subjects'][self.current_subject]['correct'] += 1
         else:
             self.result_label.text = f"❌ Неверно. Ваш ответ: '{user_answer}'\nПравильный ответ: '{correct_answer}'"
             
@@ -811,7 +1635,6 @@ class EGEShpargalka(toga.App):
             
             self.result_label.style.color = "#dc3545"
         
-        self.save_stats()
         self.refresh_stats_display()
     
     def show_answer(self, widget):
@@ -825,91 +1648,296 @@ class EGEShpargalka(toga.App):
             self.result_label.style.color = "#17a2b8"
     
     def next_question(self, widget):
-        """Показывает следующее задание."""
+        """Показывает следующее задание: просроченное повторение или новое."""
         if self.current_subject and self.current_subject in self.tasks_data:
-            tasks_count = len(self.tasks_data[self.current_subject])
-            if tasks_count > 0:
-                self.current_task_index = (self.current_task_index + 1) % tasks_count
+            tasks = self.tasks_data[self.current_subject]
+            if len(tasks) > 0:
+                self.current_task_index = self.practice_task(self.current_subject, tasks)
                 self.show_next_task()
     
+    async def choose_variant(self, widget, variant_number):
+        """Выбирает вариант, дождавшись, пока банк будет проиндексирован целиком."""
+        self.ensure_tab("Варианты")
+        while not self.variant_index.complete:
+            self.variant_status_label.text = (
+                f"Банк индексируется, вариант #{variant_number} будет собран после индексации..."
+            )
+            await self.indexes_ready.wait()
+        self.start_variant(variant_number)
+    
     def start_variant(self, variant_number):
-        """Начинает выполнение варианта."""
-        self.variant_status_label.text = f"Выполняется вариант #{variant_number}"
+        """Собирает вариант из банка и показывает первое задание.
+        
+        Номер варианта служит зерном генератора, поэтому один и тот же
+        номер дает один и тот же набор заданий. Индекс вариантов должен
+        быть заполнен целиком (см. choose_variant).
+        """
+        subject_ids = {
+            "Математика": "math",
+            "Физика": "physics",
+            "Информатика": "informatics",
+            "Русский язык": "russian"
+        }
+        self.ensure_tab("Варианты")
+        subject = subject_ids.get(self.variant_subject_selection.value, "math")
         self.option_container.current_tab = "Варианты"
+        
+        self.stop_variant_timer()
+        positions = self.variant_index.assemble(subject, variant_number)
+        if not positions:
+            self.variant = None
+            self.variant_status_label.text = (
+                f"Задания для варианта #{variant_number} пока не загружены"
+            )
+            self.variant_task_label.text = ""
+            return
+        
+        self.variant = {
+            "number": variant_number,
+            "subject": subject,
+            "positions": positions,
+            "answers": {},
+            "index": 0
+        }
+        self.variant_timer = ExamTimer(
+            self.settings.get("variant_time", 235) * 60,
+            on_tick=self.update_timer_label,
+            on_expire=self.variant_time_expired
+        )
+        self.update_timer_label(self.variant_timer.remaining())
+        self.variant_status_label.text = (
+            f"Выбран вариант #{variant_number}: {len(positions)} заданий. Нажмите «Начать вариант»"
+        )
+        self.variant_answer_input.value = ""
+        self.render_variant_task()
+        self.save_variant_state()
+    
+    def show_variant_task(self, step):
+        """Сохраняет ответ и переходит к соседнему заданию варианта."""
+        if not self.variant:
+            return
+        
+        self.store_variant_answer()
+        variant = self.variant
+        variant["index"] = min(max(variant["index"] + step, 0), len(variant["positions"]) - 1)
+        self.render_variant_task()
+        self.save_variant_state()
+    
+    def store_variant_answer(self):
+        """Запоминает ответ, введенный на текущее задание варианта."""
+        answer = self.variant_answer_input.value.strip()
+        if answer:
+            self.variant["answers"][self.variant["index"]] = answer
+        else:
+            self.variant["answers"].pop(self.variant["index"], None)
+    
+    def render_variant_task(self):
+        """Показывает текущее задание варианта и введенный на него ответ."""
+        variant = self.variant
+        tasks = self.tasks_data.get(variant["subject"], [])
+        position = variant["positions"][variant["index"]]
+        if position >= len(tasks):
+            self.variant_task_label.text = "Задания варианта загружаются..."
+            return
+        task = tasks[position]
+        
+        number = task.get('number') or variant["index"] + 1
+        self.variant_task_label.text = (
+            f"Задание {number} ({variant['index'] + 1} из {len(variant['positions'])})\n\n"
+            f"{task['question']}"
+        )
+        self.variant_answer_input.value = variant["answers"].get(variant["index"], "")
+    
+    def update_timer_label(self, remaining):
+        """Показывает оставшееся время; вызывается раз в секунду."""
+        self.timer_label.text = f"Время: {format_remaining(remaining)}"
     
     def start_variant_timer(self, widget):
         """Запускает таймер для варианта."""
-        self.variant_status_label.text = "Вариант начат! Таймер запущен."
-        # Здесь можно реализовать реальный таймер
+        if not self.variant or self.variant_timer is None:
+            self.variant_status_label.text = "Сначала выберите вариант"
+            return
+        if self.variant_timer.pending:
+            # Восстановленный вариант продолжится сам, когда загрузятся задания
+            return
+        self.variant_timer.start()
+        self.variant_status_label.text = f"Вариант #{self.variant['number']} начат! Таймер запущен."
+        self.save_variant_state()
     
     def pause_variant(self, widget):
-        """Ставит вариант на паузу."""
-        self.variant_status_label.text = "Вариант на паузе"
+        """Ставит вариант на паузу или продолжает его."""
+        # Восстановленный вариант ждет загрузки заданий: отсчет еще не идет
+        if self.variant_timer is None or self.variant_timer.pending:
+            return
+        if self.variant_timer.running:
+            self.variant_timer.pause()
+            self.variant_status_label.text = "Вариант на паузе"
+        else:
+            self.variant_timer.start()
+            self.variant_status_label.text = "Вариант продолжен"
+        self.update_timer_label(self.variant_timer.remaining())
+        self.save_variant_state()
+    
+    def stop_variant_timer(self):
+        if self.variant_timer is not None:
+            self.variant_timer.pause()
+            self.variant_timer = None
+    
+    def variant_time_expired(self):
+        """Время на вариант вышло: ответы проверяются автоматически."""
+        self.finish_variant(None)
+        self.variant_status_label.text = "Время вышло! " + self.variant_status_label.text
+    
+    def save_variant_state(self):
+        """Сохраняет вариант, ответы и срок окончания на случай перезапуска."""
+        if not self.variant or self.variant_timer is None:
+            return
+        state = {
+            **self.variant,
+            "answers": {str(index): answer for index, answer in self.variant["answers"].items()},
+            "timer": self.variant_timer.to_dict()
+        }
+        try:
+            tmp_path = self.variant_state_file + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(tmp_path, self.variant_state_file)
+        except Exception as e:
+            log(ERROR, f"Ошибка сохранения варианта: {e}")
+    
+    def clear_variant_state(self):
+        try:
+            if os.path.exists(self.variant_state_file):
+                os.remove(self.variant_state_file)
+        except Exception as e:
+            log(ERROR, f"Ошибка удаления состояния варианта: {e}")
+    
+    def restore_variant(self):
+        """Восстанавливает незавершенный вариант с верным остатком времени."""
+        try:
+            if not os.path.exists(self.variant_state_file):
+                return
+            self.ensure_tab("Варианты")
+            with open(self.variant_state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            timer_state = state.pop("timer")
+            state["answers"] = {int(index): answer for index, answer in state["answers"].items()}
+        except Exception as e:
+            log(ERROR, f"Ошибка восстановления варианта: {e}")
+            return
+        
+        self.variant = state
+        # Отсчет начнется, когда задания загрузятся: иначе истекший срок
+        # проверил бы вариант без заданий
+        self.variant_timer = ExamTimer.from_dict(
+            timer_state, start=False, on_tick=self.update_timer_label, on_expire=self.variant_time_expired
+        )
+        self.update_timer_label(self.variant_timer.remaining())
+        status = "продолжится после загрузки заданий" if self.variant_timer.pending else "на паузе"
+        self.variant_status_label.text = f"Вариант #{state['number']} {status}"
+    
+    def variant_tasks_loaded(self):
+        """Загружены ли все задания текущего варианта."""
+        subject_tasks = self.tasks_data.get(self.variant["subject"], [])
+        return all(position < len(subject_tasks) for position in self.variant["positions"])
+    
+    def resume_variant_timer(self):
+        """Запускает таймер восстановленного варианта, когда его задания загружены."""
+        if self.variant_timer is None or not self.variant_timer.pending:
+            return
+        if not self.variant_tasks_loaded():
+            self.variant_status_label.text = (
+                f"Вариант #{self.variant['number']}: задания варианта не загружены"
+            )
+            return
+        self.variant_status_label.text = f"Вариант #{self.variant['number']} продолжается"
+        # Истекший срок сразу проверяет вариант
+        self.variant_timer.start()
     
     def finish_variant(self, widget):
-        """Завершает вариант досрочно."""
+        """Завершает вариант досрочно и проверяет все ответы разом."""
+        # Без заданий вариант не проверить: он и сохраненные ответы остаются
+        if self.variant and not self.variant_tasks_loaded():
+            self.variant_status_label.text = (
+                f"Вариант #{self.variant['number']} нельзя проверить: задания варианта не загружены"
+            )
+            return
+        
         self.variant_status_label.text = "Вариант завершен досрочно"
         self.timer_label.text = "Время: 00:00:00"
+        self.stop_variant_timer()
+        self.clear_variant_state()
         
-        # Обновляем статистику
-        self.stats['variants_completed'] += 1
-        self.save_stats()
+        if not self.variant:
+            self.record_stats_event({"type": "variant"})
+            self.refresh_stats_display()
+            return
+        
+        # Сохраняем ответ на текущее задание
+        self.store_variant_answer()
+        variant = self.variant
+        subject_tasks = self.tasks_data[variant["subject"]]
+        positions = variant["positions"]
+        tasks = [subject_tasks[position] for position in positions]
+        grade = grade_variant(variant["subject"], tasks, variant["answers"])
+        
+        # Вариант и все его попытки попадают в журнал одним событием
+        self.record_stats_event(variant_event(
+            variant["subject"], variant["number"], tasks, grade, positions
+        ))
+        self.variant = None
+        
+        self.variant_status_label.text = (
+            f"Вариант #{variant['number']} завершен: "
+            f"первичный балл {grade['primary']} из {grade['max_primary']}, "
+            f"тестовый балл {grade['score']}"
+        )
         self.refresh_stats_display()
     
     def refresh_stats(self, widget=None):
         """Обновляет отображение статистики."""
         self.refresh_stats_display()
     
+    @timed("refresh_stats_display")
     def refresh_stats_display(self):
         """Обновляет данные статистики на экране."""
-        total = self.stats['total_attempts']
-        correct = self.stats['correct_answers']
-        
-        if total > 0:
-            percentage = (correct / total) * 100
-            stats_text = (
-                f"Всего решено: {total} заданий\n"
-                f"Правильных ответов: {correct}\n"
-                f"Точность: {percentage:.1f}%\n"
-                f"Завершено вариантов: {self.stats['variants_completed']}"
-            )
-        else:
-            stats_text = "Вы еще не решили ни одного задания"
+        # Вкладка еще не открывалась: обновится при построении
+        if "Статистика" not in self.built_tabs:
+            return
         
+        stats_text, subjects_text = stats_report(self.stats)
         self.total_stats_label.text = stats_text
-        
-        # Статистика по предметам
-        subjects_text = "Статистика по предметам:\n"
-        for subject, data in self.stats['subjects'].items():
-            subject_name = {
-                "math": "Математика",
-                "physics": "Физика",
-                "informatics": "Информатика",
-                "russian": "Русский язык"
-            }.get(subject, subject)
-            
-            if data['attempts'] > 0:
-                perc = (data['correct'] / data['attempts'] * 100)
-                subjects_text += f"\n{subject_name}: {data['correct']}/{data['attempts']} ({perc:.1f}%)"
-            else:
-                subjects_text += f"\n{subject_name}: 0/0 (0%)"
-        
         self.subjects_stats_label.text = subjects_text
+        self.refresh_weak_topics()
+        self.pacing_label.text = self.solve_times.report()
+    
+    def refresh_weak_topics(self):
+        """Обновляет слабые темы, если вкладка статистики открыта.
+        
+        Сводка по темам считается по всей истории попыток, поэтому после
+        каждого ответа на другой вкладке она только помечается устаревшей
+        и пересчитывается при открытии вкладки.
+        """
+        tab = self.option_container.current_tab
+        if tab is None or tab.text != "Статистика":
+            self.weak_topics_stale = True
+            return
+        self.weak_topics_stale = False
+        self.weak_topics_label.text = weak_topics_report(self.topic_ranking())
     
     def clear_stats(self, widget):
         """Сбрасывает статистику."""
         # Подтверждение
         if hasattr(self.main_window, 'confirm_dialog'):
             if self.main_window.confirm_dialog("Сброс статистики", "Вы уверены, что хотите сбросить всю статистику?"):
-                self.stats = self.load_stats()  # Загружаем дефолтные
-                self.save_stats()
+                self.record_stats_event({"type": "reset"})
                 self.refresh_stats_display()
         else:
             # Простая реализация если confirm_dialog недоступен
-            self.stats = self.load_stats()
-            self.save_stats()
+            self.record_stats_event({"type": "reset"})
             self.refresh_stats_display()
-            self.settings_status_label.text = "Статистика сброшена"
+            if "Настройки" in self.built_tabs:
+                self.settings_status_label.text = "Статистика сброшена"
     
     def save_settings(self, widget):
         """Сохраняет настройки."""
@@ -927,23 +1955,25 @@ class EGEShpargalka(toga.App):
                 return
             
             # Получаем разделитель
-            delimiter_text = self.delimiter_selection.value
-            if delimiter_text == "Запятая (,)":
-                delimiter = ","
-            elif delimiter_text == "Точка с запятой (;)":
-                delimiter = ";"
-            elif delimiter_text == "Табуляция (\\t)":
-                delimiter = "\t"
-            else:
-                delimiter = ","
+            delimiter = self.selected_delimiter()
             
             self.settings = {
                 "csv_url": self.csv_url_input.value,
                 "delimiter": delimiter,
                 "auto_check": self.auto_check_switch.value,
+                "task_store": "sqlite" if self.sqlite_switch.value else "file",
+                "merge_sources": self.merge_switch.value,
                 "variant_time": variant_time
             }
             
+            # Новое хранилище используется со следующей загрузки заданий
+            if self.sqlite_switch.value and not self.task_store:
+                from ege_shpargalka.store import TaskStore
+                self.task_store = TaskStore("tasks.db")
+            elif not self.sqlite_switch.value and self.task_store:
+                self.task_store.close()
+                self.task_store = None
+            
             with open(self.settings_file, 'w', encoding='utf-8') as f:
                 json.dump(self.settings, f, indent=2, ensure_ascii=False)
             
@@ -962,8 +1992,11 @@ class EGEShpargalka(toga.App):
         """Обработчик закрытия окна."""
         # Сохраняем настройки при закрытии
         try:
-            self.save_settings(None)
-            self.save_stats()
+            # Поля настроек существуют, только если вкладку открывали
+            if "Настройки" in self.built_tabs:
+                self.save_settings(None)
+            self.save_variant_state()
+            self.stats_journal.close()
         except:
             pass
         return True
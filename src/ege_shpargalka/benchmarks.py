@@ -0,0 +1,266 @@
+"""Замеры производительности на синтетических банках заданий.
+
+Генератор детерминированно строит банк на русском языке нужного
+размера в разных кодировках и с разными разделителями. Набор замеров
+проходит по горячим местам приложения без интерфейса и сети: разбор
+CSV, сохранение и чтение кэша, проверка ответа, выбор следующего
+задания, запись статистики, построение сводки, поиск по тексту и поиск
+слабых тем. Результаты сравниваются
+с сохраненной базовой линией; замедление сверх порога — регрессия.
+"""
+import csv
+import json
+import os
+import random
+import tempfile
+import time
+
+from ege_shpargalka import analytics
+from ege_shpargalka.cache import load_cache, save_cache
+from ege_shpargalka.core import ingest_source, stats_report
+from ege_shpargalka.history import attempt_event
+from ege_shpargalka.journal import StatsJournal, apply_event, default_stats
+from ege_shpargalka.matching import compile_answer
+from ege_shpargalka.scheduler import Scheduler
+from ege_shpargalka.search import SearchIndex
+
+# Размеры банков
+SIZES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+# Кодировки и разделители, в которых разбирается банк
+INGEST_FORMATS = [
+    ("utf-8", ","),
+    ("utf-8-sig", ";"),
+    ("windows-1251", ";"),
+    ("koi8-r", "\t")
+]
+
+# Имена разделителей в названиях замеров
+DELIMITER_NAMES = {",": "comma", ";": "semicolon", "\t": "tab", "|": "pipe"}
+
+# Сколько попыток в истории на одно задание банка при замере слабых тем,
+# но не больше MAX_ATTEMPTS: на банке 1m иначе не хватит памяти
+ATTEMPTS_PER_TASK = 100
+MAX_ATTEMPTS = 1_000_000
+
+# Сколько фрагментов вопросов ищется при замере поиска
+SEARCH_FRAGMENTS = 20
+
+# Замедление относительно базовой линии, после которого замер считается регрессией
+THRESHOLD = 0.25
+
+# Сколько раз повторяется каждый замер (берется лучший)
+REPEAT = 3
+
+# Сколько операций в замерах отдельных действий
+OPERATIONS = 2000
+
+SUBJECTS = ["math", "physics", "informatics", "russian"]
+TOPICS = {
+    "math": ["Уравнения", "Производная", "Логарифмы", "Тригонометрия", "Вероятность"],
+    "physics": ["Кинематика", "Оптика", "Электричество", "Термодинамика"],
+    "informatics": ["Системы счисления", "Алгоритмы", "Логика", "Графы"],
+    "russian": ["Орфография", "Пунктуация", "Ударения", "Синтаксис"]
+}
+DIFFICULTIES = ["easy", "medium", "hard"]
+WORDS = [
+    "найдите", "значение", "выражения", "решите", "уравнение", "определите",
+    "скорость", "тела", "через", "секунды", "сколько", "существует", "чисел",
+    "укажите", "слово", "в котором", "пропущена", "буква", "ё", "ответ",
+    "запишите", "в виде", "десятичной", "дроби"
+]
+ANSWER_WORDS = ["москва", "ёлка", "предложение", "запятая", "шёл"]
+
+
+def generate_rows(count, seed=0):
+    """Строки банка: словари с полями CSV. Одинаковы при одинаковом seed."""
+    rng = random.Random(seed)
+    for i in range(count):
+        subject = SUBJECTS[i % len(SUBJECTS)]
+        words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 14)))
+        kind = rng.random()
+        if kind < 0.6:
+            answer = str(rng.randint(-500, 5000))
+        elif kind < 0.75:
+            answer = f"{rng.randint(0, 99)},{rng.randint(1, 99)}"
+        elif kind < 0.9:
+            answer = "; ".join(str(rng.randint(1, 9)) for _ in range(3))
+        else:
+            answer = rng.choice(ANSWER_WORDS)
+        question = f"Задание {i}. {words.capitalize()}: {rng.randint(2, 99)}x + {rng.randint(1, 50)} = 0?"
+        if i % 50 == 0:
+            # Многострочные вопросы с кавычками встречаются в настоящих банках
+            question += '\nИспользуйте "подсказку", если нужно.'
+        yield {
+            "subject": subject,
+            "question_text": question,
+            "correct_answer": answer,
+            "topic": rng.choice(TOPICS[subject]),
+            "difficulty": rng.choice(DIFFICULTIES),
+            "explanation": "Решение: " + " ".join(rng.choice(WORDS) for _ in range(5)),
+            "task_number": str(i % 27 + 1)
+        }
+
+
+def write_bank(path, count, encoding="utf-8", delimiter=",", seed=0):
+    """Записывает синтетический банк в файл, не держа его в памяти целиком."""
+    with open(path, 'w', encoding=encoding, newline='') as f:
+        writer = None
+        for row in generate_rows(count, seed):
+            if writer is None:
+                writer = csv.DictWriter(f, fieldnames=list(row), delimiter=delimiter)
+                writer.writeheader()
+            writer.writerow(row)
+    return path
+
+
+def best_time(function, repeat=REPEAT):
+    """Лучшее время из нескольких запусков (секунды)."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - started
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def run_suite(size="1k", workdir=None, repeat=REPEAT, seed=0):
+    """Выполняет все замеры. Возвращает {имя замера: секунды}."""
+    count = SIZES.get(size) or int(size)
+    results = {}
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        # Разбор CSV в разных кодировках и с разными разделителями
+        ingested = None
+        for encoding, delimiter in INGEST_FORMATS:
+            path = write_bank(os.path.join(tmp, f"bank-{encoding}.csv"), count, encoding, delimiter, seed)
+
+            def ingest():
+                nonlocal ingested
+                ingested = ingest_source(path)
+                assert ingested["count"] == count
+            results[f"ingest[{encoding},{DELIMITER_NAMES[delimiter]}]"] = best_time(ingest, repeat)
+            os.remove(path)
+        tasks_data = ingested["tasks"]
+
+        # Кэш: сохранение и загрузка с чтением части заданий
+        cache_path = os.path.join(tmp, "tasks_cache.bin")
+        results["cache.save"] = best_time(lambda: save_cache(cache_path, "bench", ",", tasks_data), repeat)
+
+        def load():
+            entry = load_cache(cache_path, "bench", ",")
+            tasks = entry["tasks"]["math"]
+            step = max(1, len(tasks) // OPERATIONS)
+            for position in range(0, len(tasks), step):
+                tasks[position]
+        results["cache.load"] = best_time(load, repeat)
+
+        tasks = tasks_data["math"]
+        picks = [tasks[random.Random(seed + i).randrange(len(tasks))] for i in range(OPERATIONS)]
+
+        # Проверка ответа: сравнение по скомпилированному ответу и событие статистики
+        stats = default_stats()
+
+        def check():
+            for task in picks:
+                correct = compile_answer(str(task['answer']).strip()).check(task['answer'])
+                apply_event(stats, attempt_event("math", task, correct))
+        results["check_answer"] = best_time(check, repeat) / OPERATIONS
+
+        # Выбор следующего задания по расписанию повторений
+        def next_tasks():
+            scheduler = Scheduler(default_stats())
+            now = 0
+            for i in range(OPERATIONS):
+                position = scheduler.next_task("math", tasks, now=now)
+                event = attempt_event("math", tasks[position], i % 3 != 0, now=now, position=position)
+                apply_event(scheduler.stats, event)
+                scheduler.push("math", position)
+                now += 60
+        results["next_task"] = best_time(next_tasks, repeat) / OPERATIONS
+
+        # Запись статистики в журнал с ожиданием записи на диск
+        def save():
+            journal = StatsJournal(
+                os.path.join(tmp, "stats.json"),
+                os.path.join(tmp, "stats_journal.jsonl"),
+                os.path.join(tmp, "attempts.jsonl")
+            )
+            journal.load()
+            for task in picks:
+                journal.append(attempt_event("math", task, True))
+            journal.flush()
+            journal.close()
+        results["save_stats"] = best_time(save, repeat) / OPERATIONS
+
+        # Текст сводки статистики
+        results["refresh_stats_display"] = best_time(
+            lambda: [stats_report(stats) for _ in range(100)], repeat
+        ) / 100
+
+        # Поиск по тексту: сочетания частых слов банка и фрагменты вопросов
+        index = SearchIndex()
+        for position, task in enumerate(tasks):
+            index.add("math", position, task)
+        queries = [" ".join(WORDS[i:i + 3]) for i in range(0, len(WORDS), 3)]
+        queries += [task['question'][10:50] for task in picks[:SEARCH_FRAGMENTS]]
+        results["search"] = best_time(lambda: [index.search(query) for query in queries], repeat) / len(queries)
+
+        # Слабые темы по истории попыток (если установлен NumPy)
+        if analytics.available():
+            history = synthetic_history(min(count * ATTEMPTS_PER_TASK, MAX_ATTEMPTS), seed)
+            results["topic_stats"] = best_time(history.topic_stats, repeat)
+
+    return results
+
+
+def synthetic_history(count, seed=0, topics=40, days=200):
+    """История из count попыток по topics темам за последние days дней."""
+    np = analytics.numpy()
+    rng = np.random.default_rng(seed)
+    history = analytics.AttemptHistory()
+    for code in range(topics):
+        history.codes[(("math", "physics", "informatics", "russian")[code % 4], f"Тема {code}")] = code
+    history.keys = list(history.codes)
+    history.extend(
+        rng.integers(0, topics, count, dtype=np.int32),
+        time.time() - rng.random(count) * days * analytics.DAY,
+        rng.random(count) < 0.7
+    )
+    return history
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """Замеры, ставшие медленнее базовой линии больше чем на threshold.
+
+    Возвращает список (имя, базовое время, текущее время).
+    """
+    regressions = []
+    for name, seconds in results.items():
+        base = baseline.get(name)
+        if base and seconds > base * (1 + threshold):
+            regressions.append((name, base, seconds))
+    return regressions
+
+
+def load_baseline(path, size):
+    """Базовая линия для размера банка или пустой словарь."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f).get(size, {})
+
+
+def save_baseline(path, size, results):
+    """Записывает результаты как базовую линию для размера банка."""
+    data = {}
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    data[size] = results
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False, sort_keys=True)
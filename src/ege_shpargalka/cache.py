@@ -0,0 +1,411 @@
+"""Кэш заданий, привязанный к источнику (URL и разделителю).
+
+Формат файла:
+
+    MAGIC | версия (uint32)
+    записи заданий (компактный JSON в UTF-8, одна за другой)
+    таблицы записей по предметам (начало и конец каждой записи, uint64
+    в порядке байт устройства)
+    хеши вопросов объединенного банка (uint64), если они переданы
+    метаданные (JSON) | смещение метаданных (uint64) | длина (uint32) | MAGIC
+
+Файл открывается через mmap: при запуске читаются только метаданные,
+а каждое задание декодируется в момент обращения к нему.
+
+Если новые списки заданий собраны из отрезков текущего файла кэша
+(SplicedTasks), задания заново не кодируются: файл копируется байт в
+байт, новые записи, таблицы и метаданные дописываются в конец копии, а
+прежние записи остаются на тех же смещениях. Копия становится новым
+поколением, как при полной записи: отображенный файл не меняется (в
+Windows его нельзя ни обрезать, ни подменить). Когда дописанное
+превысит то, что было записано целиком, файл пишется заново.
+
+Кэш приложения пишется поколениями (save_cache(versioned=True)): данные
+ложатся в новый файл <путь>.g<метка>, а ссылка <путь>.current
+переключается на него. Файл, отображенный в память, не подменяется и не
+удаляется на месте: в Windows это невозможно, пока отображение живо.
+Старые поколения удаляются при следующих сохранениях, когда их уже
+никто не держит.
+"""
+import bisect
+import glob
+import json
+import mmap
+import os
+import shutil
+import struct
+import uuid
+from array import array
+from collections.abc import Sequence
+
+CACHE_VERSION = 3
+
+MAGIC = b"EGEC"
+HEADER = struct.Struct("<4sI")
+TRAILER = struct.Struct("<QI4s")
+
+# Ссылка на текущее поколение кэша и приставка имен поколений
+CURRENT_SUFFIX = ".current"
+GENERATION_SUFFIX = ".g"
+
+
+class CachedTasks(Sequence):
+    """Список заданий предмета, читаемый из отображенного в память кэша."""
+
+    def __init__(self, buffer, spans, path=None):
+        self.buffer = buffer
+        # Начало и конец записи задания i: spans[2 * i], spans[2 * i + 1]
+        self.spans = spans
+        # Файл, из которого прочитан список
+        self.path = path
+
+    def __len__(self):
+        return len(self.spans) // 2
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("task index out of range")
+        start, end = self.spans[2 * index], self.spans[2 * index + 1]
+        return json.loads(self.buffer[start:end].decode('utf-8'))
+
+
+class SplicedTasks(Sequence):
+    """Список заданий из отрезков других списков и новых заданий.
+
+    Отрезок — (задания, начало, число). Отрезки списков из кэша не
+    читаются в память, а новые задания дописываются в последний отрезок.
+    save_cache кодирует только новые задания, если остальные отрезки
+    взяты из текущего файла кэша.
+    """
+
+    def __init__(self, pieces=()):
+        self.pieces = []
+        # Конец каждого отрезка в общем списке
+        self.ends = []
+        self.tail = None
+        for tasks, start, count in pieces:
+            self.add(tasks, start, count)
+
+    def add(self, tasks, start=0, count=None):
+        """Дописывает отрезок tasks[start:start + count]."""
+        count = len(tasks) - start if count is None else count
+        if isinstance(tasks, SplicedTasks):
+            # Берем отрезки вложенного списка, чтобы save_cache видел записи кэша
+            offset = 0
+            for inner, inner_start, inner_count in tasks.pieces:
+                low, high = max(start, offset), min(start + count, offset + inner_count)
+                if low < high:
+                    self.add(inner, inner_start + low - offset, high - low)
+                offset += inner_count
+        elif count:
+            self.pieces.append((tasks, start, count))
+            self.ends.append(len(self) + count)
+
+    def append(self, task):
+        if self.tail is None or self.pieces[-1][0] is not self.tail:
+            self.tail = []
+            self.pieces.append((self.tail, 0, 0))
+            self.ends.append(len(self))
+        self.tail.append(task)
+        self.pieces[-1] = (self.tail, 0, len(self.tail))
+        self.ends[-1] += 1
+
+    def __len__(self):
+        return self.ends[-1] if self.ends else 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("task index out of range")
+        piece = bisect.bisect_right(self.ends, index)
+        tasks, start, count = self.pieces[piece]
+        return tasks[start + index - (self.ends[piece] - count)]
+
+    def __iter__(self):
+        for tasks, start, count in self.pieces:
+            for index in range(start, start + count):
+                yield tasks[index]
+
+
+def load_cache(path, url, delimiter):
+    """Возвращает запись кэша для источника или None, если кэш не подходит."""
+    mapped = map_cache(path)
+    if mapped is None:
+        return None
+    buffer, entry, data_path = mapped
+    if entry.get("url") != url or entry.get("delimiter") != delimiter:
+        buffer.close()
+        return None
+    return cache_entry(buffer, entry, data_path)
+
+
+def open_cache(path):
+    """Открывает кэш независимо от источника; None, если он не читается."""
+    mapped = map_cache(path)
+    if mapped is None:
+        return None
+    return cache_entry(*mapped)
+
+
+def cache_file(path):
+    """Файл с данными кэша: текущее поколение или сам path."""
+    try:
+        with open(path + CURRENT_SUFFIX, encoding='utf-8') as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return path
+    return os.path.join(os.path.dirname(path), name)
+
+
+def map_cache(path):
+    """Отображает файл в память и читает метаданные.
+
+    Возвращает (буфер, метаданные, файл данных) или None.
+    """
+    path = cache_file(path)
+    if not os.path.exists(path) or os.path.getsize(path) < HEADER.size + TRAILER.size:
+        return None
+
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    # Кэш старого формата или другой версии не используется
+    magic, version = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or version != CACHE_VERSION:
+        buffer.close()
+        return None
+
+    # Дописывание, прерванное сбоем, оставляет в конце файла не метаданные
+    meta = read_meta(buffer, len(buffer))
+    if meta is None:
+        buffer.close()
+        return None
+    return buffer, meta, path
+
+
+def read_meta(data, size):
+    """Метаданные файла кэша размером size (buffer или mmap) или None."""
+    meta_offset, meta_length, magic = TRAILER.unpack_from(data, size - TRAILER.size)
+    if magic != MAGIC or meta_offset + meta_length > size - TRAILER.size:
+        return None
+    try:
+        return json.loads(data[meta_offset:meta_offset + meta_length].decode('utf-8'))
+    except ValueError:
+        return None
+
+
+def cache_entry(buffer, entry, path=None):
+    """Дополняет метаданные списками заданий по предметам (и хешами, если есть)."""
+    view = memoryview(buffer)
+    tasks_data = {}
+    for subject, (position, count) in entry.pop("index").items():
+        spans = view[position:position + 16 * count].cast('Q')
+        tasks_data[subject] = CachedTasks(buffer, spans, path)
+    entry["tasks"] = tasks_data
+    hash_index = entry.pop("hash_index", None)
+    if hash_index is not None:
+        position, count = hash_index
+        entry["hashes"] = view[position:position + 8 * count].cast('Q')
+    return entry
+
+
+def validators_from_headers(headers):
+    """Извлекает валидаторы (ETag, Last-Modified) из заголовков ответа."""
+    headers = headers or {}
+    return {
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified")
+    }
+
+
+def save_cache(path, url, delimiter, tasks_data, headers=None, files=None, sync=None, versioned=False,
+               hashes=None):
+    """Сохраняет задания вместе с валидаторами ответа (ETag, Last-Modified).
+
+    files — валидаторы отдельных файлов, если кэш собран из нескольких
+    источников (синхронизация всех предметов); sync — сведения о кусках
+    файла для дельта-обновления по манифесту. versioned=True — для кэша,
+    который может быть открыт (приложение и его работник): данные пишутся
+    в новое поколение, и открытый файл остается на месте. hashes — хеши
+    вопросов объединенного банка (merge.content_hash), чтобы не считать
+    их заново при следующем объединении.
+
+    Списки из отрезков текущего файла кэша дописываются в него (см.
+    patch_cache); тогда возвращается запись с заданиями из файла.
+    """
+    entry = {
+        "version": CACHE_VERSION,
+        "url": url,
+        "delimiter": delimiter,
+        **validators_from_headers(headers),
+        "files": files or {},
+        "sync": sync
+    }
+
+    patched = patch_cache(path, entry, tasks_data, hashes, versioned)
+    if patched is not None:
+        return patched
+
+    # Пишем во временный файл и атомарно подменяем, чтобы не испортить кэш
+    target = new_target(path, versioned)
+    tmp_path = target + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, CACHE_VERSION))
+        tables = {subject: write_records(f, tasks) for subject, tasks in tasks_data.items()}
+        # Сколько можно дописать, прежде чем файл будет записан заново
+        entry["data_size"] = f.tell()
+        write_index(f, entry, tables, hashes)
+    publish(path, tmp_path, target, versioned)
+
+    entry["tasks"] = tasks_data
+    if hashes is not None:
+        entry["hashes"] = hashes
+    return entry
+
+
+def new_target(path, versioned):
+    """Файл, в который пишется сохранение: новое поколение или сам path."""
+    return f"{path}{GENERATION_SUFFIX}{uuid.uuid4().hex[:12]}" if versioned else path
+
+
+def publish(path, tmp_path, target, versioned):
+    """Подменяет target записанным tmp_path и переключает ссылку кэша."""
+    os.replace(tmp_path, target)
+    if versioned:
+        switch_generation(path, target)
+    else:
+        # Кэш, записанный целиком, важнее ссылки на прежнее поколение
+        remove_file(path + CURRENT_SUFFIX)
+
+
+def write_records(f, tasks):
+    """Пишет записи заданий; возвращает таблицу (начало, конец) каждой."""
+    spans = array('Q')
+    position = f.tell()
+    for task in tasks:
+        record = json.dumps(task, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        f.write(record)
+        spans.append(position)
+        position += len(record)
+        spans.append(position)
+    return spans
+
+
+def write_index(f, entry, tables, hashes=None):
+    """Пишет таблицы записей, хеши, метаданные и хвост файла."""
+    index = {}
+    for subject, spans in tables.items():
+        # Выравниваем таблицу по 8 байт для чтения через memoryview
+        f.write(b"\0" * (-f.tell() % 8))
+        index[subject] = [f.tell(), len(spans) // 2]
+        f.write(spans.tobytes())
+
+    meta = {**entry, "index": index}
+    if hashes is not None:
+        hashes = array('Q', hashes)
+        f.write(b"\0" * (-f.tell() % 8))
+        meta["hash_index"] = [f.tell(), len(hashes)]
+        f.write(hashes.tobytes())
+
+    meta = json.dumps(meta, ensure_ascii=False).encode('utf-8')
+    meta_offset = f.tell()
+    f.write(meta)
+    f.write(TRAILER.pack(meta_offset, len(meta), MAGIC))
+
+
+def patch_cache(path, entry, tasks_data, hashes=None, versioned=False):
+    """Сохраняет копию текущего файла кэша с дописанными новыми заданиями.
+
+    Подходит, если списки заданий собраны из отрезков CachedTasks этого
+    файла и новых заданий (SplicedTasks). Записи из файла не читаются и
+    не кодируются: копия получает их байт в байт, а в таблицы попадают
+    прежние смещения. Сам файл не меняется: он может быть отображен в
+    память. Возвращает запись кэша или None, если файл нужно записать
+    целиком.
+    """
+    current = cache_file(path)
+    pieces = {subject: splice_pieces(tasks) for subject, tasks in tasks_data.items()}
+    sources = [tasks for subject_pieces in pieces.values() for tasks, _, _ in subject_pieces]
+    cached = [tasks for tasks in sources if isinstance(tasks, CachedTasks)]
+    if not cached or any(tasks.path != current for tasks in cached):
+        return None
+    if not all(isinstance(tasks, (CachedTasks, list)) for tasks in sources):
+        return None
+
+    # Поколения не меняются после записи: отображение видит весь файл
+    buffer = cached[0].buffer
+    end = len(buffer)
+    meta = read_meta(buffer, end)
+    if meta is None:
+        return None
+    data_size = meta.get("data_size", 0)
+    # Дописанного стало больше, чем записанного целиком: пора переписать файл
+    if end > 2 * data_size:
+        return None
+
+    target = new_target(path, versioned)
+    tmp_path = target + ".tmp"
+    try:
+        shutil.copyfile(current, tmp_path)
+        with open(tmp_path, 'r+b') as f:
+            f.seek(end)
+            tables = {}
+            for subject, subject_pieces in pieces.items():
+                spans = tables[subject] = array('Q')
+                for tasks, start, count in subject_pieces:
+                    if isinstance(tasks, CachedTasks):
+                        spans.frombytes(tasks.spans[2 * start:2 * (start + count)].tobytes())
+                    else:
+                        spans.extend(write_records(f, tasks[start:start + count]))
+            write_index(f, {**entry, "data_size": data_size}, tables, hashes)
+        publish(path, tmp_path, target, versioned)
+    except BaseException:
+        remove_file(tmp_path)
+        raise
+
+    return cache_entry(*map_cache(path))
+
+
+def splice_pieces(tasks):
+    """Отрезки (задания, начало, число), из которых состоит список."""
+    if isinstance(tasks, SplicedTasks):
+        return tasks.pieces
+    return [(tasks, 0, len(tasks))]
+
+
+def switch_generation(path, target):
+    """Переключает ссылку кэша на поколение target и удаляет старые поколения."""
+    tmp_path = path + CURRENT_SUFFIX + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(os.path.basename(target))
+    os.replace(tmp_path, path + CURRENT_SUFFIX)
+
+    for old in glob.glob(glob.escape(path + GENERATION_SUFFIX) + "*"):
+        if old != target and not old.endswith(".tmp"):
+            remove_file(old)
+
+
+def remove_file(path):
+    """Удаляет файл, если можно; отображенный в память (Windows) остается до следующего раза."""
+    try:
+        os.remove(path)
+    except (FileNotFoundError, PermissionError):
+        pass
+
+
+def conditional_headers(entry):
+    """Заголовки условного запроса для проверки актуальности кэша."""
+    headers = {}
+    if entry:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
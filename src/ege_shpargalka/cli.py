@@ -0,0 +1,315 @@
+"""Командная строка: python -m ege_shpargalka <команда>.
+
+Команды работают без графического интерфейса, поэтому их можно
+запускать на сервере сборки: заранее собрать кэш для приложения,
+проверить банк заданий перед публикацией или посмотреть статистику.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+
+from ege_shpargalka import analytics
+from ege_shpargalka.cache import open_cache, save_cache
+from ege_shpargalka.core import ingest_source, is_url, read_chunks, stats_report, validate_rows
+from ege_shpargalka.delta import MANIFEST_SUFFIX, build_manifest
+from ege_shpargalka.ingest import AUTO_DELIMITER, CHUNK_SIZE, CsvStream
+from ege_shpargalka.journal import StatsJournal
+from ege_shpargalka.merge import MERGED_SOURCE, MergedBank
+from ege_shpargalka.pacing import SolveTimes
+from ege_shpargalka.sync import BASE_URL
+
+# Как часто выводить прогресс разбора (заданий)
+PROGRESS_EVERY = 100_000
+
+# Столбцы CSV при выгрузке кэша; файл снова читается командой ingest
+EXPORT_COLUMNS = {
+    "subject": None,
+    "question_text": "question",
+    "correct_answer": "answer",
+    "topic": "topic",
+    "difficulty": "difficulty",
+    "explanation": "explanation",
+    "task_number": "number"
+}
+
+
+def throughput(result):
+    """Строка со скоростью разбора."""
+    seconds = max(result["seconds"], 1e-9)
+    stream = result["stream"]
+    rate = f"{stream.rows_read / seconds:,.0f}".replace(",", " ")
+    return (
+        f"{stream.rows_read} строк, {result['count']} заданий за {seconds:.2f} с: "
+        f"{rate} строк/с, {stream.bytes_read / seconds / 1024 / 1024:.1f} МБ/с "
+        f"(кодировка {stream.encoding or 'utf-8'}, разделитель {stream.delimiter!r})"
+    )
+
+
+def progress_printer():
+    """Печатает в stderr, сколько заданий уже разобрано."""
+    state = {"count": 0, "next": PROGRESS_EVERY}
+
+    def on_batch(added):
+        state["count"] += len(added)
+        if state["count"] >= state["next"]:
+            state["next"] += PROGRESS_EVERY
+            print(f"\rРазобрано {state['count']} заданий...", end="", file=sys.stderr, flush=True)
+
+    return on_batch
+
+
+def cmd_ingest(args):
+    """Разбирает банк и сохраняет кэш, который приложение подхватит при запуске."""
+    result = ingest_source(args.source, args.delimiter, on_batch=progress_printer())
+    print(file=sys.stderr)
+
+    # Кэш привязан к адресу, который указан в настройках приложения
+    key = args.key or (args.source if is_url(args.source) else BASE_URL + os.path.basename(args.source))
+    save_cache(args.output, key, args.delimiter, result["tasks"], result["headers"])
+
+    print(throughput(result))
+    for subject, tasks in result["tasks"].items():
+        print(f"  {subject}: {len(tasks)}")
+    print(f"Кэш сохранен в {args.output} для {key}")
+    return 0
+
+
+def cmd_merge(args):
+    """Добавляет источники в объединенный кэш или убирает их оттуда."""
+    entry = open_cache(args.output)
+    if entry is not None and entry.get("url") != MERGED_SOURCE:
+        print(f"{args.output} собран не командой merge", file=sys.stderr)
+        return 1
+    bank = MergedBank.from_entry(entry) if entry else MergedBank()
+
+    for source in args.remove:
+        if source not in bank.sources:
+            print(f"Источника {source} нет в банке", file=sys.stderr)
+            return 1
+        info = bank.remove_source(source)
+        print(f"Удален {source}: {sum(count for _, count in info['subjects'].values())} заданий")
+
+    for source in args.sources:
+        result = ingest_source(source, args.delimiter)
+        pairs = ((subject, task) for subject, tasks in result["tasks"].items() for task in tasks)
+        added = bank.add_source(source, pairs)
+        print(f"Добавлен {source}: {len(added)} заданий, "
+              f"повторов пропущено: {bank.sources[source]['duplicates']}")
+
+    save_cache(args.output, MERGED_SOURCE, AUTO_DELIMITER, bank.tasks_data, files=bank.sources,
+               hashes=bank.hashes)
+    for subject, tasks in bank.tasks_data.items():
+        print(f"  {subject}: {len(tasks)}")
+    print(f"Объединенный кэш сохранен в {args.output}, источников: {len(bank.sources)}")
+    return 0
+
+
+def cmd_validate(args):
+    """Проверяет банк и завершается с кодом 1, если есть ошибки."""
+    if is_url(args.source):
+        import requests
+
+        response = requests.get(args.source, timeout=10, stream=True)
+        response.raise_for_status()
+        chunks = response.iter_content(CHUNK_SIZE)
+    else:
+        chunks = read_chunks(args.source)
+
+    stream = CsvStream(chunks, delimiter=args.delimiter)
+    count, problems = validate_rows(stream.rows())
+    for row, message in problems[:args.limit]:
+        print(f"строка {row}: {message}")
+    if len(problems) > args.limit:
+        print(f"... и еще {len(problems) - args.limit}")
+
+    print(f"Проверено строк: {count}, проблем: {len(problems)} "
+          f"(кодировка {stream.encoding or 'utf-8'}, разделитель {stream.delimiter!r})")
+    return 1 if problems or count == 0 else 0
+
+
+def cmd_export_cache(args):
+    """Выгружает задания из кэша в CSV или JSON Lines."""
+    entry = open_cache(args.cache)
+    if entry is None:
+        print(f"Кэш {args.cache} не найден или имеет другой формат", file=sys.stderr)
+        return 1
+
+    output = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    export_format = args.format or ("csv" if (args.output or "").endswith(".csv") else "jsonl")
+    try:
+        if export_format == "csv":
+            writer = csv.writer(output)
+            writer.writerow(EXPORT_COLUMNS)
+            fields = [field for field in EXPORT_COLUMNS.values() if field]
+            for subject, tasks in entry["tasks"].items():
+                for task in tasks:
+                    writer.writerow([subject] + [task.get(field, '') for field in fields])
+        else:
+            for subject, tasks in entry["tasks"].items():
+                for task in tasks:
+                    output.write(json.dumps({"subject": subject, **task}, ensure_ascii=False) + "\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    total = sum(len(tasks) for tasks in entry["tasks"].values())
+    print(f"Выгружено {total} заданий из {args.cache} (источник {entry.get('url')})", file=sys.stderr)
+    return 0
+
+
+def cmd_stats(args):
+    """Печатает статистику из файлов приложения, ничего в них не меняя."""
+    journal = StatsJournal(
+        os.path.join(args.dir, "stats.json"),
+        os.path.join(args.dir, "stats_journal.jsonl"),
+        os.path.join(args.dir, "attempts.jsonl")
+    )
+    stats = journal.load(start_writer=False)
+    if args.json:
+        print(json.dumps(stats, indent=2, ensure_ascii=False))
+        return 0
+
+    stats_text, subjects_text = stats_report(stats)
+    print(stats_text)
+    print()
+    print(subjects_text)
+
+    pacing = SolveTimes.from_stats(stats['solve_times']).report()
+    if pacing:
+        print()
+        print(pacing)
+
+    if analytics.available():
+        history = analytics.AttemptHistory.load(journal.history_path)
+        report = analytics.weak_topics_report(history.topic_stats())
+        if report:
+            print()
+            print(report)
+    return 0
+
+
+def cmd_manifest(args):
+    """Строит манифест кусков, который публикуется рядом с CSV."""
+    with open(args.source, 'rb') as f:
+        manifest = build_manifest(f.read(), args.delimiter)
+    output = args.output or args.source + MANIFEST_SUFFIX
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+    print(f"Манифест сохранен в {output}: {len(manifest['chunks'])} кусков, "
+          f"{manifest['size']} байт (кодировка {manifest['encoding']}, "
+          f"разделитель {manifest['delimiter']!r})")
+    return 0
+
+
+def cmd_bench(args):
+    """Замеряет скорость разбора банка или выполняет набор замеров."""
+    if not args.source:
+        return run_benchmarks(args)
+
+    best = None
+    for run in range(args.repeat):
+        result = ingest_source(args.source, args.delimiter)
+        print(f"прогон {run + 1}: {throughput(result)}")
+        if best is None or result["seconds"] < best["seconds"]:
+            best = result
+    print(f"лучший: {throughput(best)}")
+    return 0
+
+
+def run_benchmarks(args):
+    """Набор замеров на синтетическом банке со сравнением с базовой линией."""
+    from ege_shpargalka.benchmarks import compare, load_baseline, run_suite, save_baseline
+
+    results = run_suite(args.size, repeat=args.repeat)
+    baseline = load_baseline(args.baseline, args.size)
+    for name, seconds in results.items():
+        base = baseline.get(name)
+        change = f" ({(seconds / base - 1) * 100:+.0f}%)" if base else ""
+        print(f"{name:32} {seconds * 1000:12.4f} мс{change}")
+
+    if args.update_baseline or not baseline:
+        save_baseline(args.baseline, args.size, results)
+        print(f"Базовая линия для {args.size} сохранена в {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    for name, base, seconds in regressions:
+        print(f"РЕГРЕССИЯ {name}: {base * 1000:.4f} мс -> {seconds * 1000:.4f} мс")
+    return 1 if regressions else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m ege_shpargalka",
+        description="Подготовка банков заданий и статистика без графического интерфейса. "
+                    "Без команды запускается приложение."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_source(command):
+        command.add_argument("source", help="CSV-файл или URL")
+        command.add_argument("-d", "--delimiter", default=AUTO_DELIMITER,
+                             help="разделитель CSV (по умолчанию определяется автоматически)")
+
+    command = commands.add_parser("ingest", help="разобрать банк и собрать кэш для приложения")
+    add_source(command)
+    command.add_argument("-o", "--output", default="tasks_cache.bin", help="файл кэша")
+    command.add_argument("--key", help="URL, к которому привязать кэш (как в настройках приложения)")
+    command.set_defaults(handler=cmd_ingest)
+
+    command = commands.add_parser("merge", help="объединить банки в один кэш без повторов")
+    command.add_argument("sources", nargs="*", help="CSV-файлы или URL; повторный источник обновляется")
+    command.add_argument("-d", "--delimiter", default=AUTO_DELIMITER,
+                         help="разделитель CSV (по умолчанию определяется автоматически)")
+    command.add_argument("-o", "--output", default="tasks_cache.bin", help="файл кэша")
+    command.add_argument("--remove", action="append", default=[], metavar="SOURCE",
+                         help="убрать задания источника")
+    command.set_defaults(handler=cmd_merge)
+
+    command = commands.add_parser("validate", help="проверить банк заданий")
+    add_source(command)
+    command.add_argument("--limit", type=int, default=50, help="сколько проблем показать")
+    command.set_defaults(handler=cmd_validate)
+
+    command = commands.add_parser("export-cache", help="выгрузить задания из кэша")
+    command.add_argument("cache", nargs="?", default="tasks_cache.bin", help="файл кэша")
+    command.add_argument("-o", "--output", help="файл для выгрузки (по умолчанию stdout)")
+    command.add_argument("--format", choices=["csv", "jsonl"], help="формат выгрузки")
+    command.set_defaults(handler=cmd_export_cache)
+
+    command = commands.add_parser("stats", help="показать статистику")
+    command.add_argument("--dir", default=".", help="папка с файлами статистики")
+    command.add_argument("--json", action="store_true", help="вывести статистику в JSON")
+    command.set_defaults(handler=cmd_stats)
+
+    command = commands.add_parser("manifest", help="построить манифест для дельта-обновления")
+    command.add_argument("source", help="CSV-файл")
+    command.add_argument("-d", "--delimiter", default=AUTO_DELIMITER,
+                         help="разделитель CSV (по умолчанию определяется автоматически)")
+    command.add_argument("-o", "--output", help=f"файл манифеста (по умолчанию <source>{MANIFEST_SUFFIX})")
+    command.set_defaults(handler=cmd_manifest)
+
+    command = commands.add_parser(
+        "bench", help="замерить скорость разбора банка или выполнить набор замеров"
+    )
+    command.add_argument("source", nargs="?",
+                         help="CSV-файл или URL; без него — замеры на синтетическом банке")
+    command.add_argument("-d", "--delimiter", default=AUTO_DELIMITER, help="разделитель CSV")
+    command.add_argument("--repeat", type=int, default=3, help="число прогонов")
+    command.add_argument("--size", default="1k", help="размер синтетического банка: 1k, 100k, 1m")
+    command.add_argument("--baseline", default=os.path.join("benchmarks", "baseline.json"),
+                         help="файл базовой линии")
+    command.add_argument("--update-baseline", action="store_true",
+                         help="записать результаты как новую базовую линию")
+    command.add_argument("--threshold", type=float, default=0.25,
+                         help="допустимое замедление (0.25 = 25%%)")
+    command.set_defaults(handler=cmd_bench)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
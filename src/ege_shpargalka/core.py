@@ -0,0 +1,166 @@
+"""Работа с банками заданий и статистикой без графического интерфейса.
+
+Этими функциями пользуются и приложение, и командная строка
+(python -m ege_shpargalka), поэтому здесь нет импортов toga.
+"""
+import time
+
+from ege_shpargalka.history import task_id
+from ege_shpargalka.ingest import AUTO_DELIMITER, CHUNK_SIZE, CsvStream, row_to_task, subject_from_url
+from ege_shpargalka.matching import compile_answer
+from ege_shpargalka.search import normalize
+from ege_shpargalka.tasks import TaskColumns
+from ege_shpargalka.variants import VARIANT_SIZE
+
+SUBJECT_NAMES = {
+    "math": "Математика",
+    "physics": "Физика",
+    "informatics": "Информатика",
+    "russian": "Русский язык"
+}
+
+DIFFICULTY_NAMES = {"easy": "Легко", "medium": "Средне", "hard": "Сложно"}
+
+
+def is_url(source):
+    return source.startswith(("http://", "https://"))
+
+
+def read_chunks(path, chunk_size=CHUNK_SIZE):
+    """Читает файл кусками, не загружая его целиком."""
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def add_batch(tasks_data, batch):
+    """Раскладывает пачку заданий по предметам.
+
+    Возвращает тройки (предмет, номер в банке предмета, задание), чтобы
+    вызывающий код мог сразу добавить их в индексы.
+    """
+    added = []
+    for subject, task in batch:
+        tasks = tasks_data.get(subject)
+        if tasks is None:
+            tasks = tasks_data[subject] = TaskColumns()
+        added.append((subject, len(tasks), task))
+        tasks.append(task)
+    return added
+
+
+def ingest_stream(stream, default_subject, on_batch=None):
+    """Разбирает поток в задания по предметам. Возвращает (задания, число)."""
+    tasks_data = {}
+    count = 0
+    for batch in stream.task_batches(default_subject):
+        added = add_batch(tasks_data, batch)
+        count += len(batch)
+        if on_batch:
+            on_batch(added)
+    return tasks_data, count
+
+
+def ingest_source(source, delimiter=AUTO_DELIMITER, on_batch=None, timeout=10):
+    """Загружает банк из файла или по URL.
+
+    Возвращает словарь: tasks (задания по предметам), count, headers
+    (заголовки ответа или None для файла), stream (кодировка, разделитель,
+    прочитанные байты) и seconds.
+    """
+    started = time.perf_counter()
+    headers = None
+    if is_url(source):
+        import requests
+
+        with requests.get(source, timeout=timeout, stream=True) as response:
+            response.raise_for_status()
+            stream = CsvStream(response.iter_content(CHUNK_SIZE), delimiter=delimiter)
+            tasks_data, count = ingest_stream(stream, subject_from_url(source), on_batch)
+            headers = response.headers
+    else:
+        stream = CsvStream(read_chunks(source), delimiter=delimiter)
+        tasks_data, count = ingest_stream(stream, subject_from_url(source), on_batch)
+
+    return {
+        "tasks": tasks_data,
+        "count": count,
+        "headers": headers,
+        "stream": stream,
+        "seconds": time.perf_counter() - started
+    }
+
+
+def validate_rows(rows):
+    """Проверяет строки CSV банка. Возвращает (число строк, список проблем).
+
+    Проблема — пара (номер строки данных, описание).
+    """
+    problems = []
+    seen = {}
+    count = 0
+    for count, row in enumerate(rows, 1):
+        if None in row:
+            problems.append((count, "лишние поля в строке"))
+        task = row_to_task(row)
+        if task is None:
+            problems.append((count, "нет вопроса или ответа"))
+            continue
+
+        if task['difficulty'] not in DIFFICULTY_NAMES:
+            problems.append((count, f"неизвестная сложность {task['difficulty']!r}"))
+        number = task.get('number')
+        if number and not (number.isdigit() and 1 <= int(number) <= VARIANT_SIZE):
+            problems.append((count, f"номер задания {number!r} вне 1–{VARIANT_SIZE}"))
+        if not compile_answer(task['answer']).keys:
+            problems.append((count, "ответ не распознан"))
+
+        key = task_id({"question": normalize(task['question'])})
+        if key in seen:
+            problems.append((count, f"вопрос повторяет строку {seen[key]}"))
+        else:
+            seen[key] = count
+    return count, problems
+
+
+def stats_report(stats, today=None):
+    """Текст сводки статистики: (общая часть, по предметам)."""
+    total = stats['total_attempts']
+    correct = stats['correct_answers']
+
+    if total > 0:
+        percentage = (correct / total) * 100
+        stats_text = (
+            f"Всего решено: {total} заданий\n"
+            f"Правильных ответов: {correct}\n"
+            f"Точность: {percentage:.1f}%\n"
+            f"Завершено вариантов: {stats['variants_completed']}\n"
+            f"Лучший результат: {stats['best_score']} баллов"
+        )
+    else:
+        stats_text = "Вы еще не решили ни одного задания"
+
+    # Сводки за сегодня и по сложности уже посчитаны при записи попыток
+    today = stats['days'].get(today or time.strftime("%Y-%m-%d"))
+    if today:
+        stats_text += f"\nСегодня: {today['correct']}/{today['attempts']}"
+
+    for difficulty, data in stats['difficulties'].items():
+        perc = data['correct'] / data['attempts'] * 100
+        name = DIFFICULTY_NAMES.get(difficulty, difficulty)
+        stats_text += f"\n{name}: {data['correct']}/{data['attempts']} ({perc:.1f}%)"
+
+    # Статистика по предметам
+    subjects_text = "Статистика по предметам:\n"
+    for subject, data in stats['subjects'].items():
+        subject_name = SUBJECT_NAMES.get(subject, subject)
+        if data['attempts'] > 0:
+            perc = (data['correct'] / data['attempts'] * 100)
+            subjects_text += f"\n{subject_name}: {data['correct']}/{data['attempts']} ({perc:.1f}%)"
+        else:
+            subjects_text += f"\n{subject_name}: 0/0 (0%)"
+
+    return stats_text, subjects_text
@@ -0,0 +1,253 @@
+"""Дельта-обновление банков заданий по манифесту кусков.
+
+Рядом с CSV публикуется манифест (<файл>.manifest.json): заголовок,
+кодировка, разделитель и список кусков файла — (смещение, длина, хеш).
+Куски состоят из целых строк, а границы между ними выбираются по
+содержимому строк, поэтому правка или вставка вопроса меняет только
+свой кусок, а не сдвигает все следующие.
+
+Клиент помнит хеши кусков и то, какие задания из них получились. При
+обновлении он скачивает запросами Range только новые куски, остальные
+задания берет из кэша отрезками, не читая их (SplicedTasks), поэтому в
+файл кэша дописываются только задания новых кусков. Если манифеста нет,
+файл загружается целиком.
+"""
+import csv
+import hashlib
+import io
+import zlib
+from urllib.parse import urlsplit, urlunsplit
+
+from ege_shpargalka.cache import SplicedTasks
+from ege_shpargalka.ingest import (
+    AUTO_DELIMITER, CHUNK_SIZE, SAMPLE_SIZE, detect_delimiter, detect_encoding,
+    subject_from_url, subject_task
+)
+from ege_shpargalka.metrics import metrics
+
+MANIFEST_SUFFIX = ".manifest.json"
+MANIFEST_VERSION = 1
+
+# Кусок заканчивается на строке, у которой crc32 делится на CHUNK_ROWS,
+# то есть в среднем через CHUNK_ROWS строк, но не длиннее CHUNK_MAX байт
+CHUNK_ROWS = 128
+CHUNK_MAX = 256 * 1024
+
+# Куски, между которыми меньше RANGE_GAP байт, загружаются одним запросом
+RANGE_GAP = 4 * 1024
+
+
+class DeltaError(Exception):
+    """Файл на сервере не совпадает с манифестом."""
+
+
+def chunk_hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def row_ends(data, start=0):
+    """Смещения концов строк CSV; перевод строки в кавычках строку не завершает."""
+    quotes = 0
+    position = start
+    while position < len(data):
+        newline = data.find(b"\n", position)
+        if newline < 0:
+            yield len(data)
+            return
+        quotes += data.count(b'"', position, newline)
+        position = newline + 1
+        if quotes % 2 == 0:
+            yield position
+            quotes = 0
+
+
+def build_manifest(data, delimiter=AUTO_DELIMITER):
+    """Строит манифест для содержимого CSV-файла (bytes)."""
+    encoding = detect_encoding(data)
+    header_end = next(row_ends(data), len(data))
+    if delimiter == AUTO_DELIMITER:
+        delimiter = detect_delimiter(data[:SAMPLE_SIZE].decode(encoding, errors="replace"))
+
+    chunks = []
+    start = row_start = header_end
+    for end in row_ends(data, header_end):
+        if end - start >= CHUNK_MAX or zlib.crc32(data[row_start:end]) % CHUNK_ROWS == 0:
+            chunks.append([start, end - start, chunk_hash(data[start:end])])
+            start = end
+        row_start = end
+    if start < len(data):
+        chunks.append([start, len(data) - start, chunk_hash(data[start:])])
+
+    return {
+        "version": MANIFEST_VERSION,
+        "size": len(data),
+        "encoding": encoding,
+        "delimiter": delimiter,
+        "header": data[:header_end].decode(encoding).rstrip("\r\n"),
+        "chunks": chunks
+    }
+
+
+def manifest_url(url):
+    """Адрес манифеста: к пути файла добавляется MANIFEST_SUFFIX."""
+    parts = urlsplit(url)
+    return urlunsplit(parts._replace(path=parts.path + MANIFEST_SUFFIX))
+
+
+def fetch_manifest(session, url, timeout=10):
+    """Загружает манифест файла; None, если его нет или формат незнаком.
+
+    session — сессия requests или сам модуль requests.
+    """
+    response = session.get(manifest_url(url), timeout=timeout)
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    try:
+        manifest = response.json()
+    except ValueError:
+        # Вместо манифеста сервер отдал что-то другое
+        return None
+    if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def coalesce(chunks, gap=RANGE_GAP):
+    """Группирует куски (по возрастанию смещения) в диапазоны для запросов Range."""
+    groups = []
+    for chunk in chunks:
+        if groups and chunk[0] - (groups[-1][-1][0] + groups[-1][-1][1]) <= gap:
+            groups[-1].append(chunk)
+        else:
+            groups.append([chunk])
+    return groups
+
+
+def split_stream(pieces, base, chunks):
+    """Режет поток байтов, начинающийся со смещения base, на куски манифеста."""
+    pieces = iter(pieces)
+    buffer = bytearray()
+    for offset, length, digest in chunks:
+        while base + len(buffer) < offset + length:
+            piece = next(pieces, None)
+            if piece is None:
+                raise DeltaError("ответ сервера оборвался")
+            buffer += piece
+        start = offset - base
+        data = bytes(buffer[start:start + length])
+        del buffer[:start + length]
+        base = offset + length
+        if chunk_hash(data) != digest:
+            raise DeltaError(f"хеш куска по смещению {offset} не совпадает с манифестом")
+        yield data
+
+
+def fetch_chunks(session, url, chunks, timeout=10):
+    """Загружает куски запросами Range и отдает их байты по порядку."""
+    groups = coalesce(chunks)
+    for index, group in enumerate(groups):
+        start = group[0][0]
+        end = group[-1][0] + group[-1][1]
+        headers = {"Range": f"bytes={start}-{end - 1}"}
+        with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            if response.status_code == 206:
+                yield from split_stream(response.iter_content(CHUNK_SIZE), start, group)
+                continue
+            # Сервер без поддержки Range отдает файл целиком: из этого ответа
+            # берутся и все оставшиеся куски, новых запросов не будет
+            metrics.count("delta.range_ignored")
+            rest = [chunk for group in groups[index:] for chunk in group]
+            yield from split_stream(response.iter_content(CHUNK_SIZE), 0, rest)
+            return
+
+
+def parse_chunk(data, fieldnames, encoding, delimiter, default_subject):
+    """Пары (предмет, задание) из куска файла без заголовка."""
+    text = data.decode(encoding, errors="replace")
+    reader = csv.DictReader(io.StringIO(text), fieldnames=fieldnames, delimiter=delimiter)
+    pairs = []
+    for row in reader:
+        pair = subject_task(row, default_subject)
+        if pair is not None:
+            pairs.append(pair)
+    return pairs
+
+
+def known_chunks(manifest, delimiter, cached, sync):
+    """Куски прошлой версии, задания которых можно взять из кэша: {хеш: отрезки}."""
+    if not sync or cached is None:
+        return {}
+    if (sync.get("header"), sync.get("encoding"), sync.get("delimiter")) != (
+            manifest["header"], manifest["encoding"], delimiter):
+        return {}
+    known = {}
+    for digest, spans in sync["chunks"]:
+        if all(subject in cached and start + count <= len(cached[subject])
+               for subject, (start, count) in spans.items()):
+            known.setdefault(digest, spans)
+    return known
+
+
+def update_tasks(session, url, delimiter, manifest, cached=None, sync=None, timeout=10):
+    """Собирает задания новой версии файла по манифесту.
+
+    cached — задания из кэша, sync — сведения о кусках, сохраненные
+    вместе с ними. Возвращает словарь: changed (False, если файл не
+    изменился), tasks (SplicedTasks по предметам), count, sync (сохранить
+    с кэшем), fetched_chunks, reused_chunks и fetched_bytes.
+    """
+    if delimiter == AUTO_DELIMITER:
+        delimiter = manifest["delimiter"]
+    chunks = manifest["chunks"]
+    known = known_chunks(manifest, delimiter, cached, sync)
+    if known and [chunk[2] for chunk in chunks] == [digest for digest, _ in sync["chunks"]]:
+        return {"changed": False}
+
+    fieldnames = next(csv.reader([manifest["header"]], delimiter=delimiter))
+    default_subject = subject_from_url(url)
+    needed = [chunk for chunk in chunks if chunk[2] not in known]
+    fetched = fetch_chunks(session, url, needed, timeout)
+
+    tasks_data = {}
+    sync_chunks = []
+    try:
+        for offset, length, digest in chunks:
+            # Задания куска идут подряд в списке каждого предмета
+            spans = {}
+            known_spans = known.get(digest)
+            if known_spans is not None:
+                # Задания прежнего куска берутся из кэша отрезком, без чтения
+                for subject, (start, count) in known_spans.items():
+                    tasks = tasks_data.setdefault(subject, SplicedTasks())
+                    spans[subject] = [len(tasks), count]
+                    tasks.add(cached[subject], start, count)
+            else:
+                pairs = parse_chunk(next(fetched), fieldnames, manifest["encoding"],
+                                    delimiter, default_subject)
+                for subject, task in pairs:
+                    tasks = tasks_data.setdefault(subject, SplicedTasks())
+                    spans.setdefault(subject, [len(tasks), 0])[1] += 1
+                    tasks.append(task)
+            sync_chunks.append([digest, spans])
+    finally:
+        fetched.close()
+
+    fetched_bytes = sum(chunk[1] for chunk in needed)
+    metrics.count("delta.fetched_bytes", fetched_bytes)
+    metrics.count("delta.reused_chunks", len(chunks) - len(needed))
+    return {
+        "changed": True,
+        "tasks": tasks_data,
+        "count": sum(len(tasks) for tasks in tasks_data.values()),
+        "sync": {
+            "header": manifest["header"],
+            "encoding": manifest["encoding"],
+            "delimiter": delimiter,
+            "chunks": sync_chunks
+        },
+        "fetched_chunks": len(needed),
+        "reused_chunks": len(chunks) - len(needed),
+        "fetched_bytes": fetched_bytes
+    }
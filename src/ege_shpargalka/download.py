@@ -0,0 +1,285 @@
+"""Докачиваемая загрузка банков заданий.
+
+Файл пишется в <путь>.part, а сведения о загрузке (адрес, ETag,
+Last-Modified, полный размер) — в <путь>.part.json. После обрыва
+соединения загрузка продолжается запросом Range с If-Range с того места,
+где остановилась, — в том же запуске или после перезапуска приложения.
+Если файл на сервере изменился, сервер отдает его целиком и загрузка
+начинается заново. Готовый файл сверяется с Content-Length и ETag.
+
+Download.chunks() отдает байты файла с начала: сначала уже скачанную
+часть с диска, затем из сети, поэтому разбор CSV идет одновременно с
+загрузкой.
+"""
+import hashlib
+import json
+import os
+import time
+from collections import deque
+
+from ege_shpargalka.core import read_chunks
+from ege_shpargalka.ingest import CHUNK_SIZE
+from ege_shpargalka.metrics import INFO, WARNING, log, metrics
+from ege_shpargalka.sync import is_retryable
+
+PART_SUFFIX = ".part"
+META_SUFFIX = ".part.json"
+
+# Таймауты (соединение, чтение) в секундах: общее время загрузки не
+# ограничено, ограничено только ожидание очередного куска
+TIMEOUT = (10, 30)
+
+# Попытки подряд без продвижения загрузки и задержка перед первой из них
+RETRIES = 5
+BACKOFF = 0.5
+
+# За сколько последних секунд считается скорость и как часто о ней сообщать
+SPEED_WINDOW = 3.0
+PROGRESS_INTERVAL = 0.25
+
+
+class DownloadError(Exception):
+    """Загрузка не удалась или файл не совпал с ожидаемым."""
+
+
+class DownloadCancelled(Exception):
+    """Загрузка отменена; скачанная часть сохранена для докачки."""
+
+
+def download_path(directory, url):
+    """Путь загрузки для адреса: по одному файлу на источник."""
+    name = hashlib.blake2b(url.encode('utf-8'), digest_size=8).hexdigest()
+    return os.path.join(directory, f"{name}.csv")
+
+
+def format_speed(speed):
+    """Скорость загрузки для интерфейса: «512 КБ/с», «1.5 МБ/с»."""
+    if speed >= 1024 * 1024:
+        return f"{speed / (1024 * 1024):.1f} МБ/с"
+    return f"{speed / 1024:.0f} КБ/с"
+
+
+class Download:
+    """Загрузка одного файла с докачкой, проверкой и отменой.
+
+    headers — дополнительные заголовки первого запроса (например,
+    If-None-Match из кэша), cancel — событие отмены (threading.Event или
+    multiprocessing.Event), on_progress(получено, всего, байт в секунду)
+    вызывается не чаще PROGRESS_INTERVAL.
+    """
+
+    def __init__(self, url, path, headers=None, cancel=None, on_progress=None,
+                 session=None, timeout=TIMEOUT, retries=RETRIES, backoff=BACKOFF):
+        self.url = url
+        self.path = path
+        self.part_path = path + PART_SUFFIX
+        self.meta_path = path + META_SUFFIX
+        self.request_headers = headers or {}
+        self.cancel = cancel
+        self.on_progress = on_progress
+        self.session = session
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+
+        self.response = None
+        self.meta = {}
+        self.headers = {}
+        self.total = None
+        # Байт уже на диске к началу загрузки и всего
+        self.resumed = 0
+        self.size = 0
+        self.samples = deque()
+        self.reported = 0.0
+
+    def start(self):
+        """Отправляет первый запрос. False, если сервер ответил 304."""
+        import requests
+
+        if self.session is None:
+            self.session = requests
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        meta = self.load_meta()
+        offset = os.path.getsize(self.part_path) if meta else 0
+        response = self.request(offset, meta, self.request_headers)
+        if response.status_code == 304:
+            response.close()
+            self.discard()
+            return False
+        if response.status_code == 416 and offset:
+            # Скачанная часть не меньше файла на сервере: начинаем заново
+            response.close()
+            offset = 0
+            response = self.request(0, None, self.request_headers)
+        response.raise_for_status()
+
+        if response.status_code == 206 and offset:
+            self.resumed = self.size = offset
+            self.meta = meta
+            log(INFO, f"Докачка {self.url} с {offset} байт")
+            metrics.count("download.resumed_bytes", offset)
+        else:
+            self.meta = {
+                "url": self.url,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "total": int(response.headers.get("Content-Length") or 0) or None
+            }
+            with open(self.part_path, 'wb'):
+                pass
+            with open(self.meta_path, 'w', encoding='utf-8') as f:
+                json.dump(self.meta, f)
+        self.total = self.meta["total"]
+        self.headers = dict(response.headers)
+        self.response = response
+        return True
+
+    def load_meta(self):
+        """Сведения о прерванной загрузке этого адреса или None."""
+        try:
+            with open(self.meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("url") != self.url or not os.path.exists(self.part_path):
+            return None
+        if if_range(meta) is None:
+            # Без валидатора нельзя убедиться, что файл на сервере тот же
+            return None
+        return meta
+
+    def request(self, offset, meta, extra_headers=None):
+        """Запрос файла с места offset; сетевые сбои повторяются."""
+        headers = {**(extra_headers or {}), "Accept-Encoding": "identity"}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = if_range(meta)
+        for attempt in range(self.retries + 1):
+            self.check_cancel()
+            try:
+                response = self.session.get(self.url, headers=headers, stream=True,
+                                            timeout=self.timeout)
+                if response.status_code == 429 or response.status_code >= 500:
+                    response.raise_for_status()
+                return response
+            except Exception as e:
+                if attempt == self.retries or not is_retryable(e):
+                    raise
+                self.wait(attempt, e)
+
+    def chunks(self):
+        """Байты файла с начала; в конце файл проверяется и переименовывается."""
+        try:
+            if self.resumed:
+                yield from read_chunks(self.part_path)
+            with open(self.part_path, 'ab') as f:
+                failures = 0
+                while True:
+                    try:
+                        for chunk in self.response.iter_content(CHUNK_SIZE):
+                            self.check_cancel()
+                            f.write(chunk)
+                            self.size += len(chunk)
+                            failures = 0
+                            self.report()
+                            yield chunk
+                        if self.total is None or self.size >= self.total:
+                            break
+                        error = DownloadError("соединение закрыто до конца файла")
+                    except DownloadCancelled:
+                        raise
+                    except Exception as e:
+                        if not is_retryable(e):
+                            raise
+                        error = e
+
+                    failures += 1
+                    if failures > self.retries:
+                        raise DownloadError(f"загрузка прервана после {self.size} байт: {error}")
+                    self.response.close()
+                    f.flush()
+                    self.wait(failures - 1, error)
+                    self.resume()
+            self.verify()
+        finally:
+            if self.response is not None:
+                self.response.close()
+        os.replace(self.part_path, self.path)
+        self.remove(self.meta_path)
+        metrics.count("download.bytes", self.size - self.resumed)
+
+    def resume(self):
+        """Продолжает загрузку после обрыва с текущего размера."""
+        response = self.request(self.size, self.meta)
+        response.raise_for_status()
+        # С нуля сервер отвечает 200, с середины файла — 206
+        if response.status_code != (206 if self.size else 200):
+            response.close()
+            # Файл изменился или сервер не умеет Range: часть уже отдана
+            # разбору, поэтому загрузку придется начать заново
+            self.discard()
+            raise DownloadError("файл на сервере изменился во время загрузки")
+        self.response = response
+        log(INFO, f"Загрузка {self.url} продолжена с {self.size} байт")
+
+    def verify(self):
+        if self.total is not None and self.size != self.total:
+            raise DownloadError(f"получено {self.size} байт вместо {self.total}")
+        etag = self.response.headers.get("ETag")
+        if self.meta.get("etag") and etag and etag != self.meta["etag"]:
+            self.discard()
+            raise DownloadError("ETag файла изменился во время загрузки")
+
+    def report(self):
+        now = time.monotonic()
+        self.samples.append((now, self.size))
+        while now - self.samples[0][0] > SPEED_WINDOW:
+            self.samples.popleft()
+        if self.on_progress and now - self.reported >= PROGRESS_INTERVAL:
+            self.reported = now
+            self.on_progress(self.size, self.total, self.speed())
+
+    def speed(self):
+        """Скорость за последние SPEED_WINDOW секунд, байт в секунду."""
+        if len(self.samples) < 2:
+            return 0.0
+        (started, first), (now, last) = self.samples[0], self.samples[-1]
+        return (last - first) / (now - started) if now > started else 0.0
+
+    def check_cancel(self):
+        if self.cancel is not None and self.cancel.is_set():
+            raise DownloadCancelled()
+
+    def wait(self, attempt, error):
+        """Пауза перед повтором; прерывается отменой."""
+        log(WARNING, f"Сбой загрузки {self.url}: {error}; повтор", key="download")
+        metrics.count("download.retries")
+        delay = self.backoff * 2 ** attempt
+        if self.cancel is None:
+            time.sleep(delay)
+        elif self.cancel.wait(delay):
+            raise DownloadCancelled()
+
+    def discard(self):
+        """Удаляет скачанный файл и сведения о загрузке."""
+        for path in (self.path, self.part_path, self.meta_path):
+            self.remove(path)
+
+    @staticmethod
+    def remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def if_range(meta):
+    """Значение If-Range: сильный ETag или дата изменения."""
+    etag = meta.get("etag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return meta.get("last_modified")
+
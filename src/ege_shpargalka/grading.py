@@ -0,0 +1,90 @@
+"""Проверка завершенного варианта и перевод баллов в стобалльную шкалу.
+
+Все ответы варианта проверяются одним проходом по скомпилированным
+правильным ответам. Результат записывается в статистику одним событием
+журнала, в котором лежат и попытки по каждому заданию.
+"""
+import time
+
+from ege_shpargalka.history import attempt_event
+from ege_shpargalka.matching import grade_answers
+
+# Шкалы перевода первичных баллов в тестовые (индекс — первичный балл)
+SCORE_TABLES = {
+    "math": [
+        0, 6, 11, 17, 22, 27, 34, 40, 46, 52, 58, 64, 66, 68, 70, 72, 74,
+        76, 78, 80, 82, 84, 86, 88, 90, 92, 94, 96, 98, 100, 100, 100, 100
+    ],
+    "physics": [
+        0, 5, 9, 14, 18, 23, 27, 32, 36, 39, 41, 42, 44, 45, 46, 48, 49,
+        50, 51, 53, 54, 55, 56, 58, 59, 60, 61, 62, 64, 66, 68, 70, 72,
+        74, 76, 78, 80, 82, 84, 86, 88, 90, 92, 94, 96, 100
+    ],
+    "informatics": [
+        0, 7, 14, 20, 27, 34, 40, 43, 46, 48, 51, 54, 56, 59, 62, 64, 67,
+        70, 72, 75, 78, 80, 83, 85, 88, 90, 93, 95, 98, 100
+    ],
+    "russian": [
+        0, 3, 5, 8, 10, 12, 15, 17, 20, 22, 24, 27, 29, 32, 34, 36, 37,
+        39, 40, 42, 43, 45, 46, 48, 49, 51, 52, 54, 55, 57, 58, 60, 61,
+        62, 64, 65, 67, 69, 70, 72, 73, 75, 78, 81, 83, 86, 89, 91, 94,
+        97, 100
+    ]
+}
+
+
+def to_test_score(subject, primary, max_primary):
+    """Переводит первичный балл в тестовый по шкале предмета.
+
+    Если в варианте меньше заданий, чем в настоящем экзамене, первичный
+    балл пропорционально пересчитывается на максимум шкалы.
+    """
+    table = SCORE_TABLES.get(subject, SCORE_TABLES["math"])
+    if max_primary <= 0:
+        return 0
+    scaled = round(primary * (len(table) - 1) / max_primary)
+    return table[min(max(scaled, 0), len(table) - 1)]
+
+
+def grade_variant(subject, tasks, answers):
+    """Проверяет ответы варианта.
+
+    tasks — задания варианта по порядку, answers — ответы ученика
+    (словарь номер задания -> ответ или список). За каждое верное
+    задание начисляется один первичный балл.
+    """
+    if isinstance(answers, dict):
+        answers = [answers.get(index, "") for index in range(len(tasks))]
+    results = grade_answers(
+        (task['answer'], answer) for task, answer in zip(tasks, answers)
+    )
+    primary = sum(results)
+    return {
+        "results": results,
+        "primary": primary,
+        "max_primary": len(tasks),
+        "score": to_test_score(subject, primary, len(tasks))
+    }
+
+
+def grade_submissions(submissions):
+    """Проверяет пачку вариантов (предмет, задания, ответы) за один проход."""
+    return [grade_variant(subject, tasks, answers) for subject, tasks, answers in submissions]
+
+
+def variant_event(subject, number, tasks, grade, positions=None, now=None):
+    """Событие журнала для проверенного варианта вместе с попытками."""
+    now = time.time() if now is None else now
+    attempts = []
+    for index, (task, correct) in enumerate(zip(tasks, grade["results"])):
+        position = positions[index] if positions is not None else None
+        attempts.append(attempt_event(subject, task, correct, now=now, position=position))
+    return {
+        "type": "variant",
+        "subject": subject,
+        "number": number,
+        "primary": grade["primary"],
+        "max_primary": grade["max_primary"],
+        "score": grade["score"],
+        "attempts": attempts
+    }
@@ -0,0 +1,81 @@
+"""История попыток и накопительные сводки по ней."""
+import hashlib
+import json
+import os
+import time
+
+
+def task_id(task):
+    """Короткий идентификатор задания по тексту вопроса."""
+    return hashlib.blake2b(str(task.get('question', '')).encode('utf-8'), digest_size=8).hexdigest()
+
+
+def attempt_event(subject, task, correct, now=None, position=None, seconds=None):
+    """Событие журнала для попытки решить задание.
+
+    seconds — сколько времени ушло на решение, если оно измерено.
+    """
+    now = time.time() if now is None else now
+    event = {
+        "type": "attempt",
+        "subject": subject,
+        "task": task_id(task),
+        "topic": task.get('topic') or 'Общая тема',
+        "difficulty": task.get('difficulty') or 'medium',
+        "time": round(now, 3),
+        "day": time.strftime("%Y-%m-%d", time.localtime(now)),
+        "correct": bool(correct)
+    }
+    if position is not None:
+        event["position"] = position
+    if seconds is not None:
+        event["seconds"] = round(seconds, 2)
+    return event
+
+
+def count_attempt(counters, key, correct):
+    """Увеличивает счетчики попыток и правильных ответов для ключа."""
+    counter = counters.get(key)
+    if counter is None:
+        counter = counters[key] = {"attempts": 0, "correct": 0}
+    counter['attempts'] += 1
+    if correct:
+        counter['correct'] += 1
+
+
+def repair_tail(path):
+    """Обрезает недописанную последнюю строку, оставшуюся после сбоя."""
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb+') as f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        # Ищем конец последней целой строки с конца файла
+        position = size
+        while position > 0:
+            step = min(4096, position)
+            position -= step
+            f.seek(position)
+            block = f.read(step)
+            newline = block.rfind(b"\n")
+            if newline != -1:
+                f.truncate(position + newline + 1)
+                return
+        f.truncate(0)
+
+
+def iter_history(path):
+    """Перебирает записанные попытки по порядку."""
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # Недописанная строка после сбоя
+                return
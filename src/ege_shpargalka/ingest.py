@@ -0,0 +1,231 @@
+"""Потоковый разбор CSV-файлов с заданиями.
+
+Кодировка и разделитель определяются один раз по началу файла, после
+чего весь файл декодируется за один проход. Если начало файла целиком
+в ASCII, по нему кодировку не узнать: она определяется заново по
+первому куску с другими байтами.
+"""
+import codecs
+import csv
+import io
+import time
+from itertools import chain
+
+from ege_shpargalka.matching import compile_answer
+from ege_shpargalka.metrics import DEBUG, log, metrics
+
+# Размер куска, читаемого из сети за один раз
+CHUNK_SIZE = 64 * 1024
+
+# Сколько заданий передается в интерфейс за один раз
+BATCH_SIZE = 500
+
+# Размер начала файла, по которому определяются кодировка и разделитель
+SAMPLE_SIZE = 16 * 1024
+
+# Разделитель определяется автоматически
+AUTO_DELIMITER = "auto"
+DELIMITERS = ",;\t|"
+
+ASCII_BYTES = bytes(range(0x80))
+
+
+def detect_encoding(sample):
+    """Определяет кодировку по началу файла.
+
+    BOM, затем проверка на корректный UTF-8, иначе однобайтовая
+    кириллица: в windows-1251 строчные буквы лежат в 0xE0–0xFF,
+    в KOI8-R — в 0xC0–0xDF, а строчных в тексте заданий больше.
+    Начальные ASCII-символы о кодировке ничего не говорят, поэтому
+    выборка берется с первого байта вне ASCII.
+    """
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    start = len(sample) - len(sample.lstrip(ASCII_BYTES))
+    sample = sample[start:start + SAMPLE_SIZE]
+    try:
+        # final=False: последний символ может быть разрезан границей куска
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+
+    upper = sum(sample.count(bytes([code])) for code in range(0xC0, 0xE0))
+    lower = len(sample) - len(sample.translate(None, bytes(range(0xE0, 0x100))))
+    return "koi8-r" if upper > lower else "windows-1251"
+
+
+def detect_delimiter(sample):
+    """Определяет разделитель по началу файла; по умолчанию запятая."""
+    # Последняя строка выборки может быть обрезана
+    cut = sample.rfind("\n")
+    if cut > 0:
+        sample = sample[:cut]
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=DELIMITERS).delimiter
+    except csv.Error:
+        pass
+
+    # Не получилось: берем самый частый символ в строке заголовков
+    header = sample.split("\n", 1)[0]
+    counts = {delimiter: header.count(delimiter) for delimiter in DELIMITERS}
+    best = max(counts, key=counts.get)
+    return best if counts[best] else ","
+
+
+def subject_from_url(url):
+    """Определяет предмет по имени файла."""
+    filename = url.split("/")[-1].lower()
+    if "mathematic" in filename or "math" in filename:
+        return "math"
+    elif "physics" in filename:
+        return "physics"
+    elif "informatic" in filename:
+        return "informatics"
+    elif "russian" in filename:
+        return "russian"
+    return "math"  # По умолчанию математика
+
+
+def row_to_task(row):
+    """Преобразует строку CSV в задание. Возвращает None для неполных строк."""
+    task = {
+        'question': row.get('question_text', row.get('Вопрос', '')),
+        'answer': row.get('correct_answer', row.get('Ответ', '')),
+        'topic': row.get('topic', row.get('Тема', 'Общая тема')),
+        'difficulty': row.get('difficulty', row.get('Сложность', 'medium')),
+        'explanation': row.get('explanation', row.get('Объяснение', ''))
+    }
+
+    # Номер задания ЕГЭ есть не во всех банках; без него поле не храним
+    number = row.get('task_number', row.get('Номер', ''))
+    if number:
+        task['number'] = number.strip()
+
+    # Проверяем, что есть хотя бы вопрос и ответ
+    if task['question'] and task['answer']:
+        return task
+    return None
+
+
+def subject_task(row, default_subject, compile_answers=True):
+    """Пара (предмет, задание) из строки CSV или None для неполной строки.
+
+    compile_answers=False — для разбора в другом процессе, кэш которого
+    интерфейсу не достанется.
+    """
+    task = row_to_task(row)
+    if task is None:
+        return None
+    # Ответ компилируется при загрузке, проверка потом — просто поиск
+    if compile_answers:
+        compile_answer(task['answer'])
+    subject = (row.get('subject') or '').lower().strip() or default_subject
+    return subject, task
+
+
+class CsvStream:
+    """Декодирует поток байтов по кускам и отдает строки CSV.
+
+    В памяти одновременно находится только текущий кусок и незавершенная
+    строка, поэтому размер файла на потребление памяти не влияет.
+    """
+
+    def __init__(self, chunks, delimiter=AUTO_DELIMITER):
+        self.chunks = chunks
+        # После разбора начала файла здесь лежит найденный разделитель
+        self.delimiter = delimiter
+        self.encoding = None
+        self.bytes_read = 0
+        self.rows_read = 0
+        # Время ожидания данных и декодирования (секунды)
+        self.download_time = 0.0
+        self.decode_time = 0.0
+
+    def lines(self):
+        """Возвращает декодированные строки вместе с переводами строк."""
+        decoder = None
+        # Все прочитанные куски — ASCII: кодировка еще не известна
+        ascii_only = False
+        tail = ""
+        chunks = iter(self.chunks)
+
+        while True:
+            started = time.perf_counter()
+            chunk = next(chunks, None)
+            received = time.perf_counter()
+            self.download_time += received - started
+            if chunk is None:
+                break
+            if not chunk:
+                continue
+            self.bytes_read += len(chunk)
+
+            if decoder is None or (ascii_only and not chunk.isascii()):
+                # До этого куска были только ASCII-символы: декодер можно
+                # заменить, не потеряв разрезанный символ
+                self.encoding = detect_encoding(chunk)
+                decoder = codecs.getincrementaldecoder(self.encoding)(errors="replace")
+                ascii_only = chunk.isascii()
+
+            tail += decoder.decode(chunk)
+            cut = tail.rfind("\n") + 1
+            ready, tail = tail[:cut], tail[cut:]
+            self.decode_time += time.perf_counter() - received
+            if ready:
+                yield from io.StringIO(ready)
+
+        if decoder is not None:
+            tail += decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+
+    def rows(self):
+        """Возвращает строки CSV в виде словарей."""
+        lines = self.lines()
+        # Начало файла читается заранее, чтобы по нему найти разделитель
+        head = []
+        size = 0
+        for line in lines:
+            head.append(line)
+            size += len(line)
+            if size >= SAMPLE_SIZE:
+                break
+        if self.delimiter == AUTO_DELIMITER:
+            self.delimiter = detect_delimiter("".join(head))
+        return csv.DictReader(chain(head, lines), delimiter=self.delimiter)
+
+    def task_batches(self, default_subject, batch_size=BATCH_SIZE, compile_answers=True):
+        """Возвращает пачки пар (предмет, задание) по мере разбора."""
+        started = time.perf_counter()
+        # Время, пока пачка обрабатывалась вызывающим кодом, не считаем
+        paused = 0.0
+        rows = 0
+        batch = []
+        for row in self.rows():
+            rows += 1
+            pair = subject_task(row, default_subject, compile_answers)
+            if pair is None:
+                metrics.count("ingest.skipped_rows")
+                log(DEBUG, f"Пропущена неполная строка {rows}", key="ingest.skipped")
+                continue
+
+            batch.append(pair)
+            if len(batch) >= batch_size:
+                yielded = time.perf_counter()
+                yield batch
+                paused += time.perf_counter() - yielded
+                batch = []
+
+        if batch:
+            yielded = time.perf_counter()
+            yield batch
+            paused += time.perf_counter() - yielded
+
+        total = time.perf_counter() - started - paused
+        metrics.record("ingest.download", self.download_time)
+        metrics.record("ingest.decode", self.decode_time)
+        metrics.record("ingest.parse", max(0.0, total - self.download_time - self.decode_time))
+        self.rows_read = rows
+        metrics.count("ingest.rows", rows)
+        metrics.count("ingest.bytes", self.bytes_read)
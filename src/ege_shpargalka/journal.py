@@ -0,0 +1,252 @@
+"""Журнал статистики: запись попыток без перезаписи всего файла.
+
+Каждое событие (попытка, завершенный вариант, сброс) дописывается
+строкой JSON в журнал фоновым потоком. Время от времени журнал
+сворачивается в снимок stats.json, который подменяется атомарно.
+При загрузке статистика собирается из снимка и хвоста журнала.
+
+Копия статистики одна: события применяются к ней при постановке в
+очередь, а поток записи сериализует ее для снимка под той же
+блокировкой и пишет на диск уже без нее.
+
+Попытки, кроме того, навсегда сохраняются в файле истории, а сводки по
+предметам, темам, сложности и дням (и кольца времени решения)
+обновляются при каждом событии.
+"""
+import json
+import os
+import queue
+import threading
+
+from ege_shpargalka.history import count_attempt, repair_tail
+from ege_shpargalka.metrics import ERROR, log
+from ege_shpargalka.pacing import record_solve_time
+from ege_shpargalka.scheduler import apply_attempt
+
+# После скольких событий журнал сворачивается в снимок
+COMPACT_EVERY = 500
+
+
+def default_stats():
+    """Пустая статистика."""
+    return {
+        "total_attempts": 0,
+        "correct_answers": 0,
+        "subjects": {
+            "math": {"attempts": 0, "correct": 0},
+            "physics": {"attempts": 0, "correct": 0},
+            "informatics": {"attempts": 0, "correct": 0},
+            "russian": {"attempts": 0, "correct": 0}
+        },
+        "topics": {},
+        "difficulties": {},
+        "days": {},
+        "schedule": {},
+        "solve_times": {},
+        "variants_completed": 0,
+        "best_score": 0
+    }
+
+
+def apply_event(stats, event):
+    """Применяет событие журнала к статистике."""
+    kind = event["type"]
+    if kind == "attempt":
+        subject = event.get("subject")
+        correct = event.get("correct")
+        stats['total_attempts'] += 1
+        if correct:
+            stats['correct_answers'] += 1
+
+        # Сводки обновляются за O(1) на попытку, история не пересчитывается
+        count_attempt(stats['subjects'], subject, correct)
+        if "topic" in event:
+            count_attempt(stats['topics'].setdefault(subject, {}), event["topic"], correct)
+        if "difficulty" in event:
+            count_attempt(stats['difficulties'], event["difficulty"], correct)
+        if "day" in event:
+            count_attempt(stats['days'], event["day"], correct)
+
+        # Карточка интервального повторения
+        apply_attempt(stats['schedule'], event)
+
+        # Время решения в кольце темы
+        if "seconds" in event:
+            record_solve_time(stats['solve_times'], event)
+    elif kind == "variant":
+        stats['variants_completed'] += 1
+        stats['best_score'] = max(stats['best_score'], event.get("score", 0))
+        # Попытки проверенного варианта пишутся в журнал одной строкой
+        for attempt in event.get("attempts", ()):
+            apply_event(stats, attempt)
+    elif kind == "reset":
+        stats.clear()
+        stats.update(default_stats())
+
+
+class StatsJournal:
+    """Журнал событий статистики с фоновой записью и сворачиванием."""
+
+    def __init__(self, snapshot_path="stats.json", journal_path="stats_journal.jsonl",
+                 history_path="attempts.jsonl", compact_every=COMPACT_EVERY):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.history_path = history_path
+        self.compact_every = compact_every
+        self.queue = queue.Queue()
+        self.thread = None
+        self.seq = 0
+        self.journal_events = 0
+        self.stats = default_stats()
+        # Защищает stats и seq от сериализации снимка посреди события
+        self.lock = threading.Lock()
+
+    def load(self, start_writer=True):
+        """Собирает статистику из снимка и журнала и запускает запись.
+
+        start_writer=False — только чтение, например из командной строки.
+        """
+        stats = default_stats()
+        seq = 0
+
+        try:
+            if os.path.exists(self.snapshot_path):
+                with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                    loaded = json.load(f)
+                    seq = loaded.get("journal_seq", 0)
+                    # Объединяем с дефолтными на случай отсутствия ключей
+                    for key in stats:
+                        if key in loaded:
+                            if isinstance(stats[key], dict) and isinstance(loaded[key], dict):
+                                stats[key].update(loaded[key])
+                            else:
+                                stats[key] = loaded[key]
+        except Exception as e:
+            log(ERROR, f"Ошибка загрузки статистики: {e}")
+
+        self.journal_events = 0
+        if os.path.exists(self.journal_path):
+            valid_length = 0
+            with open(self.journal_path, 'rb') as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        # Недописанная строка после сбоя
+                        break
+                    valid_length += len(line)
+                    self.journal_events += 1
+                    # События до снимка уже в нем учтены
+                    if event["seq"] <= seq:
+                        continue
+                    apply_event(stats, event)
+                    seq = event["seq"]
+
+            # Обрезаем испорченный хвост, чтобы новые события шли за целыми строками
+            if start_writer and valid_length < os.path.getsize(self.journal_path):
+                os.truncate(self.journal_path, valid_length)
+
+        if start_writer:
+            repair_tail(self.history_path)
+
+        with self.lock:
+            self.seq = seq
+            self.stats = stats
+        if start_writer and self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="stats-journal", daemon=True)
+            self.thread.start()
+        return stats
+
+    def append(self, event):
+        """Применяет событие к статистике и ставит его в очередь на запись.
+
+        Не обращается к диску.
+        """
+        with self.lock:
+            apply_event(self.stats, event)
+            self.seq += 1
+            event = {**event, "seq": self.seq}
+        self.queue.put(event)
+
+    def flush(self):
+        """Ждет, пока все события будут записаны."""
+        if self.thread is not None:
+            self.queue.join()
+
+    def close(self):
+        """Записывает оставшиеся события, сворачивает журнал и останавливает поток."""
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        """Цикл фонового потока: пишет события пачками."""
+        while True:
+            batch = [self.queue.get()]
+            # Забираем все, что накопилось, чтобы записать одной операцией
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            events = [event for event in batch if event is not None]
+            stop = len(events) != len(batch)
+            try:
+                if events:
+                    self.write(events)
+                if stop or self.journal_events >= self.compact_every:
+                    self.compact()
+            except Exception as e:
+                log(ERROR, f"Ошибка сохранения статистики: {e}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+            if stop:
+                return
+
+    def write(self, events):
+        """Дописывает события в журнал, а попытки — в историю."""
+        history = []
+        with open(self.journal_path, 'a', encoding='utf-8') as f:
+            for event in events:
+                f.write(json.dumps(event, ensure_ascii=False) + "\n")
+                if event["type"] == "attempt":
+                    history.append(event)
+                elif event["type"] == "variant":
+                    history.extend(event.get("attempts", ()))
+                elif event["type"] == "reset":
+                    history.clear()
+                    # Сброс статистики очищает и историю попыток
+                    with open(self.history_path, 'w', encoding='utf-8'):
+                        pass
+        self.journal_events += len(events)
+
+        if history:
+            with open(self.history_path, 'a', encoding='utf-8') as f:
+                for event in history:
+                    record = {key: value for key, value in event.items() if key not in ("type", "seq")}
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def compact(self):
+        """Сворачивает журнал в снимок статистики."""
+        if self.journal_events == 0 and os.path.exists(self.snapshot_path):
+            return
+
+        # Снимок включает и события, еще ждущие в очереди: при загрузке
+        # они отбрасываются по seq
+        with self.lock:
+            data = json.dumps({**self.stats, "journal_seq": self.seq}, ensure_ascii=False, separators=(',', ':'))
+
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+        # Если сбой случится здесь, события журнала уже учтены в снимке по seq
+        with open(self.journal_path, 'w', encoding='utf-8'):
+            pass
+        self.journal_events = 0
@@ -0,0 +1,151 @@
+"""Проверка ответов.
+
+Правильный ответ задания один раз компилируется в набор канонических
+ключей, после чего проверка ответа ученика — это поиск его ключа в
+множестве. Поддерживаются:
+
+* несколько допустимых ответов через «|»;
+* неупорядоченные наборы («2; 3» совпадает с «3, 2»);
+* числа с десятичной запятой, точкой и дроби («0,5», «0.5», «1/2»),
+  равные с допуском REL_TOLERANCE / ABS_TOLERANCE;
+* регистр и буквы ё/е в текстовых ответах;
+* число с единицами измерения («300000 км/с») принимается и без них.
+"""
+import math
+import re
+from functools import lru_cache
+
+# Знаков после запятой в ключе числа: точные совпадения находятся
+# поиском в множестве, остальные числа сравниваются с допуском
+PRECISION = 9
+
+# Допуск сравнения чисел: относительный и абсолютный (math.isclose)
+REL_TOLERANCE = 1e-6
+ABS_TOLERANCE = 1e-9
+
+NUMBER = re.compile(r"^[+-]?(?:\d+(?:[.,]\d+)?|[.,]\d+)(?:e[+-]?\d+)?$")
+FRACTION = re.compile(r"^([+-]?\d+)/(\d+)$")
+NUMBER_WITH_UNIT = re.compile(r"^([+-]?\d+(?:[.,]\d+)?)\s*[^\d\s.,;/].*$")
+SPACES = re.compile(r"\s+")
+
+
+def normalize(text):
+    """Приводит ответ к каноническому виду: регистр, ё/е, пробелы."""
+    text = str(text).casefold().replace("ё", "е").replace("−", "-").strip().rstrip(".")
+    return SPACES.sub("", text)
+
+
+def parse_number(text):
+    """Возвращает число из нормализованного текста или None."""
+    if NUMBER.match(text):
+        return float(text.replace(",", "."))
+    match = FRACTION.match(text)
+    if match and int(match.group(2)) != 0:
+        return int(match.group(1)) / int(match.group(2))
+    return None
+
+
+def atom_key(text):
+    """Канонический ключ одиночного ответа."""
+    text = normalize(text)
+    number = parse_number(text)
+    if number is not None:
+        # + 0.0 превращает -0.0 в 0.0
+        return ("n", round(number, PRECISION) + 0.0)
+    return ("t", text)
+
+
+def split_strict(text):
+    """Элементы набора в правильном ответе: «;» или запятая с пробелом."""
+    if ";" in text:
+        return text.split(";")
+    return re.split(r",\s+", text)
+
+
+def split_lenient(text):
+    """Элементы набора в ответе ученика: «;», запятая или пробел."""
+    if ";" in text:
+        return text.split(";")
+    return re.split(r"[,\s]+", text)
+
+
+def set_key(items):
+    """Ключ неупорядоченного набора или None, если элемент всего один."""
+    items = [item for item in items if item.strip()]
+    if len(items) < 2:
+        return None
+    return frozenset(atom_key(item) for item in items)
+
+
+def keys_close(key, other):
+    """Совпадают ли ключи; числа сравниваются с допуском."""
+    if key[0] == "n" and other[0] == "n":
+        return math.isclose(key[1], other[1], rel_tol=REL_TOLERANCE, abs_tol=ABS_TOLERANCE)
+    return key == other
+
+
+def sets_close(items, expected):
+    """Совпадают ли наборы ключей; числа в них сравниваются с допуском."""
+    if len(items) != len(expected):
+        return False
+    remaining = list(expected)
+    for item in items:
+        for i, other in enumerate(remaining):
+            if keys_close(item, other):
+                del remaining[i]
+                break
+        else:
+            return False
+    return True
+
+
+class AnswerMatcher:
+    """Скомпилированный правильный ответ."""
+
+    __slots__ = ("keys", "has_sets", "numbers", "sets")
+
+    def __init__(self, answer):
+        self.keys = set()
+        self.has_sets = False
+        for alternative in str(answer).split("|"):
+            items = set_key(split_strict(alternative.strip()))
+            if items is not None:
+                self.keys.add(items)
+                self.has_sets = True
+                continue
+
+            self.keys.add(atom_key(alternative))
+            # Число с единицами измерения засчитывается и без них
+            match = NUMBER_WITH_UNIT.match(alternative.strip())
+            if match:
+                self.keys.add(atom_key(match.group(1)))
+
+        # Для сравнения с допуском, если точного совпадения нет
+        self.numbers = [key for key in self.keys if isinstance(key, tuple) and key[0] == "n"]
+        self.sets = [key for key in self.keys
+                     if isinstance(key, frozenset) and any(item[0] == "n" for item in key)]
+
+    def check(self, user_answer):
+        """Проверяет ответ ученика."""
+        key = atom_key(user_answer)
+        if key in self.keys:
+            return True
+        if key[0] == "n" and any(keys_close(key, number) for number in self.numbers):
+            return True
+        if self.has_sets:
+            items = set_key(split_lenient(user_answer.strip()))
+            if items is None:
+                return False
+            return items in self.keys or any(sets_close(items, expected) for expected in self.sets)
+        return False
+
+
+@lru_cache(maxsize=1 << 17)
+def compile_answer(answer):
+    """Компилирует ответ; одинаковые ответы компилируются один раз."""
+    return AnswerMatcher(answer)
+
+
+def grade_answers(pairs):
+    """Проверяет пары (правильный ответ, ответ ученика) одним проходом."""
+    return [compile_answer(str(answer)).check(str(user)) for answer, user in pairs]
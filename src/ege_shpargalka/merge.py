@@ -0,0 +1,134 @@
+"""Объединение банков заданий из нескольких источников.
+
+Новый источник дописывается в конец списков предметов, поэтому задания
+одного источника в каждом предмете идут подряд: происхождение хранится
+как отрезок (начало, число) на предмет и помещается в метаданные кэша.
+Повторы отсеиваются по хешу нормализованного вопроса (регистр, пробелы,
+ё/е), так что добавление источника стоит времени, пропорционального
+самому источнику, а не всему банку. Хеши сохраняются вместе с кэшем,
+поэтому после перезапуска банк заново не читается.
+
+Списки предметов собираются из отрезков прежних списков (SplicedTasks):
+задания из кэша не копируются в память, а при сохранении в файл кэша или
+базу дописываются только новые задания.
+"""
+import hashlib
+
+from ege_shpargalka.cache import SplicedTasks
+from ege_shpargalka.search import normalize
+
+# Ключ кэша, под которым хранится объединенный банк
+MERGED_SOURCE = "merged"
+
+
+def content_hash(subject, task):
+    """Хеш вопроса после нормализации; одинаков у почти совпадающих вопросов."""
+    text = f"{subject}\0{normalize(str(task.get('question', '')))}"
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class MergedBank:
+    """Банк заданий с учетом того, из какого источника пришло каждое задание."""
+
+    def __init__(self, tasks_data=None, sources=None, hashes=None):
+        self.tasks_data = dict(tasks_data or {})
+        # {источник: {"subjects": {предмет: [начало, число]}, "duplicates": n}}
+        self.sources = sources or {}
+        # Сохраненные с кэшем хеши; None — посчитать при первом объединении
+        self.hashes = set(hashes) if hashes is not None else None
+
+    @classmethod
+    def from_entry(cls, entry):
+        """Банк из записи кэша; обычный кэш считается одним источником."""
+        if entry.get("url") == MERGED_SOURCE:
+            return cls(entry["tasks"], entry["files"], entry.get("hashes"))
+        subjects = {subject: [0, len(tasks)] for subject, tasks in entry["tasks"].items() if tasks}
+        return cls(entry["tasks"], {entry["url"]: {"subjects": subjects, "duplicates": 0}})
+
+    def ensure_hashes(self):
+        """Хеши вопросов банка; считаются один раз при первом объединении."""
+        if self.hashes is None:
+            self.hashes = {
+                content_hash(subject, task)
+                for subject, tasks in self.tasks_data.items()
+                for task in tasks
+            }
+        return self.hashes
+
+    def writable(self, subject):
+        """Список заданий предмета, в который можно дописывать."""
+        tasks = self.tasks_data.get(subject)
+        if not isinstance(tasks, SplicedTasks):
+            # Задания из кэша или базы остаются на месте, новые идут в хвост
+            tasks = self.tasks_data[subject] = SplicedTasks([(tasks or (), 0, None)])
+        return tasks
+
+    def saved(self, entry):
+        """Переходит на задания сохраненной записи кэша или базы.
+
+        Хвосты в памяти заменяются записями файла, поэтому следующее
+        сохранение допишет только то, что добавлено после этого.
+        """
+        self.tasks_data = dict(entry["tasks"])
+
+    def add_source(self, source, pairs):
+        """Добавляет задания источника, пропуская повторы.
+
+        pairs — пары (предмет, задание). Если источник уже был добавлен,
+        его прежние задания заменяются. Возвращает тройки (предмет, номер
+        в банке предмета, задание) для добавления в индексы.
+        """
+        if source in self.sources:
+            self.remove_source(source)
+        hashes = self.ensure_hashes()
+
+        spans = {}
+        duplicates = 0
+        added = []
+        for subject, task in pairs:
+            key = content_hash(subject, task)
+            if key in hashes:
+                duplicates += 1
+                continue
+            hashes.add(key)
+            tasks = self.writable(subject)
+            spans.setdefault(subject, [len(tasks), 0])[1] += 1
+            added.append((subject, len(tasks), task))
+            tasks.append(task)
+
+        self.sources[source] = {"subjects": spans, "duplicates": duplicates}
+        return added
+
+    def remove_source(self, source):
+        """Удаляет задания источника; номера заданий после них сдвигаются.
+
+        Повторы, отброшенные у других источников из-за этого, не
+        восстанавливаются — для этого источник нужно обновить.
+        """
+        info = self.sources.pop(source)
+        for subject, (start, count) in info["subjects"].items():
+            tasks = self.tasks_data[subject]
+            end = start + count
+            if self.hashes is not None:
+                for position in range(start, end):
+                    self.hashes.discard(content_hash(subject, tasks[position]))
+
+            # Отрезки до и после источника без копирования заданий
+            remaining = SplicedTasks([(tasks, 0, start), (tasks, end, None)])
+            if remaining:
+                self.tasks_data[subject] = remaining
+            else:
+                del self.tasks_data[subject]
+
+            for other in self.sources.values():
+                span = other["subjects"].get(subject)
+                if span and span[0] >= end:
+                    span[0] -= count
+        return info
+
+    def source_counts(self):
+        """Число заданий каждого источника."""
+        return {
+            source: sum(count for _, count in info["subjects"].values())
+            for source, info in self.sources.items()
+        }
@@ -0,0 +1,199 @@
+"""Счетчики, замеры времени и журнал сообщений для диагностики.
+
+Замеры копятся в памяти процесса и почти ничего не стоят: на каждый
+замер — два вызова perf_counter и обновление словаря. Снимок метрик
+показывается в скрытом разделе настроек и сохраняется в JSON, чтобы
+разбираться с медленной работой на устройствах пользователей.
+"""
+import functools
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Уровни сообщений
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+
+# Сообщения ниже этого уровня не выводятся
+LOG_LEVEL = INFO
+
+# Не больше LOG_BURST сообщений с одним ключом за LOG_INTERVAL секунд
+LOG_BURST = 5
+LOG_INTERVAL = 10.0
+
+# Сколько заданий просматривается при оценке занимаемой памяти
+MEMORY_SAMPLE = 1000
+
+
+class Metrics:
+    """Счетчики и замеры времени по именам."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timers = {}
+        self.counters = {}
+        self.gauges = {}
+
+    def record(self, name, seconds):
+        """Добавляет замер длительности."""
+        with self.lock:
+            timer = self.timers.get(name)
+            if timer is None:
+                timer = self.timers[name] = {"count": 0, "total": 0.0, "max": 0.0, "last": 0.0}
+            timer["count"] += 1
+            timer["total"] += seconds
+            timer["last"] = seconds
+            if seconds > timer["max"]:
+                timer["max"] = seconds
+
+    @contextmanager
+    def timer(self, name):
+        """Замеряет время выполнения блока."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def gauge(self, name, value):
+        """Запоминает текущее значение величины."""
+        with self.lock:
+            self.gauges[name] = value
+
+    def snapshot(self):
+        """Все метрики одним словарем; время — в миллисекундах."""
+        with self.lock:
+            timers = {
+                name: {
+                    "count": timer["count"],
+                    "total_ms": round(timer["total"] * 1000, 3),
+                    "avg_ms": round(timer["total"] / timer["count"] * 1000, 3),
+                    "max_ms": round(timer["max"] * 1000, 3),
+                    "last_ms": round(timer["last"] * 1000, 3)
+                }
+                for name, timer in sorted(self.timers.items())
+            }
+            return {
+                "timers": timers,
+                "counters": dict(sorted(self.counters.items())),
+                "gauges": dict(sorted(self.gauges.items())),
+                "log_suppressed": dict(log_limiter.suppressed)
+            }
+
+    def export(self):
+        """Накопленные значения как есть — для передачи из другого процесса."""
+        with self.lock:
+            return {
+                "timers": {name: dict(timer) for name, timer in self.timers.items()},
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges)
+            }
+
+    def merge(self, exported):
+        """Добавляет метрики, накопленные в другом процессе (см. export)."""
+        with self.lock:
+            for name, other in exported["timers"].items():
+                timer = self.timers.get(name)
+                if timer is None:
+                    timer = self.timers[name] = {"count": 0, "total": 0.0, "max": 0.0, "last": 0.0}
+                timer["count"] += other["count"]
+                timer["total"] += other["total"]
+                timer["last"] = other["last"]
+                timer["max"] = max(timer["max"], other["max"])
+            for name, value in exported["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            self.gauges.update(exported["gauges"])
+
+    def dump(self, path):
+        """Сохраняет снимок метрик в JSON."""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, indent=2, ensure_ascii=False)
+
+    def reset(self):
+        with self.lock:
+            self.timers.clear()
+            self.counters.clear()
+            self.gauges.clear()
+
+
+class LogLimiter:
+    """Ограничивает частоту одинаковых сообщений."""
+
+    def __init__(self, burst=LOG_BURST, interval=LOG_INTERVAL, clock=time.monotonic):
+        self.burst = burst
+        self.interval = interval
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.windows = {}
+        self.suppressed = {}
+
+    def allow(self, key):
+        """Можно ли вывести сообщение с этим ключом сейчас."""
+        now = self.clock()
+        with self.lock:
+            started, sent = self.windows.get(key, (now, 0))
+            if now - started >= self.interval:
+                started, sent = now, 0
+            if sent >= self.burst:
+                self.suppressed[key] = self.suppressed.get(key, 0) + 1
+                return False
+            self.windows[key] = (started, sent + 1)
+            return True
+
+
+metrics = Metrics()
+log_limiter = LogLimiter()
+
+
+def timed(name):
+    """Декоратор: замеряет каждый вызов функции."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with metrics.timer(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def log(level, message, key=None):
+    """Выводит сообщение, если позволяют уровень и частота.
+
+    key объединяет однотипные сообщения (например, ошибки разбора строк),
+    по умолчанию ключом служит сам текст.
+    """
+    if level < LOG_LEVEL:
+        return
+    if not log_limiter.allow(key or message):
+        return
+    stream = sys.stderr if level >= WARNING else sys.stdout
+    print(f"[{LEVEL_NAMES.get(level, level)}] {message}", file=stream)
+
+
+def task_memory(tasks):
+    """Оценка памяти, занимаемой списком заданий, в байтах.
+
+    Для больших списков размер считается по выборке заданий. Остальные
+    последовательности оценивают себя сами (TaskColumns), а у заданий из
+    файлового кэша и базы, которые в памяти не лежат, учитывается только
+    сам объект.
+    """
+    if not isinstance(tasks, list):
+        return sys.getsizeof(tasks)
+    total = sys.getsizeof(tasks)
+    if not tasks:
+        return total
+    step = max(1, len(tasks) // MEMORY_SAMPLE)
+    sample = tasks[::step]
+    sample_size = 0
+    for task in sample:
+        sample_size += sys.getsizeof(task)
+        for value in task.values():
+            sample_size += sys.getsizeof(value)
+    return total + sample_size * len(tasks) // len(sample)
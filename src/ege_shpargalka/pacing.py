@@ -0,0 +1,185 @@
+"""Время решения заданий и его перцентили.
+
+Время от показа задания до проверки ответа (по time.perf_counter)
+записывается в событие попытки. Для каждой пары (предмет, тема)
+хранится кольцо последних RING_SIZE записей фиксированной ширины:
+секунды (float32) и код сложности (uint8). Новые записи затирают
+старые, поэтому память не растет, сколько бы ни занимался ученик. В
+статистике кольцо лежит строкой base64 и восстанавливается журналом
+вместе с остальными сводками.
+
+SolveTimes держит те же кольца и гистограммы времени по предметам,
+темам и сложностям в логарифмической шкале. Запись в кольцо добавляет
+время в гистограммы, а затертая запись из них вычитается, поэтому
+p50/p90/p99 за последние попытки считаются по гистограмме без
+сортировки.
+"""
+import base64
+import math
+import struct
+from array import array
+
+from ege_shpargalka.core import DIFFICULTY_NAMES, SUBJECT_NAMES
+
+# Сколько последних попыток по теме учитывается
+RING_SIZE = 256
+
+# Запись кольца: секунды и код сложности
+RECORD = struct.Struct("<fB")
+
+# Коды сложности в записях; неизвестная сложность считается средней
+DIFFICULTY_CODES = {"easy": 0, "medium": 1, "hard": 2}
+DIFFICULTIES = list(DIFFICULTY_CODES)
+
+# Дольше IDLE_LIMIT секунд задание не решают: ученик отошел, время не учитывается
+IDLE_LIMIT = 30 * 60
+
+# Гистограмма: BINS корзин от MIN_SECONDS до IDLE_LIMIT в логарифмической шкале
+MIN_SECONDS = 1.0
+BINS = 64
+BIN_RATIO = (IDLE_LIMIT / MIN_SECONDS) ** (1 / BINS)
+
+PERCENTILES = (50, 90, 99)
+
+# Сколько самых долгих тем показывать
+SLOW_TOPICS_SHOWN = 5
+
+
+def ring_put(records, position, seconds, difficulty):
+    """Кладет запись в кольцо (bytearray) на место position.
+
+    Возвращает следующее место и затертую запись (секунды, код
+    сложности) или None, если кольцо еще не заполнено.
+    """
+    record = RECORD.pack(seconds, DIFFICULTY_CODES.get(difficulty, 1))
+    if len(records) < RING_SIZE * RECORD.size:
+        records += record
+        old = None
+    else:
+        start = position * RECORD.size
+        old = RECORD.unpack_from(records, start)
+        records[start:start + RECORD.size] = record
+    return (position + 1) % RING_SIZE, old
+
+
+def record_solve_time(solve_times, event):
+    """Учитывает время попытки в сводке статистики."""
+    topics = solve_times.setdefault(event["subject"], {})
+    topic = event.get("topic") or 'Общая тема'
+    ring = topics.get(topic) or {"next": 0, "records": ""}
+    records = bytearray(base64.b64decode(ring["records"]))
+    position, _ = ring_put(records, ring["next"], event["seconds"], event.get("difficulty"))
+    topics[topic] = {"next": position, "records": base64.b64encode(records).decode('ascii')}
+
+
+def time_bin(seconds):
+    if seconds <= MIN_SECONDS:
+        return 0
+    return min(BINS - 1, int(math.log(seconds / MIN_SECONDS) / math.log(BIN_RATIO)))
+
+
+def format_seconds(seconds):
+    """Время для интерфейса: «45 с», «3 мин 05 с»."""
+    seconds = round(seconds)
+    if seconds < 60:
+        return f"{seconds} с"
+    return f"{seconds // 60} мин {seconds % 60:02d} с"
+
+
+class SolveTimes:
+    """Кольца времени решения и скользящие гистограммы по ним."""
+
+    def __init__(self):
+        # (предмет, тема) -> [записи (bytearray), следующее место]
+        self.rings = {}
+        # ("subject", предмет), ("topic", предмет, тема), ("difficulty", сложность) -> счетчики корзин
+        self.histograms = {}
+
+    @classmethod
+    def from_stats(cls, solve_times):
+        """Кольца из сводки статистики (stats['solve_times'])."""
+        result = cls()
+        for subject, topics in solve_times.items():
+            for topic, ring in topics.items():
+                records = base64.b64decode(ring["records"])
+                count = len(records) // RECORD.size
+                # Полное кольцо читается с самой старой записи
+                start = ring["next"] if count == RING_SIZE else 0
+                for index in range(count):
+                    seconds, code = RECORD.unpack_from(records, (start + index) % count * RECORD.size)
+                    result.add(subject, topic, DIFFICULTIES[code], seconds)
+        return result
+
+    def add(self, subject, topic, difficulty, seconds):
+        topic = topic or 'Общая тема'
+        difficulty = difficulty if difficulty in DIFFICULTY_CODES else "medium"
+        ring = self.rings.get((subject, topic))
+        if ring is None:
+            ring = self.rings[(subject, topic)] = [bytearray(), 0]
+        ring[1], old = ring_put(ring[0], ring[1], seconds, difficulty)
+        if old is not None:
+            old_seconds, old_code = old
+            self.count(subject, topic, DIFFICULTIES[old_code], old_seconds, -1)
+        self.count(subject, topic, difficulty, seconds, 1)
+
+    def count(self, subject, topic, difficulty, seconds, step):
+        index = time_bin(seconds)
+        for key in (("subject", subject), ("topic", subject, topic), ("difficulty", difficulty)):
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = array('I', bytes(4 * BINS))
+            histogram[index] += step
+
+    def percentiles(self, key, percentiles=PERCENTILES):
+        """Оценки перцентилей по гистограмме: {p: секунды} или None, если попыток нет.
+
+        Оценка — середина корзины в логарифмической шкале, точность
+        около ±8 %.
+        """
+        histogram = self.histograms.get(key)
+        total = sum(histogram) if histogram else 0
+        if not total:
+            return None
+        result = {}
+        for percentile in percentiles:
+            rank = math.ceil(total * percentile / 100)
+            seen = 0
+            for index, count in enumerate(histogram):
+                seen += count
+                if seen >= rank:
+                    result[percentile] = MIN_SECONDS * BIN_RATIO ** (index + 0.5)
+                    break
+        return result
+
+    def report(self):
+        """Текст для вкладки статистики."""
+        lines = []
+
+        def add_line(name, key):
+            values = self.percentiles(key)
+            if values:
+                text = " / ".join(format_seconds(values[p]) for p in PERCENTILES)
+                lines.append(f"{name}: {text}")
+
+        for subject in sorted({key[1] for key in self.histograms if key[0] == "subject"}):
+            add_line(SUBJECT_NAMES.get(subject, subject), ("subject", subject))
+        for difficulty in DIFFICULTIES:
+            add_line(DIFFICULTY_NAMES[difficulty], ("difficulty", difficulty))
+        if not lines:
+            return ""
+
+        # Темы, на которые уходит больше всего времени (по p90)
+        topics = []
+        for key in self.histograms:
+            if key[0] == "topic":
+                values = self.percentiles(key)
+                if values:
+                    topics.append((values[90], key))
+        topics.sort(reverse=True)
+        if topics:
+            lines.append("Дольше всего (p90):")
+            for _, key in topics[:SLOW_TOPICS_SHOWN]:
+                add_line(f"{SUBJECT_NAMES.get(key[1], key[1])}, {key[2]}", key)
+
+        percentiles = " / ".join(f"p{p}" for p in PERCENTILES)
+        return f"Время решения ({percentiles}):\n" + "\n".join(lines)
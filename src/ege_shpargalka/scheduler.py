@@ -0,0 +1,140 @@
+"""Интервальное повторение заданий (упрощенный SM-2).
+
+Для каждого решавшегося задания хранится карточка
+[идентификатор задания, повторений подряд, интервал в днях, легкость, срок].
+Карточки лежат в статистике и обновляются событиями журнала, поэтому
+сохраняются и восстанавливаются вместе с ней. Для выбора следующего
+задания по каждому предмету держится куча по сроку повторения.
+"""
+import heapq
+import time
+
+from ege_shpargalka.history import task_id
+
+DAY = 24 * 60 * 60
+
+# Через сколько секунд повторить задание после ошибки
+RETRY_DELAY = 10 * 60
+
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+
+
+def review(card, correct, now):
+    """Возвращает карточку после ответа (SM-2 с оценкой верно/неверно)."""
+    key, reps, interval, ease, due = card
+    if correct:
+        reps += 1
+        if reps == 1:
+            interval = 1
+        elif reps == 2:
+            interval = 6
+        else:
+            interval = round(interval * ease)
+        ease = ease + 0.1
+        due = now + interval * DAY
+    else:
+        reps = 0
+        interval = 0
+        ease = max(MIN_EASE, ease - 0.2)
+        due = now + RETRY_DELAY
+    return [key, reps, interval, round(ease, 2), round(due)]
+
+
+def apply_attempt(schedule, event):
+    """Обновляет карточку задания по событию попытки."""
+    if "position" not in event:
+        return
+    cards = schedule.setdefault(event["subject"], {})
+    position = str(event["position"])
+    card = cards.get(position)
+    if card is None or card[0] != event.get("task"):
+        card = [event.get("task"), 0, 0, INITIAL_EASE, 0]
+    cards[position] = review(card, event.get("correct"), event.get("time", time.time()))
+
+
+class Scheduler:
+    """Выбирает следующее задание: сначала просроченные повторения, затем новые."""
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.heaps = {}
+        self.next_new = {}
+
+    def cards(self, subject):
+        return self.stats.setdefault('schedule', {}).setdefault(subject, {})
+
+    def heap(self, subject):
+        """Куча (срок, номер задания) для предмета; строится один раз."""
+        cards = self.cards(subject)
+        owner, heap = self.heaps.get(subject, (None, None))
+        if owner is not cards:
+            # Статистику сбросили или загрузили заново
+            heap = [(card[4], int(position)) for position, card in cards.items()]
+            heapq.heapify(heap)
+            self.heaps[subject] = (cards, heap)
+            self.next_new[subject] = 0
+        return heap
+
+    def push(self, subject, position):
+        """Добавляет в кучу новый срок задания после ответа."""
+        card = self.cards(subject).get(str(position))
+        if card is not None:
+            heapq.heappush(self.heap(subject), (card[4], position))
+
+    def next_task(self, subject, tasks, now=None, preferred=None):
+        """Номер следующего задания или None, если заданий нет.
+
+        preferred — номера заданий (например, из слабых тем), из которых
+        новое задание берется в первую очередь.
+
+        Повторение остается в куче, пока на него не ответят: ответ сдвигает
+        срок карточки, и прежняя запись кучи отбрасывается как устаревшая.
+        Пропущенное повторение поэтому выдается снова.
+        """
+        if not tasks:
+            return None
+        now = time.time() if now is None else now
+        heap = self.heap(subject)
+        cards = self.cards(subject)
+
+        # Просроченное повторение
+        while heap:
+            due, position = heap[0]
+            card = cards.get(str(position))
+            # Устаревшие записи (срок уже сдвинут или банк заменен) пропускаем
+            if card is None or card[4] != due or position >= len(tasks):
+                heapq.heappop(heap)
+                continue
+            if task_id(tasks[position]) != card[0]:
+                heapq.heappop(heap)
+                continue
+            if due <= now:
+                return position
+            break
+
+        # Новое задание из предпочтительных
+        for position in preferred or ():
+            if position < len(tasks) and str(position) not in cards:
+                return position
+
+        # Новое, еще не решавшееся задание
+        position = self.next_new.get(subject, 0)
+        while position < len(tasks) and str(position) in cards:
+            position += 1
+        if position < len(tasks):
+            self.next_new[subject] = position + 1
+            return position
+
+        # Новых заданий нет: ближайшее по сроку повторение
+        if heap:
+            return heap[0][1]
+
+        # Все записи кучи отброшены как устаревшие: строим ее заново
+        self.heaps.pop(subject, None)
+        heap = self.heap(subject)
+        while heap:
+            due, position = heapq.heappop(heap)
+            if position < len(tasks):
+                return position
+        return 0
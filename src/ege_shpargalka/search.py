@@ -0,0 +1,146 @@
+"""Поиск заданий по тексту с помощью триграммного индекса."""
+import re
+from array import array
+from collections import defaultdict
+
+# Сколько самых редких триграмм запроса учитывается в оценке
+MAX_QUERY_GRAMS = 16
+
+# Сколько триграмм запроса может не совпасть (опечатка портит до трех)
+MAX_MISSING = 4
+
+# Триграмма, которая встречается хотя бы в каждом DENSE_RATIO-м задании,
+# кроме списка получает битовую карту: по памяти карта не дороже списка
+DENSE_RATIO = 32
+
+SPACES = re.compile(r"\s+")
+
+
+def normalize(text):
+    """Приводит текст к виду для поиска: регистр, ё/е и пробелы."""
+    return SPACES.sub(" ", text.casefold().replace("ё", "е")).strip()
+
+
+def trigrams(text):
+    """Множество триграмм нормализованного текста."""
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def set_bits(bits, doc_ids):
+    """Ставит в битовой карте (bytearray) биты документов."""
+    for doc_id in doc_ids:
+        bits[doc_id >> 3] |= 1 << (doc_id & 7)
+
+
+class SearchIndex:
+    """Инвертированный индекс триграмм по вопросу, теме и объяснению.
+
+    Документы только добавляются, поэтому номера документов в каждом
+    списке идут по возрастанию. У частых триграмм кроме списка есть
+    битовая карта документов, которая дописывается вместе с ним.
+    """
+
+    def __init__(self):
+        self.postings = defaultdict(lambda: array('I'))
+        self.bitmaps = {}
+        self.docs = []
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, subject, position, task):
+        """Добавляет задание в индекс."""
+        doc_id = len(self.docs)
+        self.docs.append((subject, position))
+        text = normalize(" ".join((
+            str(task.get('question', '')),
+            str(task.get('topic', '')),
+            str(task.get('explanation', ''))
+        )))
+        byte, bit = doc_id >> 3, 1 << (doc_id & 7)
+        for gram in trigrams(text):
+            postings = self.postings[gram]
+            postings.append(doc_id)
+            bits = self.bitmaps.get(gram)
+            if bits is not None:
+                if len(bits) <= byte:
+                    if len(postings) * DENSE_RATIO * 2 < len(self.docs):
+                        # Триграмма стала редкой: карта занимает больше списка
+                        del self.bitmaps[gram]
+                        continue
+                    # Карта растет хотя бы вдвое, как и список
+                    bits.extend(bytes(max(len(bits), byte + 1 - len(bits))))
+                bits[byte] |= bit
+            elif len(postings) * DENSE_RATIO > len(self.docs):
+                bits = self.bitmaps[gram] = bytearray(byte + 1)
+                set_bits(bits, postings)
+
+    def query_grams(self, query):
+        """Триграммы запроса, по которым он оценивается.
+
+        Возвращает (триграммы от самой редкой, сколько из них должно
+        совпасть). Триграммы, встречающиеся в большинстве заданий,
+        различают хуже остальных и учитываются, только если других в
+        запросе нет. Из остальных берутся MAX_QUERY_GRAMS самых редких;
+        совпасть должна хотя бы половина, но не меньше всех, кроме
+        MAX_MISSING.
+        """
+        query = normalize(query)
+        if len(query) < 2:
+            return [], 0
+        grams = sorted((gram for gram in trigrams(query) if gram in self.postings),
+                       key=lambda gram: len(self.postings[gram]))
+        grams = [gram for gram in grams if len(self.postings[gram]) * 2 <= len(self.docs)] or grams
+        grams = grams[:MAX_QUERY_GRAMS]
+        return grams, max((len(grams) + 1) // 2, len(grams) - MAX_MISSING)
+
+    def bitmap(self, gram):
+        """Битовая карта документов триграммы как целое число."""
+        bits = self.bitmaps.get(gram)
+        if bits is None:
+            # Редкая триграмма: список короткий, карта строится на месте
+            bits = bytearray((len(self.docs) + 7) // 8)
+            set_bits(bits, self.postings[gram])
+        return int.from_bytes(bits, 'little')
+
+    def search(self, query, limit=20):
+        """Возвращает список (предмет, номер задания) по убыванию совпадения.
+
+        Оценка задания — число совпавших триграмм из query_grams; при
+        равной оценке выше задание, добавленное раньше. Оценки точные и
+        считаются для всех документов сразу: карты триграмм складываются
+        поразрядно в двоичный счетчик (counters[j] — j-й бит оценки
+        каждого документа). Одна операция над целым числом обрабатывает
+        весь банк, поэтому время запроса почти не зависит от того,
+        насколько частые в нем слова.
+        """
+        grams, required = self.query_grams(query)
+        if not grams:
+            return []
+        counters = []
+        for gram in grams:
+            carry = self.bitmap(gram)
+            for j, counter in enumerate(counters):
+                counters[j], carry = counter ^ carry, counter & carry
+                if not carry:
+                    break
+            if carry:
+                counters.append(carry)
+
+        # Документы с оценкой score, от лучшей; внутри — по возрастанию номера
+        everything = (1 << len(self.docs)) - 1
+        results = []
+        for score in range(len(grams), required - 1, -1):
+            if score >> len(counters):
+                continue
+            found = everything
+            for j, counter in enumerate(counters):
+                found &= counter if score >> j & 1 else everything ^ counter
+            while found and len(results) < limit:
+                lowest = found & -found
+                results.append(self.docs[lowest.bit_length() - 1])
+                found ^= lowest
+            if len(results) == limit:
+                break
+        return results
@@ -0,0 +1,294 @@
+"""Хранилище заданий на SQLite.
+
+Альтернатива файловому кэшу для больших банков: задания лежат в базе,
+а в памяти остаются только счетчики по предметам. Выборка задания и
+подсчет по теме или сложности выполняются по индексам.
+"""
+import json
+import sqlite3
+import threading
+from array import array
+from collections.abc import Sequence
+from itertools import islice
+
+from ege_shpargalka.cache import SplicedTasks, validators_from_headers
+
+# Сколько строк вставляется за один вызов executemany
+INSERT_BATCH = 1000
+
+FIELDS = ('question', 'answer', 'topic', 'difficulty', 'explanation', 'number')
+COLUMNS = ", ".join(FIELDS)
+
+# Сколько строк читается одним запросом при обходе заданий
+PAGE_SIZE = 1000
+
+# Версия схемы; при несовпадении таблицы пересоздаются
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    generation INTEGER NOT NULL,
+    subject TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    topic TEXT,
+    difficulty TEXT,
+    explanation TEXT,
+    number TEXT,
+    PRIMARY KEY (generation, subject, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS tasks_topic ON tasks (generation, subject, topic, position);
+CREATE INDEX IF NOT EXISTS tasks_difficulty ON tasks (generation, subject, difficulty, position);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def row_to_task(row):
+    """Задание из строки таблицы; пустой номер задания не возвращается."""
+    task = dict(zip(FIELDS, row))
+    if not task['number']:
+        del task['number']
+    return task
+
+
+class StoredTasks(Sequence):
+    """Список заданий предмета, читаемый из базы по номеру."""
+
+    def __init__(self, store, generation, subject, count):
+        self.store = store
+        self.generation = generation
+        self.subject = subject
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("task index out of range")
+        rows = self.store.execute(
+            f"SELECT {COLUMNS} FROM tasks WHERE generation = ? AND subject = ? AND position = ?",
+            (self.generation, self.subject, index)
+        )
+        return row_to_task(rows[0])
+
+    def __iter__(self):
+        # По страницам первичного ключа: между страницами база свободна для других потоков
+        position = -1
+        while True:
+            rows = self.store.execute(
+                f"SELECT position, {COLUMNS} FROM tasks WHERE generation = ? AND subject = ? "
+                "AND position > ? ORDER BY position LIMIT ?",
+                (self.generation, self.subject, position, PAGE_SIZE)
+            )
+            for row in rows:
+                yield row_to_task(row[1:])
+            if len(rows) < PAGE_SIZE:
+                return
+            position = rows[-1][0]
+
+    def filtered(self, topic=None, difficulty=None):
+        """Условие WHERE и параметры для заданий предмета с фильтром.
+
+        Строки, дописанные в поколение после загрузки списка, в него не входят.
+        """
+        query = "generation = ? AND subject = ? AND position < ?"
+        params = [self.generation, self.subject, self.count]
+        if topic is not None:
+            query += " AND topic = ?"
+            params.append(topic)
+        if difficulty is not None:
+            query += " AND difficulty = ?"
+            params.append(difficulty)
+        return query, params
+
+    def count_where(self, topic=None, difficulty=None):
+        """Число заданий с фильтром по теме и сложности (по индексу)."""
+        query, params = self.filtered(topic, difficulty)
+        return self.store.execute(f"SELECT COUNT(*) FROM tasks WHERE {query}", params)[0][0]
+
+    def positions_where(self, topic=None, difficulty=None, after=-1):
+        """Номера заданий с фильтром по порядку, начиная после after (по индексу)."""
+        query, params = self.filtered(topic, difficulty)
+        while True:
+            rows = self.store.execute(
+                f"SELECT position FROM tasks WHERE {query} AND position > ? ORDER BY position LIMIT ?",
+                (*params, after, PAGE_SIZE)
+            )
+            for (after,) in rows:
+                yield after
+            if len(rows) < PAGE_SIZE:
+                return
+
+
+class TaskStore:
+    """Хранилище заданий в базе SQLite с тем же интерфейсом, что и кэш."""
+
+    def __init__(self, path):
+        self.path = path
+        # Задания из базы читаются и в потоке дельта-обновления: запросы
+        # к общему соединению идут по очереди под блокировкой
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            # База от старой версии: задания перезагрузятся из сети или кэша
+            self.conn.executescript("DROP TABLE IF EXISTS tasks; DROP TABLE IF EXISTS meta;")
+            self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def execute(self, query, params=()):
+        """Выполняет запрос и возвращает все строки ответа."""
+        with self.lock:
+            return self.conn.execute(query, params).fetchall()
+
+    def get_meta(self):
+        rows = self.execute("SELECT value FROM meta WHERE key = 'source'")
+        return json.loads(rows[0][0]) if rows else None
+
+    def load(self, url, delimiter):
+        """Возвращает запись для источника или None, если база собрана из другого."""
+        meta = self.get_meta()
+        if not meta or meta.get("url") != url or meta.get("delimiter") != delimiter:
+            return None
+
+        generation = meta["generation"]
+        counts = dict(self.execute(
+            "SELECT subject, COUNT(*) FROM tasks WHERE generation = ? GROUP BY subject",
+            (generation,)
+        ))
+        meta["tasks"] = {
+            subject: StoredTasks(self, generation, subject, counts.get(subject, 0))
+            for subject in meta.pop("subjects")
+        }
+        rows = self.execute("SELECT value FROM meta WHERE key = 'hashes'")
+        if rows:
+            meta["hashes"] = array('Q', rows[0][0])
+        return meta
+
+    def stored(self, tasks, generation):
+        """Лежат ли задания в этой базе в поколении generation."""
+        return isinstance(tasks, StoredTasks) and tasks.store is self and tasks.generation == generation
+
+    def kept_rows(self, generation, pieces):
+        """Число строк каждого предмета, которые остаются в поколении как есть.
+
+        None, если банк нельзя дописать в поколение generation, не трогая
+        его строк. Дописать можно, когда каждый предмет начинается со всех
+        своих строк этого поколения, а новые задания идут после них
+        (SplicedTasks при добавлении источника).
+        """
+        counts = dict(self.execute(
+            "SELECT subject, COUNT(*) FROM tasks WHERE generation = ? GROUP BY subject",
+            (generation,)
+        ))
+        for subject, count in counts.items():
+            if subject not in pieces:
+                return None
+            tasks, start, length = pieces[subject][0]
+            if not (self.stored(tasks, generation) and tasks.subject == subject
+                    and start == 0 and length == count):
+                return None
+        return counts
+
+    def save(self, url, delimiter, tasks_data, headers=None, files=None, sync=None, hashes=None):
+        """Записывает банк заданий одной транзакцией.
+
+        Если банк лишь дописан к текущему поколению, вставляются только
+        новые строки. Иначе строки пишутся в следующее поколение, старое
+        удаляется после вставки, поэтому tasks_data может ссылаться на
+        данные этой же базы; отрезки из нее копируются запросом без
+        чтения в Python. hashes — хеши вопросов объединенного банка, как
+        в save_cache.
+        """
+        old = self.get_meta()
+        pieces = {
+            subject: tasks.pieces if isinstance(tasks, SplicedTasks) else [(tasks, 0, len(tasks))]
+            for subject, tasks in tasks_data.items()
+        }
+        kept = self.kept_rows(old["generation"], pieces) if old else None
+        if kept is not None:
+            generation = old["generation"]
+        else:
+            kept = {}
+            generation = old["generation"] + 1 if old else 1
+        meta = {
+            "url": url,
+            "delimiter": delimiter,
+            **validators_from_headers(headers),
+            "files": files or {},
+            "sync": sync,
+            "generation": generation,
+            "subjects": list(tasks_data)
+        }
+
+        # Вставки идут в одной транзакции, она фиксируется вместе с заменой
+        # поколения. Пачка собирается до захвата блокировки: tasks_data
+        # может читаться из этой же базы
+        try:
+            for subject, subject_pieces in pieces.items():
+                position = 0
+                for tasks, start, count in subject_pieces:
+                    if position == 0 and kept.get(subject):
+                        # Начало предмета уже лежит в этом поколении
+                        pass
+                    elif old and self.stored(tasks, old["generation"]):
+                        with self.lock:
+                            self.conn.execute(
+                                f"INSERT INTO tasks SELECT ?, ?, position + ?, {COLUMNS} FROM tasks "
+                                "WHERE generation = ? AND subject = ? AND position >= ? AND position < ?",
+                                (generation, subject, position - start,
+                                 tasks.generation, tasks.subject, start, start + count)
+                            )
+                    else:
+                        self.insert_rows(generation, subject, position, tasks, start, count)
+                    position += count
+            with self.lock, self.conn:
+                self.conn.execute("DELETE FROM tasks WHERE generation != ?", (generation,))
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO meta VALUES ('source', ?)",
+                    (json.dumps(meta, ensure_ascii=False),)
+                )
+                if hashes is None:
+                    self.conn.execute("DELETE FROM meta WHERE key = 'hashes'")
+                else:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO meta VALUES ('hashes', ?)",
+                        (array('Q', hashes).tobytes(),)
+                    )
+        except BaseException:
+            with self.lock:
+                self.conn.rollback()
+            raise
+
+        return self.load(url, delimiter)
+
+    def insert_rows(self, generation, subject, position, tasks, start, count):
+        """Вставляет задания tasks[start:start + count] с номера position пачками."""
+        if start == 0 and count == len(tasks):
+            selected = iter(tasks)
+        else:
+            selected = (tasks[index] for index in range(start, start + count))
+        rows = (
+            (generation, subject, index, *(task.get(field, '') for field in FIELDS))
+            for index, task in enumerate(selected, position)
+        )
+        while True:
+            batch = list(islice(rows, INSERT_BATCH))
+            if not batch:
+                break
+            with self.lock:
+                self.conn.executemany("INSERT INTO tasks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
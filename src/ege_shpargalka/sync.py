@@ -0,0 +1,130 @@
+"""Одновременная загрузка банков заданий по всем предметам.
+
+requests импортируется внутри функций: модуль нужен приложению при
+запуске ради BASE_URL, а сетевая библиотека — только при загрузке.
+"""
+import asyncio
+import time
+
+from ege_shpargalka.cache import conditional_headers
+from ege_shpargalka.core import ingest_stream
+from ege_shpargalka.delta import DeltaError, fetch_manifest, update_tasks
+from ege_shpargalka.ingest import CHUNK_SIZE, CsvStream, subject_from_url
+from ege_shpargalka.metrics import WARNING, log
+
+# Репозиторий с банками заданий
+BASE_URL = "https://raw.githubusercontent.com/Durashca/egeHelpDB/main/"
+
+# Сколько файлов загружается одновременно
+MAX_PARALLEL = 4
+
+# Повторные попытки при сетевых ошибках и задержка перед первой из них (секунды)
+RETRIES = 3
+BACKOFF = 0.5
+
+
+def create_session(pool_size=MAX_PARALLEL):
+    """Создает сессию с пулом keep-alive соединений."""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def is_retryable(error):
+    """Проверяет, имеет ли смысл повторить запрос после ошибки."""
+    import requests
+
+    if isinstance(error, requests.exceptions.HTTPError):
+        status = error.response.status_code if error.response is not None else 0
+        return status == 429 or status >= 500
+    return isinstance(error, (
+        requests.exceptions.ConnectionError,
+        requests.exceptions.Timeout,
+        requests.exceptions.ChunkedEncodingError
+    ))
+
+
+def download_bank(session, url, delimiter, validators=None, cached=None,
+                  retries=RETRIES, backoff=BACKOFF, timeout=10):
+    """Загружает и разбирает один банк заданий. Выполняется в потоке.
+
+    Если рядом с файлом опубликован манифест, скачиваются только
+    изменившиеся куски, остальные задания берутся из cached. Возвращает
+    (задания по предметам, заголовки ответа, сведения о кусках или None)
+    или None, если файл не изменился.
+    """
+    import requests
+
+    for attempt in range(retries + 1):
+        try:
+            try:
+                manifest = fetch_manifest(session, url, timeout)
+                if manifest is not None:
+                    result = update_tasks(session, url, delimiter, manifest, cached,
+                                          (validators or {}).get("sync"), timeout)
+                    if not result["changed"]:
+                        return None
+                    return result["tasks"], {}, result["sync"]
+            except (DeltaError, requests.exceptions.RequestException) as e:
+                # Сбой манифеста или кусков не мешает загрузить файл целиком
+                log(WARNING, f"Дельта-обновление {url} не удалось, загружаем файл целиком: {e}")
+
+            headers = conditional_headers(validators)
+            with session.get(url, timeout=timeout, stream=True, headers=headers) as response:
+                if response.status_code == 304:
+                    # Дочитываем пустое тело, чтобы соединение вернулось в пул
+                    response.content
+                    return None
+                response.raise_for_status()
+
+                stream = CsvStream(response.iter_content(CHUNK_SIZE), delimiter=delimiter)
+                tasks_data, _ = ingest_stream(stream, subject_from_url(url))
+                return tasks_data, response.headers, None
+        except requests.exceptions.RequestException as e:
+            if attempt == retries or not is_retryable(e):
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+
+async def sync_banks(urls, delimiter, validators=None, on_bank=None,
+                     max_parallel=MAX_PARALLEL, session=None, cached=None, **kwargs):
+    """Загружает несколько банков одновременно через общую сессию.
+
+    cached — задания из кэша для дельта-обновления по манифестам.
+
+    on_bank(url, result) вызывается в цикле событий по мере готовности
+    каждого файла; result — результат download_bank или исключение.
+    Возвращает словарь {url: result}.
+    """
+    validators = validators or {}
+    own_session = session is None
+    if own_session:
+        session = create_session(max_parallel)
+    semaphore = asyncio.Semaphore(max_parallel)
+
+    async def fetch(url):
+        async with semaphore:
+            try:
+                result = await asyncio.to_thread(
+                    download_bank, session, url, delimiter, validators.get(url), cached, **kwargs
+                )
+            except Exception as e:
+                result = e
+        return url, result
+
+    results = {}
+    try:
+        for future in asyncio.as_completed([fetch(url) for url in urls]):
+            url, result = await future
+            results[url] = result
+            if on_bank:
+                on_bank(url, result)
+    finally:
+        if own_session:
+            session.close()
+    return results
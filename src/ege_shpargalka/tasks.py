@@ -0,0 +1,139 @@
+"""Компактное хранение заданий в памяти.
+
+Словарь на каждое задание занимает больше места, чем сами тексты, а
+тема, сложность и номер задания повторяются в тысячах строк. Здесь
+задания предмета лежат по столбцам: тексты — подряд в одном буфере
+UTF-8 с таблицей смещений (без заголовка объекта на каждую строку),
+а тема, сложность и номер — числовыми кодами в массивах, сами строки
+хранятся один раз в таблицах предмета.
+
+Как и списки из кэша и базы, TaskColumns отдает каждое задание новым
+словарем, поэтому код интерфейса работает с ним так же, как со списком.
+"""
+import sys
+from array import array
+from collections.abc import Sequence
+
+
+class StringTable:
+    """Таблица повторяющихся строк: строка хранится один раз, в задании — ее код."""
+
+    def __init__(self, *values):
+        self.values = []
+        self.codes = {}
+        for value in values:
+            self.code(value)
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+# Текстовые поля задания в порядке хранения в буфере
+TEXT_FIELDS = ('question', 'answer', 'explanation')
+
+# Столбец кодов расширяется, когда различных строк больше, чем вмещает его тип
+WIDER_TYPECODES = {'B': 'H', 'H': 'I', 'I': 'Q'}
+
+
+class TaskColumns(Sequence):
+    """Задания одного предмета, разложенные по столбцам."""
+
+    def __init__(self, tasks=()):
+        # Тексты задания i лежат в text[offsets[3 * i]:offsets[3 * i + 3]]
+        self.text = bytearray()
+        self.offsets = array('Q', [0])
+        # Таблицы свои у каждого предмета и освобождаются вместе с банком;
+        # код 0 номера — «номера нет»
+        self.topic_table = StringTable("Общая тема")
+        self.difficulty_table = StringTable("easy", "medium", "hard")
+        self.number_table = StringTable(None)
+        self.topics = array('I')
+        self.difficulties = array('B')
+        self.numbers = array('H')
+        for task in tasks:
+            self.append(task)
+
+    def append(self, task):
+        for field in TEXT_FIELDS:
+            self.text += task.get(field, '').encode('utf-8')
+            self.offsets.append(len(self.text))
+        self.append_code('topics', self.topic_table.code(task['topic']))
+        self.append_code('difficulties', self.difficulty_table.code(task['difficulty']))
+        self.append_code('numbers', self.number_table.code(task.get('number')))
+
+    def append_code(self, name, code):
+        column = getattr(self, name)
+        if code >> (8 * column.itemsize):
+            column = array(WIDER_TYPECODES[column.typecode], column)
+            setattr(self, name, column)
+        column.append(code)
+
+    def __len__(self):
+        # Номер дописывается последним: задание с индексом < len уже целиком на месте
+        return len(self.numbers)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("task index out of range")
+        offsets = self.offsets
+        text = self.text
+        start = 3 * index
+        task = {
+            'question': text[offsets[start]:offsets[start + 1]].decode('utf-8'),
+            'answer': text[offsets[start + 1]:offsets[start + 2]].decode('utf-8'),
+            'topic': self.topic_table.values[self.topics[index]],
+            'difficulty': self.difficulty_table.values[self.difficulties[index]],
+            'explanation': text[offsets[start + 2]:offsets[start + 3]].decode('utf-8')
+        }
+        number = self.numbers[index]
+        if number:
+            task['number'] = self.number_table.values[number]
+        return task
+
+    def __iter__(self):
+        # Обход без проверок индекса: так задания читают кэш и индексы
+        text = self.text
+        offsets = self.offsets
+        topics = self.topic_table.values
+        difficulties = self.difficulty_table.values
+        numbers = self.number_table.values
+        for index in range(len(self)):
+            start = 3 * index
+            task = {
+                'question': text[offsets[start]:offsets[start + 1]].decode('utf-8'),
+                'answer': text[offsets[start + 1]:offsets[start + 2]].decode('utf-8'),
+                'topic': topics[self.topics[index]],
+                'difficulty': difficulties[self.difficulties[index]],
+                'explanation': text[offsets[start + 2]:offsets[start + 3]].decode('utf-8')
+            }
+            number = self.numbers[index]
+            if number:
+                task['number'] = numbers[number]
+            yield task
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return NotImplemented
+        return len(self) == len(other) and list(self) == list(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"TaskColumns({len(self)} заданий)"
+
+    def __sizeof__(self):
+        size = object.__sizeof__(self)
+        for column in (self.text, self.offsets, self.topics, self.difficulties, self.numbers):
+            size += sys.getsizeof(column)
+        for table in (self.topic_table, self.difficulty_table, self.number_table):
+            size += sys.getsizeof(table.values) + sys.getsizeof(table.codes)
+            size += sum(sys.getsizeof(value) for value in table.values)
+        return size
@@ -0,0 +1,115 @@
+"""Таймер экзамена на цикле событий asyncio.
+
+Таймер не считает тики: он хранит срок окончания по монотонным часам и
+каждый раз вычисляет остаток заново, поэтому задержки цикла событий не
+накапливаются. Просыпается он ровно тогда, когда меняется показываемая
+секунда. Для восстановления после перезапуска срок сохраняется по
+настенным часам — монотонные часы между запусками не сохраняются.
+"""
+import asyncio
+import math
+import time
+
+
+def format_remaining(seconds):
+    """Остаток времени в виде ЧЧ:ММ:СС."""
+    seconds = max(0, math.ceil(seconds))
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+class ExamTimer:
+    """Обратный отсчет с паузой и сохраняемым сроком окончания."""
+
+    def __init__(self, duration, on_tick=None, on_expire=None,
+                 clock=time.monotonic, wall_clock=time.time):
+        self.on_tick = on_tick
+        self.on_expire = on_expire
+        self.clock = clock
+        self.wall_clock = wall_clock
+        # Пока таймер на паузе, хранится остаток, иначе — срок окончания
+        self.remaining_on_pause = duration
+        self.deadline = None
+        self.task = None
+        # Срок восстановленного, но еще не запущенного таймера (по настенным часам)
+        self.wall_deadline = None
+
+    @property
+    def running(self):
+        return self.deadline is not None
+
+    @property
+    def pending(self):
+        """Восстановлен идущим, но еще не запущен: время при этом идет."""
+        return self.wall_deadline is not None
+
+    def remaining(self):
+        """Сколько секунд осталось."""
+        if self.wall_deadline is not None:
+            return max(0.0, self.wall_deadline - self.wall_clock())
+        if self.deadline is None:
+            return max(0.0, self.remaining_on_pause)
+        return max(0.0, self.deadline - self.clock())
+
+    def start(self):
+        """Запускает или продолжает отсчет."""
+        if self.running:
+            return
+        if self.wall_deadline is not None:
+            self.remaining_on_pause = self.remaining()
+            self.wall_deadline = None
+        self.deadline = self.clock() + self.remaining_on_pause
+        self.task = asyncio.create_task(self.run())
+
+    def pause(self):
+        """Останавливает отсчет, запоминая остаток."""
+        if not self.running:
+            return
+        self.remaining_on_pause = self.remaining()
+        self.deadline = None
+        self.cancel()
+
+    def cancel(self):
+        if self.task is not None and self.task is not asyncio.current_task():
+            self.task.cancel()
+        self.task = None
+
+    async def run(self):
+        """Обновляет показ раз в секунду, пока время не выйдет."""
+        while self.running:
+            remaining = self.remaining()
+            if self.on_tick:
+                self.on_tick(remaining)
+            if remaining <= 0:
+                self.deadline = None
+                self.remaining_on_pause = 0
+                self.task = None
+                if self.on_expire:
+                    self.on_expire()
+                return
+            # Спим до момента, когда сменится показываемая секунда
+            await asyncio.sleep(remaining - (math.ceil(remaining) - 1))
+
+    def to_dict(self):
+        """Состояние для сохранения на диск."""
+        if self.wall_deadline is not None:
+            return {"deadline": self.wall_deadline}
+        if self.running:
+            return {"deadline": self.wall_clock() + self.remaining()}
+        return {"remaining": self.remaining_on_pause}
+
+    @classmethod
+    def from_dict(cls, state, start=True, **kwargs):
+        """Восстанавливает таймер; запущенный таймер продолжает отсчет.
+
+        start=False — не запускать отсчет (и не вызывать on_tick и
+        on_expire), пока не вызван start(). Срок при этом не сдвигается:
+        remaining() убывает, а истекший срок сработает при запуске.
+        """
+        timer = cls(0, **kwargs)
+        if "deadline" in state:
+            timer.wall_deadline = state["deadline"]
+            if start:
+                timer.start()
+        else:
+            timer.remaining_on_pause = state.get("remaining", 0)
+        return timer
@@ -0,0 +1,119 @@
+"""Сборка тренировочных вариантов из банка заданий.
+
+Задания раскладываются по корзинам: номер задания ЕГЭ (1–27), внутри —
+пара (тема, сложность). Корзины заполняются по мере загрузки банка,
+поэтому сборка варианта — это несколько случайных выборов из готовых
+списков без перемешивания всего банка. Генератор случайных чисел
+инициализируется номером варианта: вариант №3 одинаков для всего класса.
+
+Одинаковым он будет, только если корзины заполнены всем банком, поэтому
+вариант собирается лишь после того, как индекс отмечен полным.
+"""
+import random
+from array import array
+
+# Число заданий в варианте ЕГЭ
+VARIANT_SIZE = 27
+
+# Сколько раз перевыбирать задание, если оно уже попало в вариант
+MAX_RETRIES = 10
+
+
+def task_slot(task):
+    """Номер задания ЕГЭ (1–27) или None, если номер не указан."""
+    try:
+        number = int(str(task.get('number', '')).strip())
+    except ValueError:
+        return None
+    return number if 1 <= number <= VARIANT_SIZE else None
+
+
+class IndexIncomplete(Exception):
+    """Корзины еще заполняются: вариант зависел бы от того, сколько успели разложить."""
+
+
+class VariantIndex:
+    """Корзины заданий по номеру ЕГЭ, теме и сложности."""
+
+    def __init__(self, complete=False):
+        # предмет -> номер задания (или тема) -> (тема, сложность) -> номера в банке
+        self.buckets = {}
+        # В корзины разложен весь банк
+        self.complete = complete
+
+    def add(self, subject, position, task):
+        """Добавляет задание в корзины."""
+        topic = task.get('topic') or 'Общая тема'
+        difficulty = task.get('difficulty') or 'medium'
+        slot = task_slot(task)
+        # Без номера задания вариант стратифицируется по темам
+        stratum = slot if slot is not None else topic
+
+        strata = self.buckets.setdefault(subject, {})
+        buckets = strata.setdefault(stratum, {})
+        positions = buckets.get((topic, difficulty))
+        if positions is None:
+            positions = buckets[(topic, difficulty)] = array('I')
+        positions.append(position)
+
+    def strata(self, subject):
+        """Страты предмета в порядке заданий варианта."""
+        strata = self.buckets.get(subject, {})
+        slots = sorted(key for key in strata if isinstance(key, int))
+        if slots:
+            return slots
+        return sorted(strata)
+
+    def assemble(self, subject, seed, size=VARIANT_SIZE):
+        """Собирает вариант: список номеров заданий в банке.
+
+        Для банка с номерами ЕГЭ — по одному заданию на номер. Без номеров
+        темы обходятся по кругу, пока не наберется size заданий. Внутри
+        страты сначала равновероятно выбирается корзина (тема, сложность),
+        затем задание в ней.
+        """
+        if not self.complete:
+            raise IndexIncomplete(subject)
+        rng = random.Random(f"{subject}:{seed}")
+        strata = self.strata(subject)
+        if not strata:
+            return []
+
+        buckets = self.buckets[subject]
+        # В банке с номерами ЕГЭ каждый номер встречается в варианте один раз
+        numbered = isinstance(strata[0], int)
+        chosen = []
+        used = set()
+        exhausted = set()
+        index = 0
+        while len(chosen) < size and len(exhausted) < len(strata):
+            if numbered and index >= len(strata):
+                break
+            stratum = strata[index % len(strata)]
+            index += 1
+            if stratum in exhausted:
+                continue
+
+            position = self.pick(rng, buckets[stratum], used)
+            if position is None:
+                exhausted.add(stratum)
+                continue
+            chosen.append(position)
+            used.add(position)
+        return chosen
+
+    def pick(self, rng, buckets, used):
+        """Случайное задание страты, еще не попавшее в вариант."""
+        keys = sorted(buckets)
+        for _ in range(MAX_RETRIES):
+            positions = buckets[keys[rng.randrange(len(keys))]]
+            position = positions[rng.randrange(len(positions))]
+            if position not in used:
+                return position
+
+        # Страта почти исчерпана: берем первое свободное задание
+        for key in keys:
+            for position in buckets[key]:
+                if position not in used:
+                    return position
+        return None
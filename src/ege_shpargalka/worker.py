@@ -0,0 +1,246 @@
+"""Импорт банка заданий в отдельном процессе.
+
+Загрузка, декодирование, разбор, проверка строк и запись кэша идут в
+процессе-работнике, поэтому цикл событий интерфейса не делит с ними
+GIL. Работник сообщает прогресс, а в конце — файл кэша, который
+интерфейс отображает в память. По запросу работник пересылает и сами
+пачки: интерфейс показывает задания до конца импорта и добавляет в
+индексы только новые, а после записи кэша переходит на его файл с теми
+же номерами заданий. Метрики разбора, накопленные в работнике, приходят
+вместе с завершающим сообщением. Где процессы
+недоступны (Android, iOS, приложение без интерпретатора для работника),
+та же функция работает в потоке.
+
+Если задан каталог загрузок, файл по URL скачивается с докачкой (см.
+download.py): после отмены или обрыва следующий импорт продолжит
+загрузку с того же места.
+"""
+import asyncio
+import os
+import queue
+import sys
+import threading
+
+from ege_shpargalka.cache import cache_file, save_cache
+from ege_shpargalka.core import add_batch, is_url, read_chunks
+from ege_shpargalka.download import Download, DownloadCancelled, download_path
+from ege_shpargalka.ingest import CHUNK_SIZE, CsvStream, subject_from_url
+from ege_shpargalka.metrics import metrics
+
+# Сколько пачек может ждать в очереди, пока интерфейс их разбирает
+QUEUE_SIZE = 16
+
+# Как часто проверять, жив ли работник, пока очередь пуста (секунды)
+POLL_INTERVAL = 0.5
+
+# Сообщения, после которых работник больше ничего не присылает
+FINAL_MESSAGES = {"done", "not_modified", "cancelled", "error"}
+
+
+def import_bank(source, delimiter, cache, key, messages, cancel, request_headers=None,
+                download_dir=None, send_batches=False, in_process=False, timeout=10):
+    """Загружает, разбирает и сохраняет банк; выполняется в работнике.
+
+    cache — ("file", путь) или ("sqlite", путь). В messages уходят пары
+    (вид, данные): start (размер файла или None), progress (скачано
+    байт, размер, байт в секунду), batch (пачка пар (предмет, задание)
+    или None без send_batches, число заданий, прочитано байт) и одно из
+    завершающих сообщений. done содержит файл, в который
+    записан кэш, а при in_process=True — и метрики работника.
+    """
+    response = None
+    download = None
+    try:
+        headers = None
+        if is_url(source) and download_dir:
+            download = Download(
+                source, download_path(download_dir, source), request_headers, cancel,
+                on_progress=lambda *progress: messages.put(("progress", progress))
+            )
+            if not download.start():
+                messages.put(("not_modified", None))
+                return
+            headers = download.headers
+            total = download.total
+            chunks = download.chunks()
+        elif is_url(source):
+            import requests
+
+            response = requests.get(source, timeout=timeout, stream=True, headers=request_headers or {})
+            if response.status_code == 304:
+                messages.put(("not_modified", None))
+                return
+            response.raise_for_status()
+            headers = dict(response.headers)
+            total = int(headers.get("Content-Length") or 0) or None
+            chunks = response.iter_content(CHUNK_SIZE)
+        else:
+            total = os.path.getsize(source)
+            chunks = read_chunks(source)
+        messages.put(("start", total))
+
+        stream = CsvStream(chunks, delimiter=delimiter)
+        tasks_data = {}
+        count = 0
+        # Кэш ответов процесса-работника интерфейсу не достанется
+        for batch in stream.task_batches(subject_from_url(source), compile_answers=not in_process):
+            if cancel.is_set():
+                messages.put(("cancelled", None))
+                return
+            add_batch(tasks_data, batch)
+            count += len(batch)
+            messages.put(("batch", (batch if send_batches else None, count, stream.bytes_read)))
+
+        if cancel.is_set():
+            messages.put(("cancelled", None))
+            return
+        kind, path = cache
+        if kind == "sqlite":
+            from ege_shpargalka.store import TaskStore
+
+            store = TaskStore(path)
+            try:
+                store.save(key, delimiter, tasks_data, headers)
+            finally:
+                store.close()
+        else:
+            save_cache(path, key, delimiter, tasks_data, headers, versioned=True)
+            path = cache_file(path)
+        if download is not None:
+            # Задания в кэше, скачанный файл больше не нужен
+            download.discard()
+
+        done = {
+            "count": count,
+            "rows": stream.rows_read,
+            "skipped": stream.rows_read - count,
+            "bytes": stream.bytes_read,
+            "encoding": stream.encoding or "utf-8",
+            "delimiter": stream.delimiter,
+            "cache": path
+        }
+        if in_process:
+            # Процесс запущен ради этого импорта: все его метрики — метрики импорта
+            done["metrics"] = metrics.export()
+        messages.put(("done", done))
+    except DownloadCancelled:
+        messages.put(("cancelled", None))
+    except Exception as e:
+        messages.put(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        if response is not None:
+            response.close()
+
+
+def spawn_executable():
+    """Чем запускать процесс-работник; None — работать в потоке.
+
+    Собранное приложение (sys.frozen) запускает работника самим собой,
+    а __main__ передает управление multiprocessing (freeze_support). В
+    приложении с загрузчиком вместо интерпретатора (Briefcase) работник
+    запускается интерпретатором из sys.prefix, если он там есть: сам
+    загрузчик вместо работника открыл бы еще одно окно.
+    """
+    if getattr(sys, "frozen", False):
+        return sys.executable
+    if not sys.executable:
+        return None
+    if os.path.basename(sys.executable).lower().startswith(("python", "pypy")):
+        return sys.executable
+    for candidate in (os.path.join(sys.prefix, "python.exe"), os.path.join(sys.prefix, "bin", "python3")):
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+class BankImport:
+    """Импорт банка в процессе-работнике (или в потоке, если процессы недоступны)."""
+
+    def __init__(self, source, delimiter, cache, key, request_headers=None,
+                 download_dir=None, use_process=True, send_batches=False):
+        self.args = (source, delimiter, cache, key)
+        self.request_headers = request_headers
+        self.download_dir = download_dir
+        self.send_batches = send_batches
+        self.use_process = use_process
+        self.worker = None
+        self.messages = None
+        self.cancel_event = None
+        self.finished = False
+
+    def start(self):
+        executable = spawn_executable() if self.use_process else None
+        if executable is not None:
+            try:
+                import multiprocessing
+
+                # spawn: дочерний процесс не наследует состояние графического интерфейса
+                context = multiprocessing.get_context("spawn")
+                context.set_executable(executable)
+                self.messages = context.Queue(QUEUE_SIZE)
+                self.cancel_event = context.Event()
+                self.worker = context.Process(
+                    target=import_bank,
+                    args=(*self.args, self.messages, self.cancel_event, self.request_headers,
+                          self.download_dir, self.send_batches, True),
+                    daemon=True
+                )
+                self.worker.start()
+                return
+            except (ImportError, NotImplementedError, OSError):
+                pass
+        self.use_process = False
+
+        self.messages = queue.Queue(QUEUE_SIZE)
+        self.cancel_event = threading.Event()
+        self.worker = threading.Thread(
+            target=import_bank,
+            args=(*self.args, self.messages, self.cancel_event, self.request_headers,
+                  self.download_dir, self.send_batches),
+            daemon=True
+        )
+        self.worker.start()
+
+    def cancel(self):
+        """Просит работника остановиться; придет сообщение cancelled."""
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+
+    def next_message(self):
+        """Следующее сообщение работника; ждет, пока работник жив."""
+        while True:
+            try:
+                return self.messages.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                if not self.worker.is_alive():
+                    try:
+                        return self.messages.get(timeout=POLL_INTERVAL)
+                    except queue.Empty:
+                        return "error", "работник завершился без ответа"
+
+    async def events(self):
+        """Сообщения работника в цикле событий до завершающего включительно."""
+        try:
+            while True:
+                kind, payload = await asyncio.to_thread(self.next_message)
+                if kind in FINAL_MESSAGES:
+                    self.finished = True
+                if kind == "done" and "metrics" in payload:
+                    metrics.merge(payload.pop("metrics"))
+                yield kind, payload
+                if self.finished:
+                    return
+        finally:
+            self.close()
+
+    def close(self):
+        if self.worker is None:
+            return
+        if not self.finished:
+            # Интерфейс перестал читать очередь: работника больше никто не ждет
+            self.cancel()
+            if self.use_process and self.worker.is_alive():
+                self.worker.terminate()
+        if self.use_process:
+            self.worker.join(timeout=5)
+        self.worker = None
@@ -0,0 +1,128 @@
+import json
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from ege_shpargalka.analytics import (
+    DAY, SNAPSHOT_SUFFIX, AttemptHistory, load_history, weak_topics, weak_topics_report
+)
+from ege_shpargalka.history import attempt_event
+
+NOW = 1_800_000_000
+
+
+def attempts(subject, topic, results, days_ago=0):
+    task = {"question": f"{topic} вопрос", "topic": topic}
+    return [attempt_event(subject, task, correct, now=NOW - days_ago * DAY) for correct in results]
+
+
+def write_history(path, events):
+    with open(path, 'a', encoding='utf-8') as f:
+        for event in events:
+            record = {key: value for key, value in event.items() if key != "type"}
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def ranked_topics(history):
+    return [(item["subject"], item["topic"]) for item in history.topic_stats(now=NOW)]
+
+
+def test_smoothing_needs_evidence():
+    """Одна ошибка не делает тему слабее темы с устойчиво плохими результатами."""
+    history = AttemptHistory()
+    for event in (attempts("math", "Логарифмы", [False])
+                  + attempts("math", "Вероятность", [True, False, False, False] * 5)
+                  + attempts("math", "Производная", [True] * 30)):
+        history.add(event)
+
+    stats = {item["topic"]: item for item in history.topic_stats(now=NOW)}
+    assert ranked_topics(history)[0] == ("math", "Вероятность")
+    assert stats["Вероятность"]["attempts"] == 20 and stats["Вероятность"]["correct"] == 5
+    # Оценка одной попытки близка к точности по предмету, а не к нулю
+    assert stats["Логарифмы"]["accuracy"] > 0.4
+
+
+def test_recent_mistakes_weigh_more():
+    history = AttemptHistory()
+    # Тема A: ошибки давно, сейчас все верно; тема B — наоборот
+    for event in (attempts("math", "A", [False] * 10, days_ago=120) + attempts("math", "A", [True] * 10)
+                  + attempts("math", "B", [True] * 10, days_ago=120) + attempts("math", "B", [False] * 10)):
+        history.add(event)
+
+    stats = {item["topic"]: item for item in history.topic_stats(now=NOW)}
+    assert stats["A"]["accuracy"] == pytest.approx(stats["B"]["accuracy"])
+    assert ranked_topics(history)[0] == ("math", "B")
+    assert stats["B"]["trend"] < 0 < stats["A"]["trend"]
+    assert weak_topics(history.topic_stats(now=NOW), "math", limit=1) == ["B"]
+    assert weak_topics(history.topic_stats(now=NOW), "physics") == []
+
+
+def test_load_matches_added_events_and_grows(tmp_path):
+    path = str(tmp_path / "attempts.jsonl")
+    events = []
+    for i in range(3000):
+        events += attempts(["math", "physics"][i % 2], f"Тема {i % 7}", [i % 3 == 0], days_ago=i % 50)
+    write_history(path, events)
+
+    added = AttemptHistory(capacity=16)
+    for event in events:
+        added.add(event)
+    loaded = AttemptHistory.load(path)
+    assert len(loaded) == len(added) == 3000
+    assert loaded.topic_stats(now=NOW) == added.topic_stats(now=NOW)
+
+
+def test_snapshot_skips_parsed_lines(tmp_path):
+    path = str(tmp_path / "attempts.jsonl")
+    write_history(path, attempts("math", "A", [True, False] * 50) + attempts("math", "B", [False] * 10))
+    history = AttemptHistory.load(path)
+    history.save_snapshot(path + SNAPSHOT_SUFFIX)
+
+    # Дописанные после снимка строки разбираются, предыдущие берутся из снимка
+    write_history(path, attempts("physics", "C", [False] * 5))
+    loaded = AttemptHistory.load(path)
+    assert loaded.snapshot_offset > 0 and len(loaded) == 115
+    assert {item["topic"] for item in loaded.topic_stats(now=NOW)} == {"A", "B", "C"}
+
+    # После сброса статистики файл пишется заново: снимок не подходит
+    os.truncate(path, 0)
+    write_history(path, attempts("russian", "D", [True] * 200))
+    loaded = AttemptHistory.load(path)
+    assert loaded.snapshot_offset == 0
+    assert ranked_topics(loaded) == [("russian", "D")]
+
+
+def test_load_reads_lines_up_to_limit(tmp_path):
+    """limit обрезает файл; недописанная строка в конце пропускается."""
+    path = str(tmp_path / "attempts.jsonl")
+    write_history(path, attempts("math", "A", [True] * 30))
+    line_size = os.path.getsize(path) // 30
+
+    loaded = AttemptHistory.load(path, limit=line_size * 20 + line_size // 2)
+    assert len(loaded) == 20
+    assert loaded.offset == line_size * 20 + line_size // 2
+
+
+def test_load_history_refreshes_snapshot(tmp_path, monkeypatch):
+    from ege_shpargalka import analytics
+
+    monkeypatch.setattr(analytics, "SNAPSHOT_EVERY", 1)
+    path = str(tmp_path / "attempts.jsonl")
+    write_history(path, attempts("math", "A", [True] * 10))
+    assert len(load_history(path)) == 10
+    assert os.path.exists(path + SNAPSHOT_SUFFIX)
+    assert AttemptHistory.load(path).tail == 0
+    assert len(load_history(str(tmp_path / "missing.jsonl"))) == 0
+
+
+def test_report_lists_weakest_first():
+    history = AttemptHistory()
+    for event in attempts("physics", "Оптика", [False] * 8) + attempts("math", "Логарифмы", [True] * 8):
+        history.add(event)
+    report = weak_topics_report(history.topic_stats(now=NOW))
+    lines = report.splitlines()
+    assert lines[0] == "Слабые темы (что повторить):"
+    assert lines[1].startswith("Физика, Оптика: ")
+    assert weak_topics_report([]) == ""
@@ -0,0 +1,50 @@
+import pytest
+
+from ege_shpargalka.benchmarks import (
+    INGEST_FORMATS, compare, generate_rows, load_baseline, run_suite, save_baseline, write_bank
+)
+from ege_shpargalka.cli import main
+from ege_shpargalka.core import ingest_source
+
+
+def test_generator_is_deterministic():
+    assert list(generate_rows(50, seed=3)) == list(generate_rows(50, seed=3))
+    assert list(generate_rows(50, seed=3)) != list(generate_rows(50, seed=4))
+
+
+@pytest.mark.parametrize("encoding, delimiter", INGEST_FORMATS)
+def test_bank_formats_are_detected(tmp_path, encoding, delimiter):
+    path = write_bank(str(tmp_path / "bank.csv"), 120, encoding, delimiter)
+    result = ingest_source(path)
+    assert result["count"] == 120
+    assert result["stream"].delimiter == delimiter
+    rows = list(generate_rows(120))
+    assert result["tasks"]["math"][0]["question"] == rows[0]["question_text"]
+
+
+def test_suite_and_baseline(tmp_path):
+    results = run_suite("40", workdir=str(tmp_path), repeat=1)
+    assert {"cache.load", "check_answer", "next_task", "save_stats", "refresh_stats_display", "search"} <= set(results)
+    assert len([name for name in results if name.startswith("ingest[")]) == len(INGEST_FORMATS)
+
+    path = str(tmp_path / "baseline.json")
+    assert load_baseline(path, "40") == {}
+    save_baseline(path, "40", results)
+    assert load_baseline(path, "40") == results
+
+
+def test_compare_flags_regressions():
+    baseline = {"a": 1.0, "b": 1.0}
+    assert compare({"a": 1.2, "b": 0.5, "new": 9.0}, baseline, threshold=0.25) == []
+    assert compare({"a": 1.3, "b": 1.0}, baseline, threshold=0.25) == [("a", 1.0, 1.3)]
+
+
+def test_bench_command_fails_on_regression(tmp_path, capsys):
+    baseline = str(tmp_path / "baseline.json")
+    assert main(["bench", "--size", "40", "--repeat", "1", "--baseline", baseline]) == 0
+    assert load_baseline(baseline, "40")
+
+    # Базовая линия, которую невозможно догнать
+    save_baseline(baseline, "40", {"check_answer": 1e-12})
+    assert main(["bench", "--size", "40", "--repeat", "1", "--baseline", baseline]) == 1
+    assert "РЕГРЕССИЯ check_answer" in capsys.readouterr().out
@@ -0,0 +1,148 @@
+import json
+
+from ege_shpargalka.cache import CachedTasks, conditional_headers, load_cache, save_cache
+
+
+def make_task(i):
+    return {
+        "question": f"Вопрос №{i}: x² = {i}",
+        "answer": str(i),
+        "topic": "Общая тема",
+        "difficulty": "medium",
+        "explanation": "ё" * (i % 5)
+    }
+
+
+def test_cache_is_keyed_by_url_and_delimiter(tmp_path):
+    """Кэш отдается только для того источника, из которого он был загружен."""
+    path = str(tmp_path / "tasks_cache.bin")
+    tasks = {"math": [{"question": "2+2", "answer": "4"}]}
+    save_cache(path, "https://example.com/math.csv", ",", tasks,
+               {"ETag": '"abc"', "Last-Modified": "Wed, 01 Jan 2025 00:00:00 GMT"})
+
+    entry = load_cache(path, "https://example.com/math.csv", ",")
+    assert list(entry["tasks"]["math"]) == tasks["math"]
+    assert load_cache(path, "https://example.com/physics.csv", ",") is None
+    assert load_cache(path, "https://example.com/math.csv", ";") is None
+
+    assert conditional_headers(entry) == {
+        "If-None-Match": '"abc"',
+        "If-Modified-Since": "Wed, 01 Jan 2025 00:00:00 GMT"
+    }
+
+
+def test_legacy_cache_is_ignored(tmp_path):
+    """Кэш старого формата без привязки к источнику не используется."""
+    path = tmp_path / "tasks_cache.bin"
+    path.write_text(json.dumps({"version": 1, "url": "u", "delimiter": ",", "tasks": {}}), encoding="utf-8")
+    assert load_cache(str(path), "u", ",") is None
+    assert load_cache(str(tmp_path / "missing.bin"), "u", ",") is None
+    assert conditional_headers(None) == {}
+
+
+def test_tasks_are_decoded_on_access(tmp_path, monkeypatch):
+    """Задания читаются по индексу, без загрузки всего банка."""
+    path = str(tmp_path / "tasks_cache.bin")
+    tasks_data = {
+        "math": [make_task(i) for i in range(100_000)],
+        "physics": [make_task(i) for i in range(3)],
+        "russian": []
+    }
+    save_cache(path, "u", ",", tasks_data, files={"u": {"etag": None, "subjects": ["math"]}})
+
+    # Считаем разобранные JSON-документы: при загрузке — только метаданные
+    decoded = []
+    loads = json.loads
+    monkeypatch.setattr(json, "loads", lambda text, **kwargs: decoded.append(text) or loads(text, **kwargs))
+    entry = load_cache(path, "u", ",")
+    assert len(decoded) == 1
+
+    math = entry["tasks"]["math"]
+    assert isinstance(math, CachedTasks)
+    assert len(math) == 100_000
+    assert len(decoded) == 1
+    assert math[12345] == make_task(12345)
+    assert math[-1] == make_task(99_999)
+    assert len(decoded) == 3
+    assert entry["tasks"]["physics"][1:] == [make_task(1), make_task(2)]
+    assert len(entry["tasks"]["russian"]) == 0
+    assert entry["files"] == {"u": {"etag": None, "subjects": ["math"]}}
+
+
+def test_open_cache_is_never_replaced(tmp_path, monkeypatch):
+    """Новое поколение пишется рядом: отображенный файл не подменяется."""
+    import os
+
+    from ege_shpargalka import cache
+
+    path = str(tmp_path / "tasks_cache.bin")
+    save_cache(path, "u", ",", {"math": [make_task(1)]}, versioned=True)
+    old = load_cache(path, "u", ",")
+    mapped = cache.cache_file(path)
+
+    targets = []
+    replace = os.replace
+    monkeypatch.setattr(cache.os, "replace", lambda src, dst: (targets.append(dst), replace(src, dst)))
+    save_cache(path, "u", ",", {"math": [make_task(2), make_task(3)]}, versioned=True)
+
+    assert mapped not in targets and path not in targets
+    assert old["tasks"]["math"][0] == make_task(1)
+    assert list(load_cache(path, "u", ",")["tasks"]["math"]) == [make_task(2), make_task(3)]
+    assert [p.name for p in tmp_path.glob("tasks_cache.bin.g*")] == [os.path.basename(cache.cache_file(path))]
+
+    # Кэш, записанный целиком (командой ingest), заменяет ссылку
+    save_cache(path, "u", ",", {"math": [make_task(4)]})
+    assert list(load_cache(path, "u", ",")["tasks"]["math"]) == [make_task(4)]
+
+
+def test_spliced_tasks_are_saved_without_touching_the_mapped_file(tmp_path, monkeypatch):
+    """Новые задания дописываются в копию: открытый файл не меняется (Windows)."""
+    import builtins
+
+    from ege_shpargalka import cache
+    from ege_shpargalka.cache import SplicedTasks, cache_file
+
+    path = str(tmp_path / "tasks_cache.bin")
+    save_cache(path, "u", ",", {"math": [make_task(i) for i in range(100)]}, versioned=True)
+    old = load_cache(path, "u", ",")
+    data_file = cache_file(path)
+    with open(data_file, 'rb') as f:
+        before = f.read()
+
+    # Отображенный файл нельзя открывать на запись
+    real_open = builtins.open
+
+    def guarded_open(file, mode='r', *args, **kwargs):
+        assert not (file == data_file and set(mode) & set("wa+")), mode
+        return real_open(file, mode, *args, **kwargs)
+
+    monkeypatch.setattr(cache, "open", guarded_open, raising=False)
+
+    spliced = SplicedTasks([(old["tasks"]["math"], 50, 50)])
+    spliced.append(make_task(1000))
+    assert len(spliced) == 51 and spliced[-1] == make_task(1000) and spliced[0] == make_task(50)
+    saved = save_cache(path, "u", ",", {"math": spliced, "physics": [make_task(7)]}, versioned=True)
+
+    expected = [make_task(i) for i in range(50, 100)] + [make_task(1000)]
+    assert cache_file(path) != data_file
+    with open(cache_file(path), 'rb') as f:
+        assert f.read().startswith(before)
+    assert old["tasks"]["math"].buffer[:] == before
+    assert list(saved["tasks"]["math"]) == expected
+    assert list(load_cache(path, "u", ",")["tasks"]["physics"]) == [make_task(7)]
+    assert list(old["tasks"]["math"]) == [make_task(i) for i in range(100)]
+
+    # Дописанное больше записанного целиком: файл пишется заново
+    entry = saved
+    while entry["data_size"] == saved["data_size"]:
+        spliced = SplicedTasks([(entry["tasks"]["math"], 0, None)])
+        for i in range(20):
+            spliced.append(make_task(i))
+        entry = save_cache(path, "u", ",", {"math": spliced}, versioned=True)
+    assert len(entry["tasks"]["math"]) == len(spliced)
+    assert list(load_cache(path, "u", ",")["tasks"]["math"]) == list(spliced)
+
+    # Недописанный после сбоя хвост: кэш не используется
+    with open(cache_file(path), 'ab') as f:
+        f.write(b"{\"torn")
+    assert load_cache(path, "u", ",") is None
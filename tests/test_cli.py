@@ -0,0 +1,70 @@
+import json
+
+from ege_shpargalka import analytics
+from ege_shpargalka.cache import load_cache
+from ege_shpargalka.cli import main
+from ege_shpargalka.sync import BASE_URL
+
+BANK = (
+    "subject;question_text;correct_answer;topic;difficulty;task_number\n"
+    "math;Сколько будет 2+2?;4;Арифметика;easy;1\n"
+    "math;Найдите корень: x - 3 = 0;3;Уравнения;medium;5\n"
+    "physics;Скорость света, км/с?;300000 км/с;Оптика;hard;\n"
+)
+
+
+def test_ingest_export_roundtrip(tmp_path, capsys):
+    """Собранный кэш подхватывается приложением и выгружается обратно в CSV."""
+    source = tmp_path / "mathematic.csv"
+    source.write_text(BANK, encoding="utf-8")
+    cache = tmp_path / "tasks_cache.bin"
+
+    assert main(["ingest", str(source), "-o", str(cache)]) == 0
+    assert "строк/с" in capsys.readouterr().out
+
+    entry = load_cache(str(cache), BASE_URL + "mathematic.csv", "auto")
+    assert len(entry["tasks"]["math"]) == 2
+    assert entry["tasks"]["math"][1]["number"] == "5"
+
+    exported = tmp_path / "export.csv"
+    assert main(["export-cache", str(cache), "-o", str(exported)]) == 0
+    assert main(["ingest", str(exported), "-o", str(tmp_path / "again.bin"), "--key", "u"]) == 0
+    again = load_cache(str(tmp_path / "again.bin"), "u", "auto")
+    assert list(again["tasks"]["physics"]) == list(entry["tasks"]["physics"])
+
+
+def test_validate_reports_broken_rows(tmp_path, capsys):
+    source = tmp_path / "bank.csv"
+    source.write_text(BANK, encoding="utf-8")
+    assert main(["validate", str(source)]) == 0
+
+    source.write_text(
+        BANK + "math;Сколько будет 2+2?;4;Арифметика;easy;1\n" + "math;;1;;trivial;40\n",
+        encoding="utf-8"
+    )
+    assert main(["validate", str(source)]) == 1
+    out = capsys.readouterr().out
+    assert "строка 4: вопрос повторяет строку 1" in out
+    assert "строка 5: нет вопроса или ответа" in out
+
+
+def test_stats_reads_without_writing(tmp_path, capsys):
+    (tmp_path / "stats_journal.jsonl").write_text(
+        json.dumps({"type": "attempt", "subject": "math", "correct": True, "seq": 1}) + "\n{\"torn",
+        encoding="utf-8"
+    )
+    assert main(["stats", "--dir", str(tmp_path), "--json"]) == 0
+    assert json.loads(capsys.readouterr().out)["total_attempts"] == 1
+    assert (tmp_path / "stats_journal.jsonl").read_text(encoding="utf-8").endswith("torn")
+    assert not (tmp_path / "stats.json").exists()
+
+    # Слабые темы по файлу истории попыток
+    (tmp_path / "attempts.jsonl").write_text(
+        json.dumps({"subject": "physics", "topic": "Оптика", "time": 0, "correct": False},
+                   ensure_ascii=False) + "\n",
+        encoding="utf-8"
+    )
+    assert main(["stats", "--dir", str(tmp_path)]) == 0
+    out = capsys.readouterr().out
+    if analytics.available():
+        assert "Физика, Оптика" in out
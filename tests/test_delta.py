@@ -0,0 +1,218 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from ege_shpargalka.benchmarks import write_bank
+from ege_shpargalka.cache import load_cache, save_cache
+from ege_shpargalka.core import ingest_source
+from ege_shpargalka.delta import (
+    MANIFEST_SUFFIX, DeltaError, build_manifest, fetch_manifest, manifest_url, row_ends,
+    update_tasks
+)
+from ege_shpargalka.sync import create_session, download_bank
+
+
+def make_versions(tmp_path):
+    """Две версии банка: во второй исправлен один ответ, одна строка вставлена, одна удалена."""
+    path = write_bank(str(tmp_path / "mathematic.csv"), 3000, "windows-1251", ";")
+    with open(path, 'rb') as f:
+        v1 = f.read()
+    lines = v1.split(b"\r\n")
+    lines[1500] = lines[1500].replace(b";medium;", b";hard;").replace(b";easy;", b";hard;")
+    lines.insert(700, "math;Новый вопрос про логарифмы?;2;Логарифмы;easy;;5".encode("cp1251"))
+    del lines[2600]
+    return v1, b"\r\n".join(lines)
+
+
+@pytest.fixture
+def server():
+    """Локальный сервер с банком и манифестом; поддерживает запросы Range."""
+    state = {"bank": b"", "manifest": None, "manifest_status": 200, "sent": 0, "requests": [],
+             "ranges": True}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            state["requests"].append((self.path, self.headers.get("Range")))
+            if self.path == "/mathematic.csv" + MANIFEST_SUFFIX and state["manifest_status"] != 200:
+                self.reply(state["manifest_status"], b"")
+            elif self.path == "/mathematic.csv" + MANIFEST_SUFFIX and state["manifest"] is not None:
+                self.reply(200, json.dumps(state["manifest"]).encode("utf-8"))
+            elif self.path == "/mathematic.csv":
+                body = state["bank"]
+                ranged = self.headers.get("Range")
+                if ranged and state["ranges"]:
+                    start, end = map(int, ranged.split("=")[1].split("-"))
+                    self.reply(206, body[start:end + 1],
+                               {"Content-Range": f"bytes {start}-{end}/{len(body)}"})
+                else:
+                    self.reply(200, body)
+            else:
+                self.reply(404, b"")
+
+        def reply(self, status, body, headers=None):
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            state["sent"] += len(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    httpd.state = state
+    httpd.url = f"http://127.0.0.1:{httpd.server_port}/mathematic.csv"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def publish(server, data):
+    server.state["bank"] = data
+    server.state["manifest"] = build_manifest(data)
+    server.state["sent"] = 0
+
+
+def full_ingest(tmp_path, data):
+    path = tmp_path / "expected.csv"
+    path.write_bytes(data)
+    return ingest_source(str(path))["tasks"]
+
+
+def as_lists(tasks_data):
+    return {subject: list(tasks) for subject, tasks in tasks_data.items()}
+
+
+def test_manifest_chunks_follow_rows():
+    data = 'question_text,correct_answer\n"Много\nстрок",1\nq2,2\nq3,3'.encode("utf-8")
+    header_end = data.index(b"\n") + 1
+    assert list(row_ends(data)) == [header_end, data.index(b"q2"), data.index(b"q3"), len(data)]
+
+    manifest = build_manifest(data)
+    assert manifest["header"] == "question_text,correct_answer"
+    assert manifest["delimiter"] == ","
+    chunks = manifest["chunks"]
+    assert chunks[0][0] == header_end
+    assert sum(length for _, length, _ in chunks) == len(data) - header_end
+
+
+def test_manifest_url_keeps_query():
+    assert manifest_url("http://host/bank.csv?v=2") == "http://host/bank.csv.manifest.json?v=2"
+
+
+def test_edit_changes_only_nearby_chunks(tmp_path):
+    v1, v2 = make_versions(tmp_path)
+    old = {digest for _, _, digest in build_manifest(v1)["chunks"]}
+    new = build_manifest(v2)
+    assert new["encoding"] == "windows-1251" and new["delimiter"] == ";"
+    changed = [chunk for chunk in new["chunks"] if chunk[2] not in old]
+    assert 1 <= len(changed) <= 3
+    assert len(new["chunks"]) > 10
+
+
+def test_delta_update_fetches_only_changed_chunks(server, tmp_path):
+    v1, v2 = make_versions(tmp_path)
+    session = create_session()
+    try:
+        # Первая загрузка: кэша нет, скачиваются все куски
+        publish(server, v1)
+        first = update_tasks(session, server.url, "auto", fetch_manifest(session, server.url))
+        assert first["changed"] and first["reused_chunks"] == 0
+        assert as_lists(first["tasks"]) == as_lists(full_ingest(tmp_path, v1))
+
+        cache = str(tmp_path / "tasks_cache.bin")
+        save_cache(cache, server.url, "auto", first["tasks"], sync=first["sync"])
+        entry = load_cache(cache, server.url, "auto")
+
+        # Файл не изменился: задания не загружаются
+        manifest = fetch_manifest(session, server.url)
+        server.state["sent"] = 0
+        assert update_tasks(session, server.url, "auto", manifest,
+                            entry["tasks"], entry["sync"]) == {"changed": False}
+        assert server.state["sent"] == 0
+
+        # Новая версия: загружаются только измененные куски
+        publish(server, v2)
+        manifest = fetch_manifest(session, server.url)
+        second = update_tasks(session, server.url, "auto", manifest, entry["tasks"], entry["sync"])
+        assert as_lists(second["tasks"]) == as_lists(full_ingest(tmp_path, v2))
+        assert second["reused_chunks"] > second["fetched_chunks"]
+        assert server.state["sent"] < len(v2) / 4
+        assert "Новый вопрос про логарифмы?" in [task["question"] for task in second["tasks"]["math"]]
+
+        # Кодируются только задания новых кусков, прежние записи копируются как есть
+        with open(cache, 'rb') as f:
+            before = f.read()
+        saved = save_cache(cache, server.url, "auto", second["tasks"], sync=second["sync"])
+        with open(cache, 'rb') as f:
+            after = f.read()
+        assert after.startswith(before)
+        assert len(after) - len(before) < len(before) / 4
+        assert as_lists(saved["tasks"]) == as_lists(full_ingest(tmp_path, v2))
+        assert as_lists(load_cache(cache, server.url, "auto")["tasks"]) == as_lists(full_ingest(tmp_path, v2))
+        # Открытый раньше кэш по-прежнему читается
+        assert list(entry["tasks"]["math"]) == list(full_ingest(tmp_path, v1)["math"])
+    finally:
+        session.close()
+
+
+def test_server_without_range_is_read_once(server, tmp_path):
+    """Если сервер отвечает на Range целым файлом, остальные куски берутся из того же ответа."""
+    v1, _ = make_versions(tmp_path)
+    publish(server, v1)
+    session = create_session()
+    try:
+        manifest = fetch_manifest(session, server.url)
+        first = update_tasks(session, server.url, "auto", manifest)
+
+        # Известен каждый второй кусок: остальным нужны отдельные запросы Range
+        sync = {**first["sync"], "chunks": first["sync"]["chunks"][::2]}
+        server.state["ranges"] = False
+        server.state["requests"].clear()
+        result = update_tasks(session, server.url, "auto", manifest, first["tasks"], sync)
+        assert as_lists(result["tasks"]) == as_lists(full_ingest(tmp_path, v1))
+        assert result["fetched_chunks"] > 1
+        assert len(server.state["requests"]) == 1
+    finally:
+        session.close()
+
+
+def test_download_bank_falls_back_without_manifest(server, tmp_path):
+    v1, v2 = make_versions(tmp_path)
+    server.state["bank"] = v1
+    session = create_session()
+    try:
+        tasks_data, headers, sync = download_bank(session, server.url, "auto")
+        assert sync is None
+        assert tasks_data == as_lists(full_ingest(tmp_path, v1))
+
+        # Манифест не совпадает с файлом: загружаем файл целиком
+        server.state["manifest"] = build_manifest(v1)
+        server.state["bank"] = v2
+        with pytest.raises(DeltaError):
+            update_tasks(session, server.url, "auto", server.state["manifest"])
+        tasks_data, headers, sync = download_bank(session, server.url, "auto")
+        assert sync is None
+        assert tasks_data == as_lists(full_ingest(tmp_path, v2))
+
+        # С подходящим манифестом download_bank возвращает сведения о кусках
+        publish(server, v2)
+        tasks_data, headers, sync = download_bank(session, server.url, "auto")
+        assert sync["delimiter"] == ";"
+        assert as_lists(tasks_data) == as_lists(full_ingest(tmp_path, v2))
+        assert download_bank(session, server.url, "auto", {"sync": sync}, tasks_data) is None
+
+        # Ошибка сервера при запросе манифеста: тоже загружаем файл целиком
+        server.state["manifest_status"] = 503
+        tasks_data, headers, sync = download_bank(session, server.url, "auto", backoff=0)
+        assert sync is None
+        assert as_lists(tasks_data) == as_lists(full_ingest(tmp_path, v2))
+    finally:
+        session.close()
@@ -0,0 +1,183 @@
+import os
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from ege_shpargalka.benchmarks import write_bank
+from ege_shpargalka.cache import load_cache
+from ege_shpargalka.core import ingest_source
+from ege_shpargalka.download import (
+    META_SUFFIX, PART_SUFFIX, Download, DownloadCancelled, DownloadError, download_path, format_speed
+)
+from ege_shpargalka.worker import import_bank
+
+
+@pytest.fixture
+def server(tmp_path):
+    """Сервер, который обрывает соединение после drop_after байт ответа.
+
+    Поддерживает Range и If-Range; drops — сколько ответов оборвать.
+    """
+    path = write_bank(str(tmp_path / "mathematic.csv"), 5000, "utf-8", ",")
+    with open(path, 'rb') as f:
+        bank = f.read()
+    state = {"bank": bank, "etag": '"v1"', "drops": 0, "drop_after": 64 * 1024,
+             "requests": [], "sent": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            state["requests"].append((self.headers.get("Range"), self.headers.get("If-Range")))
+            if self.headers.get("If-None-Match") == state["etag"]:
+                self.send_response(304)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            body = state["bank"]
+            status, start = 200, 0
+            ranged = self.headers.get("Range")
+            if ranged and self.headers.get("If-Range") in (None, state["etag"]):
+                start = int(ranged.split("=")[1].rstrip("-"))
+                if start >= len(body):
+                    self.send_response(416)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                status = 206
+            part = body[start:]
+
+            self.send_response(status)
+            self.send_header("ETag", state["etag"])
+            self.send_header("Content-Length", str(len(part)))
+            if status == 206:
+                self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+            self.end_headers()
+            if state["drops"] > 0 and len(part) > state["drop_after"]:
+                # Обрыв посреди ответа: клиент получит меньше Content-Length
+                state["drops"] -= 1
+                part = part[:state["drop_after"]]
+                self.close_connection = True
+            self.wfile.write(part)
+            self.wfile.flush()
+            state["sent"] += len(part)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    httpd.state = state
+    httpd.url = f"http://127.0.0.1:{httpd.server_port}/mathematic.csv"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def read_all(download):
+    return b"".join(download.chunks())
+
+
+def test_resumes_after_dropped_connections(server, tmp_path):
+    server.state["drops"] = 3
+    progress = []
+    path = str(tmp_path / "downloads" / "bank.csv")
+    download = Download(server.url, path, backoff=0, on_progress=lambda *p: progress.append(p))
+    assert download.start()
+    assert read_all(download) == server.state["bank"]
+
+    # Каждый обрыв продолжен с места остановки, а не с начала
+    ranges = [ranged for ranged, _ in server.state["requests"]]
+    assert ranges[0] is None and len(ranges) == 4
+    assert all(ranged.startswith("bytes=") for ranged in ranges[1:])
+    assert {if_range for _, if_range in server.state["requests"][1:]} == {'"v1"'}
+    assert server.state["sent"] == len(server.state["bank"])
+
+    # Файл проверен и переименован, сведения о загрузке удалены
+    with open(path, 'rb') as f:
+        assert f.read() == server.state["bank"]
+    assert not os.path.exists(path + PART_SUFFIX) and not os.path.exists(path + META_SUFFIX)
+    assert progress and progress[-1][1] == len(server.state["bank"])
+
+
+def test_cancelled_download_resumes_after_restart(server, tmp_path):
+    path = str(tmp_path / "bank.csv")
+    cancel = threading.Event()
+    download = Download(server.url, path, cancel=cancel)
+    download.start()
+    received = 0
+    with pytest.raises(DownloadCancelled):
+        for chunk in download.chunks():
+            received += len(chunk)
+            if received > 32 * 1024:
+                cancel.set()
+    part_size = os.path.getsize(path + PART_SUFFIX)
+    assert part_size > 0
+
+    # Новый объект, как после перезапуска приложения: докачивается только остаток
+    server.state["requests"].clear()
+    download = Download(server.url, path)
+    assert download.start()
+    assert download.resumed == part_size
+    assert read_all(download) == server.state["bank"]
+    assert server.state["requests"] == [(f"bytes={part_size}-", '"v1"')]
+
+
+def test_changed_file_restarts_from_scratch(server, tmp_path):
+    path = str(tmp_path / "bank.csv")
+    server.state["drops"] = 1
+    download = Download(server.url, path, retries=0)
+    download.start()
+    with pytest.raises(DownloadError):
+        read_all(download)
+    assert os.path.exists(path + PART_SUFFIX)
+
+    # На сервере новая версия: If-Range не совпал, файл скачивается целиком
+    server.state["bank"] = server.state["bank"].replace(b"medium", b"hard")
+    server.state["etag"] = '"v2"'
+    download = Download(server.url, path)
+    download.start()
+    assert download.resumed == 0
+    assert read_all(download) == server.state["bank"]
+
+
+def test_gives_up_after_retries(server, tmp_path):
+    # Соединение обрывается до первого байта: загрузка не продвигается
+    server.state["drops"] = 10
+    server.state["drop_after"] = 0
+    download = Download(server.url, str(tmp_path / "bank.csv"), retries=2, backoff=0)
+    download.start()
+    with pytest.raises(DownloadError, match="прервана"):
+        read_all(download)
+
+
+def test_not_modified(server, tmp_path):
+    download = Download(server.url, str(tmp_path / "bank.csv"), {"If-None-Match": '"v1"'})
+    assert download.start() is False
+
+
+def test_worker_imports_over_dropping_connection(server, tmp_path):
+    server.state["drops"] = 2
+    messages = queue.Queue()
+    cache = str(tmp_path / "tasks_cache.bin")
+    downloads = str(tmp_path / "downloads")
+    import_bank(server.url, "auto", ("file", cache), server.url, messages, threading.Event(),
+                download_dir=downloads)
+
+    kinds = []
+    while not messages.empty():
+        kinds.append(messages.get()[0])
+    assert kinds[-1] == "done"
+
+    path = tmp_path / "expected.csv"
+    path.write_bytes(server.state["bank"])
+    assert load_cache(cache, server.url, "auto")["tasks"] == ingest_source(str(path))["tasks"]
+    assert not os.path.exists(download_path(downloads, server.url))
+
+
+def test_format_speed():
+    assert format_speed(512 * 1024) == "512 КБ/с"
+    assert format_speed(1.5 * 1024 * 1024) == "1.5 МБ/с"
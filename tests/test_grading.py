@@ -0,0 +1,67 @@
+import time
+
+from ege_shpargalka.grading import (
+    SCORE_TABLES, grade_submissions, grade_variant, to_test_score, variant_event
+)
+from ege_shpargalka.journal import StatsJournal, default_stats, apply_event
+
+
+def make_tasks(count):
+    return [
+        {"question": f"Вопрос {i}", "answer": str(i), "topic": "Производная", "difficulty": "easy"}
+        for i in range(count)
+    ]
+
+
+def test_score_tables_are_monotonic():
+    for table in SCORE_TABLES.values():
+        assert table[0] == 0 and table[-1] == 100
+        assert table == sorted(table)
+
+
+def test_to_test_score_scales_short_variants():
+    assert to_test_score("math", 0, 27) == 0
+    assert to_test_score("math", 27, 27) == 100
+    assert to_test_score("informatics", 29, 29) == 100
+    assert to_test_score("physics", 0, 0) == 0
+
+
+def test_grade_variant():
+    tasks = make_tasks(4)
+    grade = grade_variant("math", tasks, {0: "0", 1: "1,0", 3: "ответ"})
+    assert grade["results"] == [True, True, False, False]
+    assert grade["primary"] == 2
+    assert grade["max_primary"] == 4
+
+
+def test_variant_event_updates_stats_in_one_event(tmp_path):
+    """Вариант со всеми попытками записывается одним событием журнала."""
+    tasks = make_tasks(3)
+    grade = grade_variant("math", tasks, ["0", "1", "2"])
+    event = variant_event("math", 5, tasks, grade, positions=[10, 11, 12], now=0)
+
+    stats = default_stats()
+    apply_event(stats, event)
+    assert stats["variants_completed"] == 1
+    assert stats["best_score"] == 100
+    assert stats["total_attempts"] == 3
+    assert set(stats["schedule"]["math"]) == {"10", "11", "12"}
+
+    journal = StatsJournal(
+        str(tmp_path / "stats.json"), str(tmp_path / "journal.jsonl"), str(tmp_path / "attempts.jsonl")
+    )
+    journal.load()
+    journal.append(event)
+    journal.flush()
+    assert len((tmp_path / "journal.jsonl").read_text(encoding="utf-8").splitlines()) == 1
+    assert len((tmp_path / "attempts.jsonl").read_text(encoding="utf-8").splitlines()) == 3
+    journal.close()
+
+
+def test_grading_a_thousand_submissions_is_fast():
+    tasks = make_tasks(27)
+    submissions = [("math", tasks, [str(i + n % 2) for i in range(27)]) for n in range(1000)]
+    started = time.perf_counter()
+    grades = grade_submissions(submissions)
+    assert time.perf_counter() - started < 1
+    assert grades[0]["primary"] == 27 and grades[1]["primary"] == 0
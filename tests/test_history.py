@@ -0,0 +1,12 @@
+from ege_shpargalka.history import iter_history, repair_tail
+
+
+def test_repair_tail_drops_partial_line(tmp_path):
+    """Недописанная строка удаляется, целые строки остаются."""
+    path = tmp_path / "attempts.jsonl"
+    path.write_bytes(b'{"subject": "math"}\n{"subject": "physics"}\n{"subj')
+
+    repair_tail(str(path))
+
+    assert [record["subject"] for record in iter_history(str(path))] == ["math", "physics"]
+    assert list(iter_history(str(tmp_path / "missing.jsonl"))) == []
@@ -0,0 +1,98 @@
+import codecs
+
+from ege_shpargalka.ingest import SAMPLE_SIZE, CsvStream, detect_delimiter, detect_encoding, subject_from_url
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def test_stream_handles_split_characters_and_quoted_newlines():
+    """Кириллица и многострочные поля корректно разбираются на границах кусков."""
+    text = (
+        "subject,question_text,correct_answer,topic,task_number\n"
+        'math,"Решите уравнение:\nx² - 5x + 6 = 0","2, 3",Уравнения,5\n'
+        "physics,Скорость света?,300000,Оптика,\n"
+    )
+    stream = CsvStream(chunked(text.encode("utf-8"), 7))
+    batches = list(stream.task_batches("math", batch_size=1))
+
+    assert stream.encoding == "utf-8"
+    assert [subject for batch in batches for subject, _ in batch] == ["math", "physics"]
+    assert batches[0][0][1]["question"] == "Решите уравнение:\nx² - 5x + 6 = 0"
+    assert batches[0][0][1]["answer"] == "2, 3"
+    assert batches[0][0][1]["number"] == "5"
+    assert "number" not in batches[1][0][1]
+
+
+def test_stream_falls_back_to_windows_1251():
+    """Файлы в windows-1251 читаются без ошибок."""
+    data = "Вопрос;Ответ\nСколько будет 2+2?;четыре\n".encode("windows-1251")
+    stream = CsvStream(chunked(data, 5), delimiter=";")
+    tasks = [task for batch in stream.task_batches("russian") for _, task in batch]
+
+    assert stream.encoding == "windows-1251"
+    assert tasks == [{
+        "question": "Сколько будет 2+2?",
+        "answer": "четыре",
+        "topic": "Общая тема",
+        "difficulty": "medium",
+        "explanation": ""
+    }]
+
+
+def test_late_windows_1251_after_ascii_start():
+    """Кодировка определяется по первым не-ASCII байтам, даже если они далеко от начала."""
+    rows = "".join(f"math,Question {i},{i}\n" for i in range(2000))
+    data = ("subject,question_text,correct_answer\n" + rows).encode("ascii")
+    data += "math,Сколько будет 2+2?,четыре\n".encode("windows-1251")
+    assert len(data) > 2 * SAMPLE_SIZE
+
+    for size in (len(data), 1000):
+        stream = CsvStream(chunked(data, size))
+        tasks = [task for batch in stream.task_batches("math") for _, task in batch]
+        assert stream.encoding == "windows-1251"
+        assert tasks[-1]["question"] == "Сколько будет 2+2?" and tasks[-1]["answer"] == "четыре"
+        assert len(tasks) == 2001
+
+
+def test_incomplete_rows_are_skipped():
+    """Строки без вопроса или ответа пропускаются."""
+    data = b"question_text,correct_answer\nq1,a1\nq2,\n,a3\n"
+    tasks = [task for batch in CsvStream([data]).task_batches("math") for _, task in batch]
+    assert [task["question"] for task in tasks] == ["q1"]
+
+
+def test_detect_encoding_and_subject():
+    assert detect_encoding(b"\xef\xbb\xbfquestion") == "utf-8-sig"
+    assert subject_from_url("https://example.com/db/physics.csv") == "physics"
+    assert subject_from_url("https://example.com/db/unknown.csv") == "math"
+
+
+def test_delimiter_is_detected_from_sample():
+    """Разделитель определяется по началу файла, ручной выбор его заменяет."""
+    semicolon = 'question_text;correct_answer;topic\n"Сколько будет 2,5 + 0,5?";3;Дроби\nq2;4;Дроби\n'
+    tab = "question_text\tcorrect_answer\nСколько будет 2+2, если считать?\t4\n"
+
+    stream = CsvStream(chunked(semicolon.encode("utf-8"), 3))
+    tasks = [task for batch in stream.task_batches("math") for _, task in batch]
+    assert stream.delimiter == ";"
+    assert tasks[0]["answer"] == "3" and tasks[0]["question"] == "Сколько будет 2,5 + 0,5?"
+
+    stream = CsvStream([tab.encode("utf-8")])
+    assert [task["answer"] for batch in stream.task_batches("math") for _, task in batch] == ["4"]
+    assert stream.delimiter == "\t"
+
+    assert detect_delimiter("question_text\n") == ","
+
+    # Ручной выбор важнее автоопределения
+    stream = CsvStream([b"a;b\n1;2\n"], delimiter=",")
+    list(stream.rows())
+    assert stream.delimiter == ","
+
+
+def test_single_byte_cyrillic_encodings():
+    text = "Вопрос;Ответ\nкакая столица россии?;москва\n"
+    assert detect_encoding(text.encode("windows-1251")) == "windows-1251"
+    assert detect_encoding(text.encode("koi8-r")) == "koi8-r"
+    assert detect_encoding(codecs.BOM_UTF8 + text.encode("utf-8")) == "utf-8-sig"
@@ -0,0 +1,109 @@
+import json
+
+from ege_shpargalka.journal import StatsJournal
+
+
+def make_journal(tmp_path, **kwargs):
+    return StatsJournal(
+        str(tmp_path / "stats.json"),
+        str(tmp_path / "journal.jsonl"),
+        str(tmp_path / "attempts.jsonl"),
+        **kwargs
+    )
+
+
+def test_stats_are_rebuilt_from_snapshot_and_journal(tmp_path):
+    """Статистика собирается из снимка и непрочитанного хвоста журнала."""
+    journal = make_journal(tmp_path)
+    journal.load()
+    journal.append({"type": "attempt", "subject": "math", "correct": True})
+    journal.append({"type": "attempt", "subject": "math", "correct": False})
+    journal.append({"type": "variant"})
+    journal.flush()
+
+    # Снимок еще не записан: все берется из журнала
+    stats = make_journal(tmp_path).load()
+    assert stats["total_attempts"] == 2
+    assert stats["correct_answers"] == 1
+    assert stats["subjects"]["math"] == {"attempts": 2, "correct": 1}
+    assert stats["variants_completed"] == 1
+
+    journal.close()
+    assert (tmp_path / "journal.jsonl").read_text() == ""
+    assert json.loads((tmp_path / "stats.json").read_text())["total_attempts"] == 2
+    assert make_journal(tmp_path).load()["total_attempts"] == 2
+
+
+def test_compaction_and_torn_tail(tmp_path):
+    """После сворачивания и сбоя при записи события не теряются и не дублируются."""
+    journal = make_journal(tmp_path, compact_every=3)
+    journal.load()
+    for _ in range(5):
+        journal.append({"type": "attempt", "subject": "physics", "correct": True})
+        journal.flush()
+
+    # Имитируем сбой посреди записи строки
+    with open(tmp_path / "journal.jsonl", "a", encoding="utf-8") as f:
+        f.write('{"type": "attempt", "subj')
+
+    restored = make_journal(tmp_path)
+    stats = restored.load()
+    assert stats["subjects"]["physics"] == {"attempts": 5, "correct": 5}
+
+    restored.append({"type": "reset"})
+    restored.append({"type": "attempt", "subject": "russian", "correct": False})
+    restored.close()
+    stats = make_journal(tmp_path).load()
+    assert stats["total_attempts"] == 1
+    assert stats["subjects"]["physics"] == {"attempts": 0, "correct": 0}
+
+
+def test_single_stats_copy_and_compact_snapshot(tmp_path):
+    """Статистика журнала — та же, что возвращает load; снимок без отступов."""
+    journal = make_journal(tmp_path)
+    stats = journal.load()
+    journal.append({"type": "attempt", "subject": "math", "correct": True})
+    # Событие учтено сразу, не дожидаясь потока записи
+    assert journal.stats is stats
+    assert stats["total_attempts"] == 1
+    journal.append({"type": "reset"})
+    assert journal.stats is stats and stats["total_attempts"] == 0
+    journal.append({"type": "attempt", "subject": "math", "correct": True})
+    journal.close()
+
+    text = (tmp_path / "stats.json").read_text(encoding="utf-8")
+    assert "\n" not in text and ": " not in text
+    assert json.loads(text)["journal_seq"] == 3
+    assert make_journal(tmp_path).load()["total_attempts"] == 1
+
+
+def test_legacy_stats_file_is_loaded(tmp_path):
+    """Старый stats.json без журнала читается как снимок."""
+    (tmp_path / "stats.json").write_text(json.dumps({"total_attempts": 7, "best_score": 80}))
+    stats = make_journal(tmp_path).load()
+    assert stats["total_attempts"] == 7
+    assert stats["best_score"] == 80
+    assert stats["subjects"]["math"] == {"attempts": 0, "correct": 0}
+
+
+def test_attempts_update_rollups_and_history(tmp_path):
+    """Каждая попытка попадает в историю и в сводки, включая новые предметы."""
+    from ege_shpargalka.history import attempt_event, iter_history
+
+    task = {"question": "Найдите производную y = 3x²", "topic": "Производная", "difficulty": "hard"}
+    journal = make_journal(tmp_path)
+    journal.load()
+    journal.append(attempt_event("math", task, True, now=0))
+    journal.append(attempt_event("chemistry", task, False, now=0))
+    journal.close()
+
+    stats = make_journal(tmp_path).load()
+    assert stats["subjects"]["chemistry"] == {"attempts": 1, "correct": 0}
+    assert stats["topics"]["math"]["Производная"] == {"attempts": 1, "correct": 1}
+    assert stats["difficulties"]["hard"] == {"attempts": 2, "correct": 1}
+    assert sum(day["attempts"] for day in stats["days"].values()) == 2
+
+    history = list(iter_history(str(tmp_path / "attempts.jsonl")))
+    assert [record["subject"] for record in history] == ["math", "chemistry"]
+    assert history[0]["task"] == history[1]["task"]
+    assert history[0]["correct"] is True
@@ -0,0 +1,44 @@
+from ege_shpargalka.matching import compile_answer, grade_answers
+
+
+def test_unordered_sets():
+    matcher = compile_answer("2, 3")
+    assert matcher.check("3; 2")
+    assert matcher.check("2,3")
+    assert matcher.check("3 2")
+    assert not matcher.check("2")
+    assert not matcher.check("2.3")
+
+
+def test_numbers_and_fractions():
+    assert compile_answer("0,5").check("1/2")
+    assert compile_answer("0.5").check("0,50")
+    assert compile_answer("-3").check("−3")
+    assert compile_answer("2,5").check("2.5")
+    assert not compile_answer("0,5").check("0,51")
+    assert compile_answer("300000 км/с").check("300000")
+    assert compile_answer("300000 км/с").check("300000км/с")
+
+
+def test_numbers_are_compared_with_tolerance():
+    assert compile_answer("0,3").check("0.30000000000000004")
+    assert compile_answer("1/3").check("0,3333333")
+    assert compile_answer("6.02e23").check("6.0200001e23")
+    assert not compile_answer("1/3").check("0,333")
+    assert compile_answer("0,5; 1/3").check("0,3333333; 0,5")
+    assert not compile_answer("0,5; 1/3").check("0,333; 0,5")
+
+
+def test_text_and_alternatives():
+    assert compile_answer("шёл").check("ШЕЛ")
+    assert compile_answer("False").check("false")
+    assert compile_answer("6x|6*x").check("6*X")
+    assert compile_answer("в течение").check("втечение")
+    assert not compile_answer("шёл").check("шол")
+
+
+def test_bulk_grading_reuses_compiled_answers():
+    compile_answer.cache_clear()
+    results = grade_answers([("2, 3", "3;2"), ("2, 3", "2"), ("шёл", "шел")])
+    assert results == [True, False, True]
+    assert compile_answer.cache_info().currsize == 2
@@ -0,0 +1,111 @@
+from ege_shpargalka.cache import load_cache
+from ege_shpargalka.cli import main
+from ege_shpargalka.ingest import AUTO_DELIMITER
+from ege_shpargalka.merge import MERGED_SOURCE, MergedBank, content_hash
+
+
+def task(question, answer="1", topic="Общая тема"):
+    return {"question": question, "answer": answer, "topic": topic,
+            "difficulty": "medium", "explanation": ""}
+
+
+def test_near_duplicates_have_the_same_hash():
+    assert content_hash("math", task("Найдите  ЕЛКУ\n")) == content_hash("math", task("найдите ёлку"))
+    assert content_hash("math", task("найдите ёлку")) != content_hash("physics", task("найдите ёлку"))
+
+
+def test_merge_skips_duplicates_and_keeps_provenance():
+    bank = MergedBank()
+    added = bank.add_source("db", [("math", task("2+2?")), ("math", task("3+3?")), ("physics", task("v?"))])
+    assert [(s, p) for s, p, _ in added] == [("math", 0), ("math", 1), ("physics", 0)]
+
+    added = bank.add_source("tutor", [("math", task(" 2+2?\n")), ("math", task("2+2? ")),
+                                      ("math", task("5+5?")), ("physics", task("V?"))])
+    assert [(s, p) for s, p, _ in added] == [("math", 2)]
+    assert bank.sources["tutor"] == {"subjects": {"math": [2, 1]}, "duplicates": 3}
+    assert bank.source_counts() == {"db": 3, "tutor": 1}
+
+    # Удаление источника сдвигает отрезки следующих за ним
+    bank.remove_source("db")
+    assert [t["question"] for t in bank.tasks_data["math"]] == ["5+5?"]
+    assert "physics" not in bank.tasks_data
+    assert bank.sources["tutor"]["subjects"] == {"math": [0, 1]}
+
+    # Вопросы удаленного источника снова можно добавить
+    bank.add_source("db", [("math", task("2+2?"))])
+    assert [t["question"] for t in bank.tasks_data["math"]] == ["5+5?", "2+2?"]
+
+
+def test_refreshing_a_source_replaces_its_tasks():
+    bank = MergedBank()
+    bank.add_source("a", [("math", task("1?")), ("math", task("2?"))])
+    bank.add_source("b", [("math", task("3?"))])
+    bank.add_source("a", [("math", task("2?", answer="22")), ("math", task("4?"))])
+    assert [(t["question"], t["answer"]) for t in bank.tasks_data["math"]] == [
+        ("3?", "1"), ("2?", "22"), ("4?", "1")
+    ]
+    assert bank.sources["b"]["subjects"] == {"math": [0, 1]}
+    assert bank.sources["a"]["subjects"] == {"math": [1, 2]}
+
+
+def test_merge_command_builds_cache_with_sources(tmp_path, capsys):
+    db = tmp_path / "mathematic.csv"
+    db.write_text("question_text,correct_answer\n2+2?,4\nЁлка?,ель\n", encoding="utf-8")
+    tutor = tmp_path / "tutor.csv"
+    tutor.write_text("subject;Вопрос;Ответ\nmath;елка?;ель\nphysics;Скорость?;10\n", encoding="cp1251")
+    cache = str(tmp_path / "tasks_cache.bin")
+
+    assert main(["merge", str(db), str(tutor), "-o", cache]) == 0
+    assert "повторов пропущено: 1" in capsys.readouterr().out
+    entry = load_cache(cache, MERGED_SOURCE, AUTO_DELIMITER)
+    assert len(entry["tasks"]["math"]) == 2
+    assert entry["files"][str(tutor)]["subjects"] == {"physics": [0, 1]}
+
+    # Следующий источник дописывается к сохраненному банку
+    bank = MergedBank.from_entry(entry)
+    assert bank.add_source("extra", [("math", task("2+2?"))]) == []
+
+    assert main(["merge", "--remove", str(db), "-o", cache]) == 0
+    entry = load_cache(cache, MERGED_SOURCE, AUTO_DELIMITER)
+    assert "math" not in entry["tasks"]
+    assert list(entry["files"]) == [str(tutor)]
+
+
+def test_merged_cache_is_appended_and_keeps_hashes(tmp_path, monkeypatch):
+    """Повторное объединение дописывает в кэш только новые задания и не хеширует банк."""
+    from ege_shpargalka import merge
+    from ege_shpargalka.cache import cache_file, save_cache
+
+    path = str(tmp_path / "tasks_cache.bin")
+    bank = MergedBank()
+    bank.add_source("db", [("math", task(f"{i}?")) for i in range(200)])
+    save_cache(path, MERGED_SOURCE, AUTO_DELIMITER, bank.tasks_data, files=bank.sources,
+               hashes=bank.hashes, versioned=True)
+    with open(cache_file(path), 'rb') as f:
+        before = f.read()
+
+    hashed = []
+    content = merge.content_hash
+    monkeypatch.setattr(merge, "content_hash", lambda subject, t: hashed.append(t) or content(subject, t))
+    bank = MergedBank.from_entry(load_cache(path, MERGED_SOURCE, AUTO_DELIMITER))
+    added = bank.add_source("tutor", [("math", task("5?")), ("math", task("новый?"))])
+    assert [(s, p) for s, p, _ in added] == [("math", 200)]
+    assert len(hashed) == 2
+
+    saved = save_cache(path, MERGED_SOURCE, AUTO_DELIMITER, bank.tasks_data, files=bank.sources,
+                       hashes=bank.hashes, versioned=True)
+    bank.saved(saved)
+    data_size = saved["data_size"]
+    with open(cache_file(path), 'rb') as f:
+        assert f.read().startswith(before)
+    entry = load_cache(path, MERGED_SOURCE, AUTO_DELIMITER)
+    assert entry["tasks"]["math"][200]["question"] == "новый?"
+    assert len(entry["hashes"]) == 201
+
+    # Удаление источника не переписывает записи остальных
+    bank.remove_source("db")
+    saved = save_cache(path, MERGED_SOURCE, AUTO_DELIMITER, bank.tasks_data, files=bank.sources,
+                       hashes=bank.hashes, versioned=True)
+    assert saved["data_size"] == data_size
+    assert [t["question"] for t in saved["tasks"]["math"]] == ["новый?"]
+    assert list(saved["hashes"]) == [content("math", task("новый?"))]
@@ -0,0 +1,41 @@
+import json
+
+from ege_shpargalka.metrics import LogLimiter, Metrics, task_memory
+
+
+def test_timers_and_counters(tmp_path):
+    metrics = Metrics()
+    metrics.record("ingest.parse", 0.002)
+    metrics.record("ingest.parse", 0.004)
+    with metrics.timer("check_answer"):
+        pass
+    metrics.count("ingest.rows", 10)
+    metrics.count("ingest.rows", 5)
+    metrics.gauge("memory.math_bytes", 123)
+
+    snapshot = metrics.snapshot()
+    assert snapshot["timers"]["ingest.parse"]["count"] == 2
+    assert snapshot["timers"]["ingest.parse"]["avg_ms"] == 3.0
+    assert snapshot["timers"]["ingest.parse"]["max_ms"] == 4.0
+    assert snapshot["timers"]["check_answer"]["count"] == 1
+    assert snapshot["counters"]["ingest.rows"] == 15
+    assert snapshot["gauges"]["memory.math_bytes"] == 123
+
+    metrics.dump(str(tmp_path / "metrics.json"))
+    assert json.loads((tmp_path / "metrics.json").read_text(encoding="utf-8")) == snapshot
+
+
+def test_log_limiter_suppresses_bursts():
+    now = [0.0]
+    limiter = LogLimiter(burst=2, interval=10, clock=lambda: now[0])
+    assert [limiter.allow("row") for _ in range(4)] == [True, True, False, False]
+    assert limiter.allow("other")
+    assert limiter.suppressed == {"row": 2}
+    now[0] = 11
+    assert limiter.allow("row")
+
+
+def test_task_memory_grows_with_bank():
+    small = [{"question": "q" * 100, "answer": "1"} for _ in range(10)]
+    large = [{"question": "q" * 100, "answer": "1"} for _ in range(10000)]
+    assert task_memory(large) > task_memory(small) * 500
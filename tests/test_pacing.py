@@ -0,0 +1,76 @@
+import json
+import random
+
+import pytest
+
+from ege_shpargalka.history import attempt_event
+from ege_shpargalka.journal import apply_event, default_stats
+from ege_shpargalka.pacing import RECORD, RING_SIZE, SolveTimes, format_seconds
+
+
+def solve(stats, times, subject, topic, seconds, difficulty="medium"):
+    task = {"question": f"{topic}?", "topic": topic, "difficulty": difficulty}
+    event = attempt_event(subject, task, True, seconds=seconds)
+    apply_event(stats, event)
+    times.add(subject, topic, difficulty, event["seconds"])
+
+
+def test_ring_keeps_only_recent_attempts():
+    """Память не растет: старые попытки вытесняются и из гистограмм."""
+    stats = default_stats()
+    times = SolveTimes()
+    for _ in range(3 * RING_SIZE):
+        solve(stats, times, "math", "Логарифмы", 10)
+    for _ in range(RING_SIZE):
+        solve(stats, times, "math", "Логарифмы", 200)
+
+    records, _ = times.rings[("math", "Логарифмы")]
+    assert len(records) == RING_SIZE * RECORD.size
+    assert sum(times.histograms[("subject", "math")]) == RING_SIZE
+    assert times.percentiles(("topic", "math", "Логарифмы"))[50] == pytest.approx(200, rel=0.1)
+
+
+def test_percentiles_from_histogram():
+    times = SolveTimes()
+    rng = random.Random(1)
+    samples = sorted(rng.uniform(5, 600) for _ in range(200))
+    for seconds in samples:
+        times.add("physics", "Оптика", "hard", seconds)
+
+    estimate = times.percentiles(("difficulty", "hard"))
+    for percentile in (50, 90, 99):
+        exact = samples[int(len(samples) * percentile / 100) - 1]
+        assert estimate[percentile] == pytest.approx(exact, rel=0.15)
+    assert times.percentiles(("difficulty", "easy")) is None
+
+
+def test_stats_rings_restore_the_same_histograms():
+    stats = default_stats()
+    times = SolveTimes()
+    rng = random.Random(2)
+    for i in range(RING_SIZE + 40):
+        solve(stats, times, "math", f"Тема {i % 3}", rng.uniform(1, 900),
+              ["easy", "medium", "hard"][i % 3])
+    # Попытка без измеренного времени в кольцо не попадает
+    apply_event(stats, attempt_event("math", {"question": "?", "topic": "Тема 0"}, False))
+
+    restored = SolveTimes.from_stats(json.loads(json.dumps(stats))["solve_times"])
+    assert restored.histograms == times.histograms
+    assert restored.report() == times.report()
+
+
+def test_report_and_format():
+    times = SolveTimes()
+    assert times.report() == ""
+    for seconds in (30, 40, 50):
+        times.add("math", "Производная", "easy", seconds)
+    times.add("physics", "Оптика", "hard", 400)
+
+    lines = times.report().splitlines()
+    assert lines[0] == "Время решения (p50 / p90 / p99):"
+    assert lines[1].startswith("Математика: ")
+    assert "Дольше всего (p90):" in lines
+    assert lines[lines.index("Дольше всего (p90):") + 1].startswith("Физика, Оптика: 6 мин")
+
+    assert format_seconds(45.4) == "45 с"
+    assert format_seconds(125) == "2 мин 05 с"
@@ -0,0 +1,104 @@
+import time
+
+from ege_shpargalka.history import attempt_event
+from ege_shpargalka.journal import apply_event, default_stats
+from ege_shpargalka.scheduler import DAY, RETRY_DELAY, Scheduler, review
+
+
+def make_tasks(n):
+    return [{"question": f"Вопрос {i}", "answer": str(i)} for i in range(n)]
+
+
+def answer(stats, scheduler, tasks, position, correct, now):
+    apply_event(stats, attempt_event("math", tasks[position], correct, now=now, position=position))
+    scheduler.push("math", position)
+
+
+def test_review_intervals():
+    card = ["id", 0, 0, 2.5, 0]
+    card = review(card, True, 0)
+    assert card[1:3] == [1, 1] and card[4] == DAY
+    card = review(card, True, 0)
+    assert card[2] == 6
+    card = review(card, True, 0)
+    assert card[2] == 16
+    card = review(card, False, 0)
+    assert card[1:3] == [0, 0] and card[4] == RETRY_DELAY and card[3] == 2.6
+
+
+def test_due_reviews_come_before_new_tasks():
+    """Ошибочно решенное задание возвращается после задержки раньше новых."""
+    tasks = make_tasks(10)
+    stats = default_stats()
+    scheduler = Scheduler(stats)
+    now = 1_000_000
+
+    assert scheduler.next_task("math", tasks, now) == 0
+    answer(stats, scheduler, tasks, 0, False, now)
+    assert scheduler.next_task("math", tasks, now) == 1
+    answer(stats, scheduler, tasks, 1, True, now)
+
+    # Через 10 минут задание 0 просрочено, задание 1 — еще нет
+    assert scheduler.next_task("math", tasks, now + RETRY_DELAY) == 0
+    answer(stats, scheduler, tasks, 0, True, now + RETRY_DELAY)
+    assert scheduler.next_task("math", tasks, now + RETRY_DELAY) == 2
+
+    # Карточки восстанавливаются из статистики
+    restored = Scheduler(stats)
+    assert restored.next_task("math", tasks, now + 2 * DAY) in (0, 1)
+
+
+def test_skipped_review_is_not_lost():
+    """Показанное, но не решенное повторение выдается снова."""
+    tasks = make_tasks(10)
+    stats = default_stats()
+    scheduler = Scheduler(stats)
+    answer(stats, scheduler, tasks, 4, False, 0)
+
+    assert scheduler.next_task("math", tasks, RETRY_DELAY) == 4
+    # Ученик перешел к другому предмету и вернулся
+    assert scheduler.next_task("physics", make_tasks(3), RETRY_DELAY) == 0
+    assert scheduler.next_task("math", tasks, RETRY_DELAY) == 4
+
+    answer(stats, scheduler, tasks, 4, True, RETRY_DELAY)
+    assert scheduler.next_task("math", tasks, RETRY_DELAY) == 0
+
+
+def test_changed_bank_invalidates_cards():
+    """Если на месте задания теперь другое, старая карточка не используется."""
+    tasks = make_tasks(3)
+    stats = default_stats()
+    scheduler = Scheduler(stats)
+    answer(stats, scheduler, tasks, 0, False, 0)
+
+    changed = [{"question": "Другой вопрос"}] + tasks[1:]
+    assert scheduler.next_task("math", changed, RETRY_DELAY + 1) == 1
+
+
+def test_pick_is_fast_on_large_bank():
+    """Выбор задания не перебирает банк."""
+    tasks = make_tasks(100_000)
+    stats = default_stats()
+    scheduler = Scheduler(stats)
+    for position in range(0, 100_000, 10):
+        answer(stats, scheduler, tasks, position, position % 20 == 0, 0)
+
+    started = time.perf_counter()
+    for _ in range(1000):
+        scheduler.next_task("math", tasks, DAY * 2)
+    assert time.perf_counter() - started < 0.5
+
+
+def test_preferred_new_tasks_come_first():
+    """Новые задания из слабых тем берутся раньше остальных новых, но не раньше повторений."""
+    tasks = make_tasks(10)
+    stats = default_stats()
+    scheduler = Scheduler(stats)
+    now = 1_000_000
+
+    assert scheduler.next_task("math", tasks, now=now, preferred=[7, 3]) == 7
+    answer(stats, scheduler, tasks, 7, False, now)
+    assert scheduler.next_task("math", tasks, now=now, preferred=[7, 3]) == 3
+    # Ошибка в задании 7 подошла к сроку повторения
+    assert scheduler.next_task("math", tasks, now=now + RETRY_DELAY, preferred=[3, 5]) == 7
+    assert scheduler.next_task("math", tasks, now=now, preferred=[20]) == 0
@@ -0,0 +1,69 @@
+import random
+
+from ege_shpargalka.benchmarks import generate_rows
+from ege_shpargalka.ingest import row_to_task
+from ege_shpargalka.search import SearchIndex, normalize, trigrams
+
+
+def test_normalize_folds_case_and_yo():
+    assert normalize("  Шёл   ДОЖДЬ ") == "шел дождь"
+
+
+def test_search_ranks_best_match_first():
+    """Поиск находит задание по фрагменту текста с учетом ё/е и регистра."""
+    index = SearchIndex()
+    index.add("math", 0, {"question": "Решите уравнение: x² - 5x + 6 = 0", "topic": "Квадратные уравнения"})
+    index.add("math", 1, {"question": "Найдите производную функции y = 3x²", "topic": "Производная"})
+    index.add("russian", 0, {"question": "В каком слове пишется буква Ё: ш...л?", "topic": "Орфография",
+                             "explanation": "Шёл"})
+
+    assert index.search("x² - 5x + 6")[0] == ("math", 0)
+    assert index.search("ПРОИЗВОДНАЯ")[0] == ("math", 1)
+    assert index.search("орфографиё") == [("russian", 0)]
+    assert index.search("zzzz") == []
+    assert index.search("x") == []
+
+
+def brute_force_search(index, tasks, query, limit=20):
+    """Поиск перебором всех заданий с той же оценкой, что у SearchIndex."""
+    grams, required = index.query_grams(query)
+    scored = []
+    for doc_id, task in enumerate(tasks):
+        text = normalize(" ".join((task["question"], task["topic"], task["explanation"])))
+        score = len(trigrams(text).intersection(grams))
+        if grams and score >= required:
+            scored.append((-score, doc_id))
+    scored.sort()
+    return [("math", doc_id) for _, doc_id in scored[:limit]]
+
+
+def test_search_matches_brute_force_on_shared_words():
+    """Оценки точные и на банке, где у всех заданий общие слова."""
+    tasks = [row_to_task(row) for row in generate_rows(3000)]
+    index = SearchIndex()
+    for position, task in enumerate(tasks):
+        index.add("math", position, task)
+    # Частые триграммы ищутся по битовым картам, редкие — по спискам
+    assert index.bitmaps and len(index.bitmaps) < len(index.postings)
+
+    rng = random.Random(5)
+    queries = ["решите уравнение", "скорость тела через секунды", "ответ", "дроби ё", "Задание 2999"]
+    for _ in range(30):
+        question = tasks[rng.randrange(len(tasks))]["question"]
+        start = rng.randrange(len(question))
+        queries.append(question[start:start + rng.randint(3, 60)])
+    for query in queries:
+        assert index.search(query) == brute_force_search(index, tasks, query), query
+
+
+def test_search_does_not_prefer_early_documents():
+    """Лучшее совпадение находится, даже если до него тысячи заданий с теми же триграммами."""
+    index = SearchIndex()
+    for position in range(12000):
+        question = "Решите квадратное неравенство" if position % 2 else "Решите линейное уравнение"
+        index.add("math", position, {"question": question, "topic": "Алгебра"})
+    for position in range(12000, 26000):
+        index.add("math", position, {"question": "Найдите производную функции", "topic": "Анализ"})
+    index.add("math", 26000, {"question": "Решите квадратное уравнение", "topic": "Алгебра"})
+
+    assert index.search("квадратное уравнение")[0] == ("math", 26000)
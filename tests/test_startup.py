@@ -0,0 +1,20 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+def test_app_import_does_not_load_network_and_database_modules():
+    """Тяжелые модули не импортируются при запуске приложения."""
+    pytest.importorskip("toga_dummy")
+    env = {**os.environ, "TOGA_BACKEND": "toga_dummy"}
+    code = (
+        "import sys, ege_shpargalka.app as app; "
+        "print(app.IMPORT_TIME < app.STARTUP_BUDGET, 'requests' in sys.modules, 'sqlite3' in sys.modules)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], env=env, capture_output=True, text=True,
+        cwd=os.path.join(os.path.dirname(__file__), "..", "src")
+    )
+    assert result.stdout.split() == ["True", "False", "False"], result.stderr
@@ -0,0 +1,119 @@
+import threading
+
+from ege_shpargalka import store as store_module
+from ege_shpargalka.merge import MERGED_SOURCE, MergedBank
+from ege_shpargalka.store import StoredTasks, TaskStore
+
+
+def make_task(i):
+    return {
+        "question": f"Вопрос {i}",
+        "answer": str(i),
+        "topic": "Производная" if i % 2 else "Интегралы",
+        "difficulty": ("easy", "medium", "hard")[i % 3],
+        "explanation": "",
+        **({"number": str(i % 27 + 1)} if i % 4 else {})
+    }
+
+
+def test_store_roundtrip_and_indexed_queries(tmp_path):
+    """Задания сохраняются в базу и выбираются по индексам."""
+    store = TaskStore(str(tmp_path / "tasks.db"))
+    try:
+        tasks_data = {"math": [make_task(i) for i in range(10)], "physics": [make_task(0)]}
+        entry = store.save("u", ",", tasks_data, {"ETag": '"v1"'})
+
+        math = entry["tasks"]["math"]
+        assert isinstance(math, StoredTasks)
+        assert len(math) == 10
+        assert math[7] == make_task(7)
+        assert math[-1] == make_task(9)
+        assert list(math) == tasks_data["math"]
+        assert entry["etag"] == '"v1"'
+
+        assert math.count_where() == 10
+        assert math.count_where(topic="Производная", difficulty="hard") == 1
+        assert list(math.positions_where(topic="Производная", after=3)) == [5, 7, 9]
+        assert list(math.positions_where(after=9)) == []
+
+        assert store.load("other", ",") is None
+        assert len(store.load("u", ",")["tasks"]["physics"]) == 1
+    finally:
+        store.close()
+
+
+def test_store_can_be_rebuilt_from_its_own_tasks(tmp_path):
+    """Банк можно пересохранить из заданий этой же базы."""
+    store = TaskStore(str(tmp_path / "tasks.db"))
+    try:
+        entry = store.save("u", ",", {"math": [make_task(i) for i in range(5)]}, hashes={7, 2 ** 64 - 1})
+        assert sorted(entry["hashes"]) == [7, 2 ** 64 - 1]
+        entry = store.save("u", ",", {"math": entry["tasks"]["math"], "russian": [make_task(1)]})
+
+        assert [task["answer"] for task in entry["tasks"]["math"]] == ["0", "1", "2", "3", "4"]
+        assert store.conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0] == 6
+        assert "hashes" not in entry
+    finally:
+        store.close()
+
+
+def test_store_is_shared_between_threads(tmp_path, monkeypatch):
+    """Запросы из разных потоков идут по очереди и не ломают друг друга.
+
+    Старое поколение удаляется при сохранении, поэтому читатель может
+    получить только начало банка, но не ошибку соединения.
+    """
+    monkeypatch.setattr(store_module, "PAGE_SIZE", 7)
+    store = TaskStore(str(tmp_path / "tasks.db"))
+    try:
+        entry = store.save("u", ",", {"math": [make_task(i) for i in range(100)]})
+        errors = []
+
+        def read():
+            try:
+                for _ in range(20):
+                    math = store.load("u", ",")["tasks"]["math"]
+                    tasks = list(math)
+                    assert tasks == [make_task(i) for i in range(len(tasks))]
+                    assert math.count_where(topic="Интегралы") in (0, 50)
+            except Exception as e:
+                errors.append(e)
+
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        for reader in readers:
+            reader.start()
+        for _ in range(5):
+            entry = store.save("u", ",", {"math": entry["tasks"]["math"]})
+        for reader in readers:
+            reader.join()
+
+        assert errors == []
+        assert list(entry["tasks"]["math"]) == [make_task(i) for i in range(100)]
+    finally:
+        store.close()
+
+
+def test_merged_source_is_appended_to_the_current_generation(tmp_path):
+    """Добавление источника вставляет только его строки, удаление копирует банк запросом."""
+    store = TaskStore(str(tmp_path / "tasks.db"))
+    try:
+        entry = store.save("u", ",", {"math": [make_task(i) for i in range(50)]})
+        bank = MergedBank.from_entry(entry)
+        bank.add_source("extra", [("math", make_task(i)) for i in range(50, 60)])
+
+        changes = store.conn.total_changes
+        entry = store.save(MERGED_SOURCE, ",", bank.tasks_data, files=bank.sources)
+        # Десять новых строк и запись метаданных; старые строки не переписаны
+        assert store.conn.total_changes - changes < 20
+        assert entry["generation"] == 1
+        assert list(entry["tasks"]["math"]) == [make_task(i) for i in range(60)]
+        assert entry["tasks"]["math"].count_where(topic="Интегралы") == 30
+
+        bank.saved(entry)
+        bank.remove_source("u")
+        entry = store.save(MERGED_SOURCE, ",", bank.tasks_data, files=bank.sources)
+        assert entry["generation"] == 2
+        assert list(entry["tasks"]["math"]) == [make_task(i) for i in range(50, 60)]
+        assert store.conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0] == 10
+    finally:
+        store.close()
@@ -0,0 +1,98 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from ege_shpargalka.sync import create_session, download_bank, sync_banks
+
+BANKS = {
+    "/mathematic.csv": "question_text,correct_answer\n2+2,4\n3+3,6\n".encode("utf-8"),
+    "/physics.csv": "question_text,correct_answer\nСкорость света?,300000\n".encode("utf-8"),
+    "/russian.csv": "question_text,correct_answer\nш...л,шёл\n".encode("utf-8"),
+}
+
+
+@pytest.fixture
+def server():
+    """Локальный HTTP-сервер, отдающий банки заданий."""
+    requests_seen = []
+    failures = {"/physics.csv": 2}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            requests_seen.append((self.path, self.client_address[1]))
+            if failures.get(self.path):
+                failures[self.path] -= 1
+                self.send_response(503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            if self.path not in BANKS:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            body = BANKS[self.path]
+            self.send_response(200)
+            self.send_header("ETag", '"v1"')
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    httpd.requests_seen = requests_seen
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def url(server, path):
+    return f"http://127.0.0.1:{server.server_port}{path}"
+
+
+def test_sync_downloads_all_banks_with_retries(server):
+    """Все файлы загружаются, временные ошибки сервера повторяются."""
+    urls = [url(server, path) for path in BANKS] + [url(server, "/missing.csv")]
+    completed = []
+
+    results = asyncio.run(sync_banks(
+        urls, ",", on_bank=lambda u, r: completed.append(u), backoff=0.01
+    ))
+
+    assert sorted(completed) == sorted(urls)
+    assert results[urls[0]][0] == {"math": [
+        {"question": "2+2", "answer": "4", "topic": "Общая тема", "difficulty": "medium", "explanation": ""},
+        {"question": "3+3", "answer": "6", "topic": "Общая тема", "difficulty": "medium", "explanation": ""},
+    ]}
+    assert list(results[urls[1]][0]) == ["physics"]
+    assert results[urls[2]][0]["russian"][0]["answer"] == "шёл"
+    # 404 не повторяется и возвращается как ошибка
+    assert isinstance(results[urls[3]], Exception)
+    assert [p for p, _ in server.requests_seen].count("/missing.csv") == 1
+    assert [p for p, _ in server.requests_seen].count("/physics.csv") == 3
+
+
+def test_unchanged_bank_is_not_downloaded(server):
+    """При совпадении ETag сервер отвечает 304 и файл не разбирается."""
+    session = create_session()
+    try:
+        assert download_bank(session, url(server, "/mathematic.csv"), ",", {"etag": '"v1"'}) is None
+        tasks_data, headers, sync = download_bank(session, url(server, "/mathematic.csv"), ",")
+        assert sync is None
+        assert headers["ETag"] == '"v1"'
+        # Оба запроса прошли через одно keep-alive соединение
+        ports = {port for path, port in server.requests_seen}
+        assert len(ports) == 1
+    finally:
+        session.close()
@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+from ege_shpargalka.benchmarks import generate_rows
+from ege_shpargalka.ingest import row_to_task
+from ege_shpargalka.metrics import task_memory
+from ege_shpargalka.tasks import TaskColumns
+
+TASKS = [
+    {"question": "Сколько будет 2+2?", "answer": "4", "topic": "Арифметика",
+     "difficulty": "easy", "explanation": "", "number": "1"},
+    {"question": "Найдите корень: x - 3 = 0", "answer": "3", "topic": "Уравнения",
+     "difficulty": "medium", "explanation": "Перенесите 3 вправо"},
+    {"question": "ш...л", "answer": "шёл", "topic": "Арифметика",
+     "difficulty": "hard", "explanation": ""},
+]
+
+
+def test_columns_return_the_same_tasks():
+    tasks = TaskColumns(TASKS)
+    assert len(tasks) == 3
+    assert list(tasks) == TASKS
+    assert tasks == TASKS
+    assert tasks[-1] == TASKS[2]
+    assert tasks[1:] == TASKS[1:]
+    assert "number" not in tasks[1]
+    with pytest.raises(IndexError):
+        tasks[3]
+
+    # Задание — отдельный словарь: его изменение не портит банк
+    tasks[0]["answer"] = "5"
+    assert tasks[0]["answer"] == "4"
+    assert json.loads(json.dumps(tasks[2], ensure_ascii=False)) == TASKS[2]
+
+
+def test_repeated_values_are_stored_once():
+    tasks = TaskColumns(TASKS)
+    assert tasks.topics[0] == tasks.topics[2] == tasks.topic_table.codes["Арифметика"]
+    assert tasks.difficulties.itemsize == 1
+
+    # Таблицы у каждого предмета свои
+    assert "Арифметика" not in TaskColumns().topic_table.codes
+
+
+def test_many_distinct_difficulties_widen_the_column():
+    tasks = [dict(TASKS[1], difficulty=f"уровень {i}") for i in range(300)]
+    columns = TaskColumns(tasks)
+    assert columns.difficulties.itemsize == 2
+    assert list(columns) == tasks
+    assert columns[299]["difficulty"] == "уровень 299"
+
+
+def test_columns_take_less_memory_than_dicts():
+    tasks = [row_to_task(row) for row in generate_rows(5000)]
+    columns = TaskColumns(tasks)
+    assert columns == tasks
+    assert task_memory(columns) * 2 < task_memory(tasks)
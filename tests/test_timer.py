@@ -0,0 +1,97 @@
+import asyncio
+
+from ege_shpargalka.timer import ExamTimer, format_remaining
+
+
+class FakeClock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_format_remaining():
+    assert format_remaining(235 * 60) == "03:55:00"
+    assert format_remaining(0.2) == "00:00:01"
+    assert format_remaining(-5) == "00:00:00"
+
+
+def test_pause_keeps_remaining_time():
+    async def scenario():
+        clock = FakeClock()
+        timer = ExamTimer(100, clock=clock)
+        timer.start()
+        clock.now = 30
+        timer.pause()
+        clock.now = 1000
+        assert timer.remaining() == 70
+        timer.start()
+        clock.now = 1010
+        assert timer.remaining() == 60
+        timer.pause()
+
+    asyncio.run(scenario())
+
+
+def test_deadline_survives_restart():
+    """После перезапуска остаток считается по сохраненному сроку."""
+    async def scenario():
+        wall = FakeClock(1000)
+        timer = ExamTimer(600, wall_clock=wall)
+        timer.start()
+        state = timer.to_dict()
+        timer.pause()
+
+        wall.now = 1100
+        restored = ExamTimer.from_dict(state, clock=FakeClock(5), wall_clock=wall)
+        assert restored.running
+        assert 499 <= restored.remaining() <= 500
+        restored.pause()
+
+        paused = ExamTimer.from_dict({"remaining": 42})
+        assert not paused.running and paused.remaining() == 42
+
+    asyncio.run(scenario())
+
+
+def test_ticks_once_per_second_until_expired():
+    async def scenario():
+        ticks = []
+        expired = asyncio.Event()
+        timer = ExamTimer(0.25, on_tick=ticks.append, on_expire=expired.set)
+        timer.start()
+        await asyncio.wait_for(expired.wait(), 2)
+        return ticks
+
+    ticks = asyncio.run(scenario())
+    assert ticks[-1] == 0
+    assert len(ticks) <= 3
+
+
+def test_restored_timer_waits_for_start():
+    """Восстановленный с истекшим сроком таймер не срабатывает, пока его не запустят."""
+    async def scenario():
+        wall = FakeClock(1000)
+        expired = []
+        timer = ExamTimer.from_dict({"deadline": 900}, start=False, on_expire=lambda: expired.append(True),
+                                    wall_clock=wall)
+        await asyncio.sleep(0.05)
+        assert timer.pending and not timer.running and not expired
+        assert timer.remaining() == 0
+        # Пока задания грузятся, срок сохраняется прежним
+        assert timer.to_dict() == {"deadline": 900}
+
+        timer.start()
+        await asyncio.sleep(0.05)
+        assert expired == [True]
+        assert not timer.pending and not timer.running
+
+        # Срок еще не вышел: время ожидания запуска вычитается из остатка
+        later = ExamTimer.from_dict({"deadline": 1600}, start=False, wall_clock=wall)
+        wall.now = 1100
+        later.start()
+        assert 499 <= later.remaining() <= 500
+        later.pause()
+
+    asyncio.run(scenario())
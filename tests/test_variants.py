@@ -0,0 +1,86 @@
+import time
+
+import pytest
+
+from ege_shpargalka.variants import VARIANT_SIZE, IndexIncomplete, VariantIndex, task_slot
+
+
+def numbered_bank(count):
+    return [
+        {
+            "question": f"Задание {i}",
+            "answer": str(i),
+            "topic": f"Тема {i % 7}",
+            "difficulty": ("easy", "medium", "hard")[i % 3],
+            "number": str(i % VARIANT_SIZE + 1)
+        }
+        for i in range(count)
+    ]
+
+
+def build(tasks, subject="math"):
+    index = VariantIndex()
+    for position, task in enumerate(tasks):
+        index.add(subject, position, task)
+    index.complete = True
+    return index
+
+
+def test_task_slot():
+    assert task_slot({"number": " 5 "}) == 5
+    assert task_slot({"number": "28"}) is None
+    assert task_slot({"number": "пять"}) is None
+    assert task_slot({}) is None
+
+
+def test_variant_is_deterministic_per_seed():
+    index = build(numbered_bank(5000))
+    assert index.assemble("math", 3) == index.assemble("math", 3)
+    assert index.assemble("math", 3) != index.assemble("math", 4)
+
+
+def test_partially_filled_index_does_not_assemble():
+    """Пока корзины заполняются, вариант не собирается: он зависел бы от скорости индексации."""
+    tasks = numbered_bank(5000)
+    index = VariantIndex()
+    for position, task in enumerate(tasks[:500]):
+        index.add("math", position, task)
+    with pytest.raises(IndexIncomplete):
+        index.assemble("math", 3)
+
+    for position, task in enumerate(tasks[500:], 500):
+        index.add("math", position, task)
+    index.complete = True
+    assert index.assemble("math", 3) == build(tasks).assemble("math", 3)
+
+
+def test_one_task_per_slot():
+    tasks = numbered_bank(5000)
+    positions = build(tasks).assemble("math", 1)
+    assert len(positions) == VARIANT_SIZE
+    assert [int(tasks[p]["number"]) for p in positions] == list(range(1, VARIANT_SIZE + 1))
+
+
+def test_topics_without_numbers_do_not_repeat():
+    tasks = [
+        {"question": f"q{i}", "answer": "1", "topic": f"Тема {i % 3}", "difficulty": "medium"}
+        for i in range(10)
+    ]
+    positions = build(tasks).assemble("math", 1)
+    assert sorted(positions) == list(range(10))
+
+    positions = build(tasks * 10).assemble("math", 2)
+    assert len(positions) == VARIANT_SIZE
+    assert len(set(positions)) == VARIANT_SIZE
+
+
+def test_missing_subject():
+    assert VariantIndex(complete=True).assemble("physics", 1) == []
+
+
+def test_assemble_is_fast():
+    index = build(numbered_bank(100_000))
+    started = time.perf_counter()
+    for seed in range(10):
+        index.assemble("math", seed)
+    assert (time.perf_counter() - started) / 10 < 0.01
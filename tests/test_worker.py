@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+from ege_shpargalka.benchmarks import write_bank
+from ege_shpargalka.cache import load_cache
+from ege_shpargalka.core import add_batch, ingest_source
+from ege_shpargalka.metrics import metrics
+from ege_shpargalka.worker import BankImport
+
+
+def run_import(bank_import, cancel_after=None):
+    """Собирает сообщения импорта; после cancel_after пачек просит отмену."""
+    async def collect():
+        messages = []
+        batches = 0
+        async for kind, payload in bank_import.events():
+            messages.append((kind, payload))
+            if kind == "batch":
+                batches += 1
+                if batches == cancel_after:
+                    bank_import.cancel()
+        return messages
+
+    bank_import.start()
+    return asyncio.run(collect())
+
+
+@pytest.mark.parametrize("use_process", [True, False])
+def test_import_reports_progress_and_writes_cache(tmp_path, use_process):
+    path = write_bank(str(tmp_path / "mathematic.csv"), 3000, "windows-1251", ";")
+    cache = str(tmp_path / "tasks_cache.bin")
+    metrics.reset()
+    messages = run_import(BankImport(path, "auto", ("file", cache), path, use_process=use_process))
+
+    kinds = [kind for kind, _ in messages]
+    assert kinds[0] == "start" and kinds[-1] == "done"
+    assert kinds.count("batch") > 1
+    done = messages[-1][1]
+    assert done["count"] == 3000 and done["skipped"] == 0
+    assert done["encoding"] == "windows-1251" and done["delimiter"] == ";"
+
+    # Без send_batches задания не пересылаются: только счетчики, а банк читается из кэша работника
+    assert all(payload[0] is None for kind, payload in messages if kind == "batch")
+    counts = [payload[1] for kind, payload in messages if kind == "batch"]
+    assert counts == sorted(counts) and counts[-1] == 3000
+    expected = ingest_source(path)["tasks"]
+    assert load_cache(done["cache"], path, "auto")["tasks"] == expected
+    assert load_cache(cache, path, "auto")["tasks"] == expected
+
+    # Метрики разбора из процесса-работника попадают в метрики интерфейса
+    assert "metrics" not in done
+    assert metrics.snapshot()["counters"]["ingest.rows"] >= 3000
+
+
+def test_batches_show_tasks_before_the_import_finishes(tmp_path):
+    """Пачки приходят до завершения и дают те же номера заданий, что и кэш."""
+    path = write_bank(str(tmp_path / "mathematic.csv"), 3000, "utf-8", ",")
+    bank_import = BankImport(path, "auto", ("file", str(tmp_path / "cache.bin")), path,
+                             send_batches=True)
+
+    async def collect():
+        tasks_data = {}
+        visible = []
+        async for kind, payload in bank_import.events():
+            if kind == "batch":
+                batch, count, _ = payload
+                add_batch(tasks_data, batch)
+                assert sum(map(len, tasks_data.values())) == count
+                if not bank_import.finished:
+                    visible.append(count)
+            elif kind == "done":
+                return tasks_data, visible, payload
+
+    bank_import.start()
+    tasks_data, visible, done = asyncio.run(collect())
+    assert len(visible) > 1 and visible[0] < 3000
+    assert load_cache(done["cache"], path, "auto")["tasks"] == tasks_data
+
+
+def test_worker_without_interpreter_runs_in_thread(tmp_path, monkeypatch):
+    """Загрузчик собранного приложения не запускается вместо работника."""
+    from ege_shpargalka import worker
+
+    monkeypatch.setattr(worker.sys, "executable", str(tmp_path / "Shpargalka"))
+    monkeypatch.setattr(worker.sys, "prefix", str(tmp_path))
+    assert worker.spawn_executable() is None
+
+    path = write_bank(str(tmp_path / "mathematic.csv"), 100, "utf-8", ",")
+    bank_import = BankImport(path, "auto", ("file", str(tmp_path / "cache.bin")), path)
+    assert run_import(bank_import)[-1][0] == "done"
+    assert not bank_import.use_process
+
+
+def test_cancel_stops_without_cache(tmp_path):
+    path = write_bank(str(tmp_path / "mathematic.csv"), 20000, "utf-8", ",")
+    cache = tmp_path / "tasks_cache.bin"
+    messages = run_import(BankImport(path, "auto", ("file", str(cache)), path), cancel_after=1)
+    assert messages[-1] == ("cancelled", None)
+    assert not cache.exists()
+
+
+def test_missing_source_reports_error(tmp_path):
+    bank_import = BankImport(str(tmp_path / "missing.csv"), "auto",
+                             ("file", str(tmp_path / "cache.bin")), "missing", use_process=False)
+    kind, payload = run_import(bank_import)[-1]
+    assert kind == "error" and "FileNotFoundError" in payload